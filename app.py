@@ -32,8 +32,7 @@ if logo_path.exists():
 # Configuração padrão para ser usada como fallback ou como opção
 DEFAULT_CONFIG = {
     "processing": {
-        "short_term_duration": 0.005,
-        "mid_term_duration": 1.0
+        "short_term_duration": 0.005
     },
     "detection": {
         "threshold": 0.005,
@@ -126,10 +125,8 @@ if caminho_selecionado:
     st.sidebar.markdown('# Processing')
     if use_default_config or use_sliders:
         short_term_duration = st.sidebar.slider('short_term_duration (seconds)', min_value=0.0, max_value=0.1, value=DEFAULT_CONFIG["processing"]["short_term_duration"], step=0.001, format="%.3f", key='short_term_duration_slider', disabled=use_default_config)
-        mid_term_duration = st.sidebar.slider('mid_term_duration (seconds)', min_value=0.1, max_value=2.0, value=DEFAULT_CONFIG["processing"]["mid_term_duration"], step=0.01, key='mid_term_duration_slider', disabled=use_default_config)
     else:
         short_term_duration = st.sidebar.text_input('short_term_duration (seconds)', value=str(DEFAULT_CONFIG["processing"]["short_term_duration"]), key='short_term_duration_text')
-        mid_term_duration = st.sidebar.text_input('mid_term_duration (seconds)', value=str(DEFAULT_CONFIG["processing"]["mid_term_duration"]), key='mid_term_duration_text')
 
     st.sidebar.markdown('# Detection')
     if use_default_config or use_sliders:
@@ -159,14 +156,12 @@ if caminho_selecionado:
             try:
                 if use_sliders:
                     final_short_term_duration = short_term_duration
-                    final_mid_term_duration = mid_term_duration
                     final_threshold = threshold
                     final_low_freq = low_freq
                     final_high_freq = high_freq
                     final_window_size = window_size
                 else:
                     final_short_term_duration = float(short_term_duration)
-                    final_mid_term_duration = float(mid_term_duration)
                     final_threshold = float(threshold)
                     final_low_freq = int(low_freq)
                     final_high_freq = int(high_freq)
@@ -174,8 +169,7 @@ if caminho_selecionado:
 
                 config_data = {
                     "processing": {
-                        "short_term_duration": final_short_term_duration,
-                        "mid_term_duration": final_mid_term_duration
+                        "short_term_duration": final_short_term_duration
                     },
                     "detection": {
                         "threshold": final_threshold,
@@ -0,0 +1,219 @@
+# benchmarks/bench_detection.py
+"""
+Benchmark the click detection hot path on synthetic recordings.
+
+For every sample rate and duration a deterministic WAV with clicks at known times is
+generated, and each stage runs in a fresh worker process so its peak RSS is its own:
+
+    detect_clicks    full detector, WAV file -> event times
+    stft             band-limited STFT of the whole signal (input of the feature stages)
+    spectral_flux, hfc, cd, wpd
+                     one onset detection function over that STFT
+
+Each stage reports seconds (best of --repeat), samples/sec, realtime factor and peak
+RSS. detect_clicks is scored against the injected clicks; the feature stages are scored
+on their N highest frames, N being the number of clicks (precision/recall at N).
+
+Usage:
+    python benchmarks/bench_detection.py --rates 44100 96000 192000 --durations 10 60
+"""
+
+import sys
+import os
+import time
+import json
+import platform
+import argparse
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import scipy
+import soundfile as sf
+from scipy.signal import ShortTimeFFT, windows
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# === Step 1: Detect project root and add to sys.path ===
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+# === Step 2: Project imports ===
+from src.config.config_loader import load_config
+from src.detection.click_detection_utils import detect_clicks, detection_params
+from src.features.extract_features import compute_spectral_flux, compute_hfc, compute_cd, compute_wpd
+from benchmarks.synthetic_audio import write_click_wav, match_events
+
+RESULTS_DIR = PROJECT_ROOT / "benchmarks" / "results"
+
+FEATURES = {
+    "spectral_flux": compute_spectral_flux,
+    "hfc": compute_hfc,
+    "cd": compute_cd,
+    "wpd": compute_wpd,
+}
+STAGES = ["detect_clicks", "stft"] + list(FEATURES)
+
+
+def _peak_rss_mb():
+    """Peak resident set size of this process in MiB (None where unsupported)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    return peak / (1024 ** 2 if sys.platform == "darwin" else 1024)
+
+
+def _format_score(value):
+    return "n/a" if value is None else f"{value:.3f}"
+
+
+def _band_stft(wav_path: Path, config: dict):
+    """Band STFT of a whole file with the detector's frame layout (frame p centred on p * W)."""
+    x, fs = sf.read(wav_path, always_2d=True)
+    x = x[:, 0]
+    W = int(config["processing"]["short_term_duration"] * fs)
+    band = config["detection"]["frequency_band"]
+
+    stft_transform = ShortTimeFFT(mfft=W, hop=W, win=windows.hann(W, sym=False), fft_mode='onesided', fs=fs)
+    freqs = stft_transform.f
+    band_mask = (freqs >= band["low"]) & (freqs <= band["high"])
+    X = stft_transform.stft(x, p0=0, p1=stft_transform.p_max(len(x)))[band_mask, :]
+    return X, W / fs
+
+
+def _run_stage(stage: str, wav_path: Path, config: dict, repeat: int, num_clicks: int):
+    """
+    Worker job: time one stage and return (best seconds, peak RSS in MiB, event times or None).
+
+    Feature stages return the times of their `num_clicks` highest ODF frames.
+    """
+    if stage == "detect_clicks":
+        run = lambda: detect_clicks(wav_path, config)["Event_Time_Seconds"].to_numpy()
+    elif stage == "stft":
+        run = lambda: _band_stft(wav_path, config)
+    else:
+        X, hop = _band_stft(wav_path, config)
+        feature = FEATURES[stage]
+        run = lambda: feature(X)
+
+    best = np.inf
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        output = run()
+        best = min(best, time.perf_counter() - t0)
+
+    if stage == "detect_clicks":
+        event_times = output
+    elif stage == "stft":
+        event_times = None
+    else:
+        # Rank frames by ODF value; the top N are scored against the N injected clicks
+        top = np.argsort(output)[::-1][:num_clicks]
+        event_times = np.sort(top) * hop
+    return best, _peak_rss_mb(), event_times
+
+
+def benchmark(rates, durations, repeat: int = 3, seed: int = 0, stages=None, config=None) -> dict:
+    """
+    Run every stage on synthetic recordings of each sample rate and duration.
+
+    Args:
+        rates (list[int]): Sample rates in Hz.
+        durations (list[float]): Recording lengths in seconds.
+        repeat (int): Timed runs per stage; the fastest is reported.
+        seed (int): Seed of the synthetic recordings.
+        stages (list[str], optional): Subset of STAGES (default: all).
+        config (dict, optional): Configuration (default: config/config.yaml).
+
+    Returns:
+        dict: 'meta' (environment and detection settings) and 'results' (one entry per
+              sample rate, duration and stage).
+    """
+    config = config or load_config()
+    stages = stages or STAGES
+    tolerance = config["processing"]["short_term_duration"]
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "scipy": scipy.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": repeat,
+            "seed": seed,
+            "tolerance_seconds": tolerance,
+            "detection_params": detection_params(config),
+        },
+        "results": [],
+    }
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for fs in rates:
+            for duration in durations:
+                wav_path = Path(tmp_dir) / f"synthetic_{fs}Hz_{duration:g}s.WAV"
+                click_times = write_click_wav(wav_path, fs, duration, seed=seed)
+                num_samples = int(round(duration * fs))
+
+                for stage in stages:
+                    # A new process per stage, so ru_maxrss is the peak of this stage only
+                    with ProcessPoolExecutor(max_workers=1) as executor:
+                        seconds, peak_rss, event_times = executor.submit(
+                            _run_stage, stage, wav_path, config, repeat, len(click_times)).result()
+
+                    result = {
+                        "stage": stage,
+                        "fs": fs,
+                        "duration_seconds": duration,
+                        "seconds": seconds,
+                        "samples_per_sec": num_samples / seconds,
+                        "realtime_factor": duration / seconds,
+                        "peak_rss_mb": peak_rss,
+                        "recall": None,
+                        "precision": None,
+                    }
+                    if event_times is not None:
+                        result.update(match_events(event_times, click_times, tolerance))
+                    report["results"].append(result)
+
+                    print(f"{stage:>14} {fs:>7} Hz {duration:>7g} s: {seconds:8.3f} s, "
+                          f"{result['realtime_factor']:9.1f}x realtime, "
+                          f"recall={_format_score(result['recall'])}, "
+                          f"precision={_format_score(result['precision'])}")
+    return report
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark click detection on synthetic recordings.")
+    parser.add_argument("--rates", type=int, nargs="+", default=[44100, 96000, 192000],
+                        help="Sample rates in Hz (default: 44100 96000 192000).")
+    parser.add_argument("--durations", type=float, nargs="+", default=[10, 60],
+                        help="Recording lengths in seconds (default: 10 60).")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES,
+                        help="Stages to run (default: all).")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Timed runs per stage; the fastest is reported (default: 3).")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic recordings.")
+    parser.add_argument("--output", type=str, default=None,
+                        help="JSON output file (default: benchmarks/results/detection_<timestamp>.json).")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = benchmark(args.rates, args.durations, repeat=args.repeat, seed=args.seed, stages=args.stages)
+
+    output = Path(args.output) if args.output else \
+        RESULTS_DIR / f"detection_{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved benchmark results to {output}")
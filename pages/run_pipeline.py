@@ -1,11 +1,10 @@
 import streamlit as st
-import subprocess
-import sys
-import os
 import zipfile
 import io
 from pathlib import Path
 from src.data.report import gerar_relatorio_pdf
+from src.config.config_loader import load_config
+from src.pipeline import pipeline
 import yaml
 
 IMAGE_PATH = Path("data/figures/comparison")
@@ -15,36 +14,30 @@ METADATA_PATH = Path("data/metadata")
 # if "pipeline_concluida" not in st.session_state:
 st.session_state.pipeline_concluida = False
 
-def run_pipeline():
-    steps = [
-        ("[1/4] Detecting clicks in raw WAV files...",
-         [sys.executable, "src/detection/click_detection_batch.py", st.session_state.diretorio_final_selecionado]),
-        ("[2/4] Aggregating detections for reference...",
-         [sys.executable, "src/aggregation/aggregate_detections_batch.py", "reference_detections"]),
-        ("[2/4] Aggregating detections for model...",
-         [sys.executable, "src/aggregation/aggregate_detections_batch.py", "model_detections"]),
-        ("[3/4] Concatenating aggregated results for reference...",
-         [sys.executable, "src/aggregation/join_aggregated_files.py", "reference_detections"]),
-        ("[3/4] Concatenating aggregated results for model...",
-         [sys.executable, "src/aggregation/join_aggregated_files.py", "model_detections"]),
-        ("[4/4] Generating comparison plots...",
-         [sys.executable, "src/visualization/plot_detection_comparison.py"]),
-    ]
-
+def run_pipeline(force=False):
     progress_bar = st.progress(0)
-    total = len(steps)
 
-    for i, (msg, cmd) in enumerate(steps, start=1):
+    def mostrar_progresso(msg, fracao):
         st.write(msg)
-        try:
-            subprocess.run(cmd, check=True)
-        except subprocess.CalledProcessError as e:
-            st.error(f"❌ Error during execution: {msg}")
-            st.exception(e)
-            return
-
-        progress_bar.progress(i / total)
+        progress_bar.progress(fracao)
+
+    # Executa todas as etapas no mesmo processo; os CSVs intermediários são salvos
+    # em data/metadata para o ZIP de resultados
+    try:
+        resultado = pipeline.run(
+            st.session_state.diretorio_final_selecionado,
+            load_config(),
+            persist=True,
+            force=force,
+            progress=mostrar_progresso,
+        )
+    except Exception as e:
+        st.error("❌ Error during pipeline execution")
+        st.exception(e)
+        return
 
+    tempos = ", ".join(f"{etapa}: {seg:.1f} s" for etapa, seg in resultado["timings"].items())
+    st.caption(f"⏱ {tempos}")
     st.success("✅ Pipeline completed successfully!")
     st.session_state.pipeline_concluida = True
 
@@ -101,10 +94,12 @@ if "diretorio_final_selecionado" not in st.session_state:
 else:
     st.info(f"📂 Directory selected: {st.session_state.diretorio_final_selecionado}")
 
+    force_rerun = st.checkbox("Force full re-run (ignore unchanged files)", value=False)
+
     if st.button("🚀 Run Pipeline"):
         st.write("This process may take a few minutes to complete.")
         with st.spinner("Running pipeline..."):
-            run_pipeline()
+            run_pipeline(force=force_rerun)
 
 # Exibe resultados se a pipeline foi concluída
 if st.session_state.pipeline_concluida:
@@ -4,51 +4,173 @@ from pathlib import Path
 import pandas as pd
 import numpy as np
 from src.config.config_loader import load_config
+from src.data.event_io import load_events, save_aggregated
 
-def aggregate_event_file(events_csv_path: Path, window_size: float, output_csv_path: Path = None):
+def _num_windows(window_index: np.ndarray, window_size: float, duration: float = None) -> int:
+    """Windows covering the recording (if its duration is known) and every event."""
+    num_windows = int(window_index.max()) + 1 if len(window_index) else 0
+    if duration is not None:
+        num_windows = max(num_windows, int(np.ceil(duration / window_size)))
+    return num_windows
+
+
+def count_windows(event_times_per_file, window_size: float, durations=None) -> list:
     """
-    Aggregates click events over a defined window and saves to CSV.
+    Count events per window for many recordings with a single np.bincount call.
+
+    The window indices of all recordings are shifted into one contiguous range
+    (recording i starts where recording i-1 ends) and counted together.
 
     Args:
-        events_csv_path (Path): Path to *_events.csv file.
+        event_times_per_file (list[array-like]): Event times in seconds, one array per recording.
         window_size (float): Time window size for aggregation (in seconds).
-        output_csv_path (Path, optional): If not provided, replaces '_events.csv' with '_aggregated.csv'
-                                          in the same directory.
+        durations (list[float | None], optional): Recording durations in seconds. With a
+            duration, counts cover the whole recording, including trailing empty windows;
+            without one, they stop at the last window with an event.
+
+    Returns:
+        list[np.ndarray]: Event count per window, one array per recording.
     """
-    if not events_csv_path.exists():
-        print(f"[Warning] File not found: {events_csv_path}")
-        return
+    if durations is None:
+        durations = [None] * len(event_times_per_file)
 
-    df = pd.read_csv(events_csv_path)
+    window_indices = [(np.asarray(times, dtype=float) // window_size).astype(np.int64)
+                      for times in event_times_per_file]
+    lengths = [_num_windows(index, window_size, duration)
+               for index, duration in zip(window_indices, durations)]
+    offsets = np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)])
 
-    if "Event_Time_Seconds" not in df.columns:
-        print(f"[Error] Column 'Event_Time_Seconds' not found in {events_csv_path.name}")
-        return
+    shifted = [index + offset for index, offset in zip(window_indices, offsets[:-1])]
+    all_indices = np.concatenate(shifted) if shifted else np.zeros(0, dtype=np.int64)
+    counts = np.bincount(all_indices, minlength=int(offsets[-1]))
+    return [counts[start:stop] for start, stop in zip(offsets[:-1], offsets[1:])]
+
+
+def counts_to_frame(counts: np.ndarray, window_size: float) -> pd.DataFrame:
+    """Build the 'start_time_sec' / 'event_count' table from per-window counts."""
+    return pd.DataFrame({
+        "start_time_sec": np.arange(len(counts)) * window_size,
+        "event_count": np.asarray(counts).astype(int),
+    })
+
+
+def aggregate_files(event_times_per_file, window_sizes, durations=None) -> dict:
+    """
+    Aggregate many recordings for one or more window sizes.
+
+    Args:
+        event_times_per_file (list[array-like]): Event times in seconds, one array per recording.
+        window_sizes (list[float]): Window sizes in seconds.
+        durations (list[float | None], optional): Recording durations (see `count_windows`).
+
+    Returns:
+        dict: {window size: [aggregated DataFrame per recording]}.
+    """
+    return {
+        window_size: [counts_to_frame(counts, window_size)
+                      for counts in count_windows(event_times_per_file, window_size, durations)]
+        for window_size in window_sizes
+    }
+
+
+def aggregate_events(df: pd.DataFrame, window_size: float, duration: float = None) -> pd.DataFrame:
+    """
+    Counts click events per time window.
+
+    Args:
+        df (pd.DataFrame): Events with an 'Event_Time_Seconds' column.
+        window_size (float): Time window size for aggregation (in seconds).
+        duration (float, optional): Recording duration in seconds; windows then cover the
+                                    whole recording instead of stopping at the last event.
 
-    # Assign each event to a time window
-    df["window_index"] = (df["Event_Time_Seconds"] // window_size).astype(int)
+    Returns:
+        pd.DataFrame: Columns 'start_time_sec' and 'event_count'.
+    """
+    counts = count_windows([df["Event_Time_Seconds"].to_numpy()], window_size, [duration])[0]
+    return counts_to_frame(counts, window_size)
+
+
+class WindowCounter:
+    """
+    Per-window event counts accumulated while events are being detected.
+
+    Holds one integer per window (O(windows) memory), so a recording can be
+    aggregated without keeping or writing its individual event times. Counts from
+    separate parts of a recording (e.g., shards) are combined with `merge`.
+    `to_frame` gives the same table as `aggregate_events` on all the events.
+    """
+
+    def __init__(self, window_size: float):
+        self.window_size = window_size
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    def _grow(self, size: int):
+        if size > len(self.counts):
+            self.counts = np.concatenate([self.counts, np.zeros(size - len(self.counts), dtype=np.int64)])
+
+    def add(self, event_times):
+        """Count a batch of event times (in seconds)."""
+        window_index = (np.asarray(event_times) // self.window_size).astype(int)
+        if len(window_index) == 0:
+            return
+        first = window_index.min()
+        block_counts = np.bincount(window_index - first)
+        self._grow(first + len(block_counts))
+        self.counts[first:first + len(block_counts)] += block_counts
+
+    def remove(self, event_times):
+        """Uncount event times counted by `add` (e.g., a click split between two shards)."""
+        window_index = (np.asarray(event_times) // self.window_size).astype(int)
+        np.subtract.at(self.counts, window_index, 1)
+
+    def merge(self, other: "WindowCounter"):
+        """Add the counts of another counter with the same window size."""
+        self._grow(len(other.counts))
+        self.counts[:len(other.counts)] += other.counts
+
+    def to_frame(self, duration: float = None) -> pd.DataFrame:
+        """
+        Args:
+            duration (float, optional): Recording duration in seconds (see `aggregate_events`).
 
-    # Count number of events per window
-    agg_df = df.groupby("window_index").size().reset_index(name="event_count")
-    agg_df["start_time_sec"] = agg_df["window_index"] * window_size
+        Returns:
+            pd.DataFrame: Columns 'start_time_sec' and 'event_count'.
+        """
+        num_windows = _num_windows(np.flatnonzero(self.counts), self.window_size, duration)
+        self._grow(num_windows)
+        return counts_to_frame(self.counts[:num_windows], self.window_size)
 
-    # Create a complete index of all possible windows from min to max
-    min_index = 0 #df["window_index"].min()
-    max_index = df["window_index"].max()
-    full_index = pd.DataFrame({"window_index": range(min_index, max_index + 1)})
-    full_index["start_time_sec"] = full_index["window_index"] * window_size
 
-    # Merge with actual data and fill missing windows with event_count = 0
-    agg_df = pd.merge(full_index, agg_df, on=["window_index", "start_time_sec"], how="left")
-    agg_df["event_count"] = agg_df["event_count"].fillna(0).astype(int)
+def aggregate_event_file(events_csv_path: Path, window_size: float, output_csv_path: Path = None):
+    """
+    Aggregates click events over a defined window and saves the counts.
+
+    Both event formats (*_events.npz and *_events.csv) are read natively; the output
+    format follows the suffix of `output_csv_path`. If the recording duration is stored
+    with the events, the counts cover the whole recording.
+
+    Args:
+        events_csv_path (Path): Path to *_events.npz or *_events.csv file.
+        window_size (float): Time window size for aggregation (in seconds).
+        output_csv_path (Path, optional): If not provided, replaces '_events' with '_aggregated'
+                                          in the same directory, keeping the input format.
+    """
+    if not events_csv_path.exists():
+        print(f"[Warning] File not found: {events_csv_path}")
+        return
+
+    try:
+        event_times, metadata = load_events(events_csv_path)
+    except ValueError as e:
+        print(f"[Error] {e}")
+        return
 
-    # Order and format
-    agg_df = agg_df[["start_time_sec", "event_count"]]
+    agg_df = aggregate_events(pd.DataFrame({"Event_Time_Seconds": event_times}), window_size,
+                              duration=metadata.get("duration_seconds"))
 
     # Default output path
     if output_csv_path is None:
-        output_csv_path = events_csv_path.with_name(events_csv_path.name.replace("_events.csv", "_aggregated.csv"))
+        output_csv_path = events_csv_path.with_name(events_csv_path.name.replace("_events.", "_aggregated."))
 
-    output_csv_path.parent.mkdir(parents=True, exist_ok=True)
-    agg_df.to_csv(output_csv_path, index=False)
+    save_aggregated(agg_df, output_csv_path)
     print(f"[Info] Aggregated file saved to: {output_csv_path}")
@@ -3,7 +3,6 @@
 import sys
 import argparse
 from pathlib import Path
-import pandas as pd
 
 # === Step 1: Detect project root and add to sys.path ===
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
@@ -12,7 +11,11 @@ if str(PROJECT_ROOT) not in sys.path:
 
 # === Step 2: Project imports ===
 from src.config.config_loader import load_config
-from src.aggregation.aggregate_detections import aggregate_event_file
+from src.config.config_helpers import get_output_format, get_base_resolution
+from src.aggregation.aggregate_detections import aggregate_files
+from src.aggregation.count_index import CountIndex, get_index_path
+from src.data.event_io import find_files, get_output_path, load_events, save_aggregated
+from src.utils.manifest import Manifest
 
 # === Step 3: CLI argument parser ===
 def parse_args():
@@ -21,36 +24,123 @@ def parse_args():
         "source_folder",
         type=str,
         choices=["model_detections", "reference_detections"],
-        help="Name of the folder under data/metadata/ containing *_events.csv files to aggregate."
+        help="Name of the folder under data/metadata/ containing *_events.npz/.csv files to aggregate."
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Re-aggregate every file, even if its events and window size are unchanged."
     )
     return parser.parse_args()
 
 # === Step 4: Main logic ===
-def main():
-    args = parse_args()
-    config = load_config()
-    window_size = config["aggregation"]["window_size"]
+def _load_trial_events(files):
+    """Load the events of a trial's files: (file path, segment name, times, duration) per readable file."""
+    loaded = []
+    for file_path in files:
+        try:
+            event_times, metadata = load_events(file_path)
+        except ValueError as e:
+            print(f"[Error] {e}")
+            continue
+        segment = file_path.name.rsplit("_events.", 1)[0]
+        loaded.append((file_path, segment, event_times, metadata.get("duration_seconds")))
+    return loaded
+
+
+def aggregate_folder(source_folder: str, window_size: float, force: bool = False, fmt: str = "npz",
+                     base_resolution: float = 0.005):
+    """
+    Aggregate every *_events.npz / *_events.csv file under data/metadata/<source_folder>.
+
+    A count index (see `CountIndex`) is kept per trial folder and rebuilt only when
+    the trial's event files change. Aggregated files for a new window size are then
+    answered from the index without reading the events again; window sizes the index
+    cannot answer are counted from the events in a single np.bincount pass. Counts
+    cover each recording's full duration when it is stored with the events.
+
+    Args:
+        source_folder (str): 'model_detections' or 'reference_detections'.
+        window_size (float): Aggregation window size in seconds.
+        force (bool): Ignore the manifest and re-aggregate every file.
+        fmt (str): Output format of the aggregated files ('npz' or 'csv').
+        base_resolution (float): Finest window size of the count index, in seconds.
+    """
+    manifest = Manifest()
+    params = {"window_size": window_size}
+    index_params = {"base_resolution": base_resolution}
 
     # Resolve input directory based on user argument
-    base_dir = PROJECT_ROOT / "data" / "metadata" / args.source_folder
-    event_files = list(base_dir.rglob("*_events.csv"))
+    base_dir = PROJECT_ROOT / "data" / "metadata" / source_folder
+    event_files = find_files(base_dir, "events")
 
     if not event_files:
-        print(f"No *_events.csv files found in {base_dir}.")
+        print(f"No *_events files found in {base_dir}.")
         return
 
-    print(f"Found {len(event_files)} event files in {args.source_folder}...\n")
+    print(f"Found {len(event_files)} event files in {source_folder}...\n")
 
+    trials = {}
     for file_path in event_files:
-        print(f"Aggregating {file_path.name}")
-        # aggregated_df = aggregate_event_file(file_path, window_size)
-        aggregate_event_file(file_path, window_size)
-
-        # Save output with _aggregated suffix
-        output_path = file_path.with_name(file_path.stem.replace("_events", "_aggregated") + ".csv")
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        # aggregated_df.to_csv(output_path, index=False)
-        print(f"Saved to: {output_path}\n")
+        trials.setdefault(file_path.parent, []).append(file_path)
+
+    for trial_folder, files in trials.items():
+        # Count index of the trial: reused while its event files are unchanged
+        index_path = get_index_path(trial_folder)
+        loaded = None
+        if not force and manifest.is_up_to_date("count_index", index_path, files, index_params):
+            index = CountIndex.load(index_path)
+        else:
+            loaded = _load_trial_events(files)
+            index = CountIndex.build([segment for _, segment, _, _ in loaded],
+                                     [times for _, _, times, _ in loaded],
+                                     [duration for _, _, _, duration in loaded],
+                                     base_resolution=base_resolution)
+            index.save(index_path)
+            manifest.record("count_index", index_path, [file_path for file_path, _, _, _ in loaded],
+                            index_params)
+            print(f"Count index saved to: {index_path}")
+
+        stale = []
+        for file_path in files:
+            # Save output with _aggregated suffix
+            stem = file_path.name.rsplit("_events.", 1)[0]
+            output_path = get_output_path(file_path.parent, stem, "aggregated", fmt)
+
+            if not force and manifest.is_up_to_date("aggregation", output_path, [file_path], params):
+                print(f"Unchanged, skipping {file_path.name}\n")
+                continue
+            if stem in index.segments:
+                stale.append((file_path, stem, output_path))
+        if not stale:
+            continue
+
+        if index.supports(window_size):
+            segment_counts = dict(index.query(window_size))
+            aggregated = [segment_counts[stem] for _, stem, _ in stale]
+        else:
+            # Not a multiple of the base resolution: count all changed files from their events
+            if loaded is None:
+                loaded = _load_trial_events([file_path for file_path, _, _ in stale])
+            events = {segment: (times, duration) for _, segment, times, duration in loaded}
+            aggregated = aggregate_files([events[stem][0] for _, stem, _ in stale], [window_size],
+                                         [events[stem][1] for _, stem, _ in stale])[window_size]
+
+        for (file_path, _, output_path), agg_df in zip(stale, aggregated):
+            print(f"Aggregating {file_path.name}")
+            save_aggregated(agg_df, output_path)
+            manifest.record("aggregation", output_path, [file_path], params)
+            print(f"Saved to: {output_path}\n")
+
+    manifest.save()
+
+
+def main():
+    args = parse_args()
+    config = load_config()
+    window_size = config["aggregation"]["window_size"]
+    aggregate_folder(args.source_folder, window_size, force=args.force, fmt=get_output_format(config),
+                     base_resolution=get_base_resolution(config))
 
 
 if __name__ == "__main__":
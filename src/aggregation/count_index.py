@@ -0,0 +1,241 @@
+# src/aggregation/count_index.py
+
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from src.aggregation.aggregate_detections import counts_to_frame
+from src.data.event_io import find_files
+
+# Coarse levels (in seconds) stored as dense prefix sums
+LEVELS = (1, 10, 60, 3600)
+
+# Events closer than this (in base bins) to a base bin edge are kept as exact times
+BOUNDARY_TOLERANCE = 1e-4
+
+
+def _multiple_of(window_size: float, resolution: float):
+    """Return m if window_size == m * resolution (m >= 1, up to rounding), else None."""
+    ratio = window_size / resolution
+    m = int(round(ratio))
+    if m >= 1 and abs(ratio - m) <= 1e-12 * ratio:
+        return m
+    return None
+
+
+class CountIndex:
+    """
+    Multi-resolution cumulative event counts for the recordings (segments) of one trial.
+
+    Each segment stores prefix sums of its event counts at a fine base resolution
+    (sparse: only bins holding events) and at the coarse LEVELS (dense). Counts for
+    any window size that is a multiple of the base resolution are then obtained by
+    differencing prefix sums at the window boundaries, in O(windows), without reading
+    the event files again. The result is the table `aggregate_events` gives.
+
+    An event lying on a base bin edge (e.g., a detector frame time when the base is the
+    frame length) could fall on either side of a window edge depending on rounding, so
+    such events are kept as exact times and assigned with the same `t // window_size`
+    rule as `aggregate_events`.
+    """
+
+    def __init__(self, segments, durations, last_times, base_resolution: float,
+                 base_bins, base_prefix, base_offsets, boundary_times, boundary_offsets,
+                 level_prefix: dict, level_offsets: dict):
+        self.segments = list(segments)
+        self.durations = np.asarray(durations, dtype=float)
+        self.last_times = np.asarray(last_times, dtype=float)
+        self.base_resolution = float(base_resolution)
+        self.base_bins = base_bins
+        self.base_prefix = base_prefix
+        self.base_offsets = base_offsets
+        self.boundary_times = boundary_times
+        self.boundary_offsets = boundary_offsets
+        self.level_prefix = level_prefix
+        self.level_offsets = level_offsets
+
+    @classmethod
+    def build(cls, segments, event_times_per_file, durations=None, base_resolution: float = 0.005):
+        """
+        Build the index from the event times of each segment.
+
+        Args:
+            segments (list[str]): Segment names, in recording order.
+            event_times_per_file (list[array-like]): Event times in seconds, one array per segment.
+            durations (list[float | None], optional): Segment durations in seconds.
+            base_resolution (float): Finest window size in seconds.
+
+        Returns:
+            CountIndex
+        """
+        if durations is None:
+            durations = [None] * len(segments)
+        times = [np.sort(np.asarray(t, dtype=float)) for t in event_times_per_file]
+        durations = [np.nan if d is None else d for d in durations]
+        last_times = [t[-1] if len(t) else np.nan for t in times]
+
+        # Base level: bins that hold events and the number of events before each of them;
+        # events on a bin edge are kept apart with their exact times
+        base_bins, base_prefix, base_offsets = [], [], [0]
+        boundary_times, boundary_offsets = [], [0]
+        for t in times:
+            position = t / base_resolution
+            fraction = position - np.floor(position)
+            on_edge = (fraction < BOUNDARY_TOLERANCE) | (fraction > 1 - BOUNDARY_TOLERANCE)
+            bins, counts = np.unique(np.floor(position[~on_edge]).astype(np.int64), return_counts=True)
+            base_bins.append(bins)
+            base_prefix.append(np.concatenate([[0], np.cumsum(counts)]))
+            base_offsets.append(base_offsets[-1] + len(bins))
+            boundary_times.append(t[on_edge])
+            boundary_offsets.append(boundary_offsets[-1] + int(on_edge.sum()))
+
+        # Coarse levels: dense prefix sums over the whole segment
+        level_prefix, level_offsets = {}, {}
+        for level in LEVELS:
+            prefixes, offsets = [], [0]
+            for t, duration in zip(times, durations):
+                index = (t // level).astype(np.int64)
+                num_bins = int(index.max()) + 1 if len(index) else 0
+                if not np.isnan(duration):
+                    num_bins = max(num_bins, int(np.ceil(duration / level)))
+                prefixes.append(np.concatenate([[0], np.cumsum(np.bincount(index, minlength=num_bins))]))
+                offsets.append(offsets[-1] + num_bins + 1)
+            level_prefix[level] = np.concatenate(prefixes).astype(np.int64)
+            level_offsets[level] = np.asarray(offsets, dtype=np.int64)
+
+        return cls(
+            segments, durations, last_times, base_resolution,
+            np.concatenate(base_bins).astype(np.int64) if base_bins else np.zeros(0, dtype=np.int64),
+            np.concatenate(base_prefix).astype(np.int64) if base_prefix else np.zeros(0, dtype=np.int64),
+            np.asarray(base_offsets, dtype=np.int64),
+            np.concatenate(boundary_times) if boundary_times else np.zeros(0),
+            np.asarray(boundary_offsets, dtype=np.int64),
+            level_prefix, level_offsets,
+        )
+
+    def supports(self, window_size: float) -> bool:
+        """True if `window_size` is a multiple of the base resolution."""
+        return _multiple_of(window_size, self.base_resolution) is not None
+
+    def _num_windows(self, i: int, window_size: float) -> int:
+        num_windows = 0 if np.isnan(self.last_times[i]) else int(self.last_times[i] // window_size) + 1
+        if not np.isnan(self.durations[i]):
+            num_windows = max(num_windows, int(np.ceil(self.durations[i] / window_size)))
+        return num_windows
+
+    def counts(self, i: int, window_size: float) -> np.ndarray:
+        """
+        Event count per window of segment i.
+
+        Args:
+            i (int): Segment position.
+            window_size (float): Window size in seconds (a multiple of the base resolution).
+
+        Returns:
+            np.ndarray: Counts, covering the segment duration when it is known.
+        """
+        num_windows = self._num_windows(i, window_size)
+
+        for level in sorted(LEVELS, reverse=True):
+            m = _multiple_of(window_size, level)
+            if m is None:
+                continue
+            prefix = self.level_prefix[level][self.level_offsets[level][i]:self.level_offsets[level][i + 1]]
+            boundaries = np.minimum(np.arange(num_windows + 1) * m, len(prefix) - 1)
+            return np.diff(prefix[boundaries])
+
+        m = _multiple_of(window_size, self.base_resolution)
+        if m is None:
+            raise ValueError(f"Window size {window_size} s is not a multiple of the base resolution "
+                             f"{self.base_resolution} s")
+        bins = self.base_bins[self.base_offsets[i]:self.base_offsets[i + 1]]
+        prefix = self.base_prefix[self.base_offsets[i] + i:self.base_offsets[i + 1] + i + 1]
+        boundaries = np.arange(num_windows + 1) * m
+        counts = np.diff(prefix[np.searchsorted(bins, boundaries, side="left")])
+
+        on_edge = self.boundary_times[self.boundary_offsets[i]:self.boundary_offsets[i + 1]]
+        window_index = (on_edge // window_size).astype(np.int64)
+        counts += np.bincount(window_index, minlength=num_windows)[:num_windows]
+        return counts
+
+    def query(self, window_size: float) -> list:
+        """
+        Aggregated counts of every segment.
+
+        Returns:
+            list[tuple[str, pd.DataFrame]]: (segment name, 'start_time_sec'/'event_count'
+                                            DataFrame) pairs, in recording order.
+        """
+        return [(segment, counts_to_frame(self.counts(i, window_size), window_size))
+                for i, segment in enumerate(self.segments)]
+
+    def save(self, path: Path):
+        """Write the index to an uncompressed .npz file."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        arrays = {
+            "segments": np.asarray(self.segments, dtype=str),
+            "durations": self.durations,
+            "last_times": self.last_times,
+            "base_resolution": np.asarray(self.base_resolution),
+            "base_bins": self.base_bins,
+            "base_prefix": self.base_prefix,
+            "base_offsets": self.base_offsets,
+            "boundary_times": self.boundary_times,
+            "boundary_offsets": self.boundary_offsets,
+        }
+        for level in LEVELS:
+            arrays[f"level_{level}_prefix"] = self.level_prefix[level]
+            arrays[f"level_{level}_offsets"] = self.level_offsets[level]
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path: Path):
+        """Read an index written by `save`."""
+        with np.load(path) as data:
+            return cls(
+                data["segments"].tolist(), data["durations"], data["last_times"],
+                data["base_resolution"].item(), data["base_bins"], data["base_prefix"],
+                data["base_offsets"], data["boundary_times"], data["boundary_offsets"],
+                {level: data[f"level_{level}_prefix"] for level in LEVELS},
+                {level: data[f"level_{level}_offsets"] for level in LEVELS},
+            )
+
+
+def get_index_path(trial_folder: Path) -> Path:
+    """Path of the count index of a trial folder: <trial>/<trial>_count_index.npz"""
+    trial_folder = Path(trial_folder)
+    return trial_folder / f"{trial_folder.name}_count_index.npz"
+
+
+def load_current_index(trial_folder: Path, manifest):
+    """
+    Load the count index of a trial folder if it is current, else return None.
+
+    The index is current when the manifest records it as built from the trial's
+    event files as they are now. An index left over from an earlier run (e.g.,
+    before a streaming run rewrote the aggregated files without writing events)
+    is not used.
+
+    Args:
+        trial_folder (Path): Trial folder holding the index.
+        manifest (Manifest): Pipeline manifest.
+
+    Returns:
+        CountIndex | None
+    """
+    index_path = get_index_path(trial_folder)
+    entry = manifest.entries.get("count_index", {}).get(str(index_path))
+    if entry is None:
+        return None
+    event_files = [f for f in find_files(trial_folder, "events") if f.parent == Path(trial_folder)]
+    if not event_files or not manifest.is_up_to_date("count_index", index_path, event_files, entry["params"]):
+        return None
+    return CountIndex.load(index_path)
+
+
+def invalidate_index(trial_folder: Path, manifest):
+    """Delete the count index of a trial folder and its manifest entry."""
+    index_path = get_index_path(trial_folder)
+    index_path.unlink(missing_ok=True)
+    manifest.forget("count_index", index_path)
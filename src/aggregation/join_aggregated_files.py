@@ -13,59 +13,124 @@ if str(PROJECT_ROOT) not in sys.path:
 # === Step 2: Imports after sys.path update ===
 from src.config.config_loader import load_config
 from src.utils.paths import get_metadata_path
+from src.utils.manifest import Manifest
+from src.data.event_io import find_files, load_aggregated
+from src.aggregation.count_index import get_index_path, load_current_index
 
-def join_aggregated_files(metadata_type: str, window_size: float):
+def join_aggregated_frames(segments, window_size: float) -> pd.DataFrame:
     """
-    Join all *_aggregated.csv files for each trial folder within a metadata_type directory.
+    Concatenate the aggregated counts of consecutive recordings on one time axis.
+
+    Args:
+        segments (list[tuple[str, pd.DataFrame]]): (segment name, aggregated DataFrame) pairs,
+                                                   in recording order.
+        window_size (float): Aggregation window size in seconds.
+
+    Returns:
+        pd.DataFrame: Columns 'start_time_sec', 'event_count' and 'segment'.
+    """
+    time_offset = 0.0
+    joint_data = []
+
+    for segment_name, df in segments:
+        if df.empty:
+            continue
+        df = df.copy()
+
+        # Adjust time
+        df["start_time_sec"] += time_offset
+        df["segment"] = segment_name
+
+        # Mark last time bin as incomplete for possible interpolation in visualization
+        df.loc[df.index[-1], 'event_count'] = np.nan
+
+        joint_data.append(df)
+
+        # Update offset: last start_time + window_size
+        last_time = df["start_time_sec"].iloc[-1]
+        time_offset = last_time + window_size
+
+    if not joint_data:
+        return pd.DataFrame(columns=["start_time_sec", "event_count", "segment"])
+
+    # Concatenate all adjusted DataFrames
+    return pd.concat(joint_data, ignore_index=True)
+
+
+def join_inputs(trial_folder: Path, window_size: float, manifest: Manifest):
+    """
+    Files the joint counts of a trial are built from.
+
+    Args:
+        trial_folder (Path): Trial folder.
+        window_size (float): Aggregation window size in seconds.
+        manifest (Manifest): Pipeline manifest.
+
+    Returns:
+        tuple[CountIndex | None, list[Path]]: The trial's count index if it is current and
+                                              answers `window_size` (inputs: the index
+                                              file), else None and the aggregated files.
+    """
+    # Prefer the trial's count index, if current: any window size is answered without the aggregated files
+    index = load_current_index(trial_folder, manifest)
+    if index is not None and index.supports(window_size):
+        return index, [get_index_path(trial_folder)]
+    return None, [f for f in find_files(trial_folder, "aggregated") if f.parent == Path(trial_folder)]
+
+
+def join_aggregated_files(metadata_type: str, window_size: float, force: bool = False):
+    """
+    Join all *_aggregated.npz / *_aggregated.csv files for each trial folder within a metadata_type directory.
+
+    Trials with a current count index (written by the aggregation step from the trial's
+    present event files) are joined from it, so a new window size does not need
+    re-aggregated files. Trials whose inputs and window size match the pipeline
+    manifest are skipped.
 
     Args:
         metadata_type (str): 'model_detections' or 'reference_detections'
         window_size (float): Aggregation window size in seconds.
+        force (bool): Ignore the manifest and rejoin every trial.
     """
     base_path = get_metadata_path(metadata_type)
     if not base_path.exists():
         print(f"[Error] Path does not exist: {base_path}")
         return
 
+    manifest = Manifest()
+    params = {"window_size": window_size}
+
     # Traverse subfolders (e.g., Freq_Feeding/8x_Rep01)
     for trial_folder in sorted(base_path.glob("*/*")):
         if not trial_folder.is_dir():
             continue
 
-        aggregated_files = sorted(trial_folder.glob("*_aggregated.csv"))
-        if not aggregated_files:
+        index, inputs = join_inputs(trial_folder, window_size, manifest)
+        if not inputs:
             continue
 
-        print(f"\nJoining {len(aggregated_files)} files in {trial_folder.name}...")
-        time_offset = 0.0
-        joint_data = []
-
-        for file_path in aggregated_files:
-            df = pd.read_csv(file_path)
-            segment_name = file_path.stem.replace("_aggregated", "")
-
-            # Adjust time
-            df["start_time_sec"] += time_offset
-            df["segment"] = segment_name
-
-            # Mark last time bin as incomplete for possible interpolation in visualization
-            df.loc[df.index[-1], 'event_count'] = np.nan
-
-            joint_data.append(df)
-
-            # Update offset: last start_time + window_size
-            last_time = df["start_time_sec"].iloc[-1]
-            time_offset = last_time + window_size
+        output_filename = f"{trial_folder.name}_joint.csv"
+        output_path = trial_folder / output_filename
+        if not force and manifest.is_up_to_date("join", output_path, inputs, params):
+            print(f"\nUnchanged, skipping {trial_folder.name}")
+            continue
 
-        # Concatenate all adjusted DataFrames
-        df_joint = pd.concat(joint_data, ignore_index=True)
+        if index is not None:
+            print(f"\nJoining {trial_folder.name} from its count index...")
+            df_joint = join_aggregated_frames(index.query(window_size), window_size)
+        else:
+            print(f"\nJoining {len(inputs)} files in {trial_folder.name}...")
+            segments = [(file_path.stem.replace("_aggregated", ""), load_aggregated(file_path))
+                        for file_path in inputs]
+            df_joint = join_aggregated_frames(segments, window_size)
 
         # Save to same trial folder
-        output_filename = f"{trial_folder.name}_joint.csv"
-        output_path = trial_folder / output_filename
         df_joint.to_csv(output_path, index=False)
+        manifest.record("join", output_path, inputs, params)
         print(f"[Info] Saved joint CSV to: {output_path}")
 
+    manifest.save()
+
 def main():
     import argparse
     config = load_config()
@@ -74,9 +139,11 @@ def main():
     parser = argparse.ArgumentParser(description="Join aggregated detection files.")
     parser.add_argument("metadata_type", choices=["model_detections", "reference_detections"],
                         help="Specify folder under metadata (e.g., model_detections)")
+    parser.add_argument("--force", action="store_true",
+                        help="Rejoin every trial, even if its aggregated files are unchanged.")
     args = parser.parse_args()
 
-    join_aggregated_files(args.metadata_type, window_size)
+    join_aggregated_files(args.metadata_type, window_size, force=args.force)
 
 if __name__ == "__main__":
     main()
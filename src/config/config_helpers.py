@@ -1,5 +1,5 @@
 # config_helpers.py
-from typing import Tuple, Dict
+from typing import Tuple, Dict, List
 
 def get_band_limits(config: dict) -> Tuple[float, float]:
     """
@@ -33,6 +33,221 @@ def get_dsp_params(config: dict) -> Dict[str, float]:
         "threshold": detection.get("threshold", 0.005)
     }
 
+def get_block_duration(config: dict) -> float:
+    """
+    Get the duration of the audio blocks read from each open WAV file.
+
+    Args:
+        config (dict): Loaded configuration dictionary.
+
+    Returns:
+        float: Block duration in seconds.
+    """
+    return config.get("processing", {}).get("block_duration", 10.0)
+
+def get_prefetch_blocks(config: dict) -> int:
+    """
+    Retrieve how many audio blocks are decoded ahead of the DSP on a background thread.
+
+    Args:
+        config (dict): Loaded configuration dictionary.
+
+    Returns:
+        int: Prefetch queue depth (default: 1; 0 reads in the processing thread).
+    """
+    return max(0, int(config.get("processing", {}).get("prefetch_blocks", 1)))
+
+def get_audio_backend(config: dict) -> str:
+    """
+    Retrieve how WAV samples are read by the detector.
+
+    Args:
+        config (dict): Loaded configuration dictionary.
+
+    Returns:
+        str: 'auto' (default; memory-map PCM/float WAVs, soundfile otherwise) or 'soundfile'.
+    """
+    return config.get("processing", {}).get("audio_backend", "auto")
+
+def get_event_memory_limit(config: dict):
+    """
+    Retrieve the memory the detector may use to hold event frame indices before
+    spilling them to a temporary file.
+
+    Args:
+        config (dict): Loaded configuration dictionary.
+
+    Returns:
+        int | None: Limit in bytes (default: 64 MiB), or None to never spill.
+    """
+    limit_mb = config.get("processing", {}).get("event_memory_mb", 64)
+    return int(limit_mb * 1024 ** 2) if limit_mb else None
+
+def get_channels(config: dict):
+    """
+    Get the audio channels the detector processes.
+
+    Args:
+        config (dict): Loaded configuration dictionary.
+
+    Returns:
+        None | str | List[int]: None for the first channel only (default), 'all', or a
+                                list of 0-based channel indices (the first one feeds the
+                                main event output).
+    """
+    return config.get("processing", {}).get("channels")
+
+def get_num_shards(config: dict) -> int:
+    """
+    Get the number of time shards each WAV file is split into for parallel detection.
+
+    Args:
+        config (dict): Loaded configuration dictionary.
+
+    Returns:
+        int: Number of shards (1 disables intra-file parallelism).
+    """
+    return int(config.get("processing", {}).get("num_shards", 1))
+
+def get_dtype(config: dict) -> str:
+    """
+    Get the floating-point type of the detection DSP path.
+
+    Args:
+        config (dict): Loaded configuration dictionary.
+
+    Returns:
+        str: 'float64' (default) or 'float32'.
+    """
+    return config.get("processing", {}).get("dtype", "float64")
+
+def get_transform(config: dict) -> str:
+    """
+    Get the spectral transform used by the detector.
+
+    Args:
+        config (dict): Loaded configuration dictionary.
+
+    Returns:
+        str: 'stft' (default, full one-sided FFT per frame) or 'band_dft'
+             (only the bins inside detection.frequency_band; cost scales with
+             fs x band bins, so it is faster only for narrow bands).
+    """
+    return config.get("processing", {}).get("transform", "stft")
+
+def get_fft_workers(config: dict) -> int:
+    """
+    Get the number of threads used by each batched FFT call.
+
+    Args:
+        config (dict): Loaded configuration dictionary.
+
+    Returns:
+        int: Thread count (default: 1; files and shards are already run in parallel).
+    """
+    return int(config.get("processing", {}).get("fft_workers", 1))
+
+def get_energy_gate(config: dict) -> bool:
+    """
+    Check whether the detector skips the FFT of frames too quiet to reach the threshold.
+
+    Args:
+        config (dict): Loaded configuration dictionary.
+
+    Returns:
+        bool: True if the energy gate is enabled (default: False).
+    """
+    return bool(config.get("processing", {}).get("energy_gate", False))
+
+def get_odf_cache(config: dict) -> bool:
+    """
+    Check whether the per-frame ODF is saved next to the event files and re-thresholded
+    on later runs instead of being recomputed.
+
+    Args:
+        config (dict): Loaded configuration dictionary.
+
+    Returns:
+        bool: True if the ODF cache is enabled (default: False).
+    """
+    return bool(config.get("processing", {}).get("odf_cache", False))
+
+def get_detectors(config: dict) -> List[dict]:
+    """
+    Retrieve the named detectors evaluated alongside the main one (detection.detectors).
+
+    Missing fields default to the main detector's frequency band and threshold and to
+    the 'sf_hfc' ODF.
+
+    Args:
+        config (dict): Loaded configuration dictionary.
+
+    Returns:
+        List[dict]: One dict per detector with 'name', 'odf', 'threshold' and
+                    'frequency_band' ({'low', 'high'}); empty by default.
+    """
+    detection = config.get("detection", {})
+    detectors = []
+    for entry in detection.get("detectors") or []:
+        detectors.append({
+            "name": str(entry["name"]),
+            "odf": entry.get("odf", "sf_hfc"),
+            "threshold": entry.get("threshold", detection.get("threshold")),
+            "frequency_band": {**detection.get("frequency_band", {}), **entry.get("frequency_band", {})},
+        })
+    return detectors
+
+def get_compact_events(config: dict) -> bool:
+    """
+    Check whether runs of consecutive flagged frames are merged into one event.
+
+    Args:
+        config (dict): Loaded configuration dictionary.
+
+    Returns:
+        bool: True to write one (onset, offset, peak ODF) record per run (default: False,
+              one event per flagged frame).
+    """
+    return bool(config.get("detection", {}).get("compact_events", False))
+
+def get_refine_onsets(config: dict) -> bool:
+    """
+    Check whether each event also gets the sample-accurate time of its loudest sample.
+
+    Args:
+        config (dict): Loaded configuration dictionary.
+
+    Returns:
+        bool: True to add a 'Peak_Time_Seconds' column to the events (default: False).
+    """
+    return bool(config.get("detection", {}).get("refine_onsets", False))
+
+def get_click_features(config: dict) -> bool:
+    """
+    Check whether the spectral features of each event are computed during detection.
+
+    Args:
+        config (dict): Loaded configuration dictionary.
+
+    Returns:
+        bool: True to add Peak_Amplitude, Band_Energy, Spectral_Centroid_Hz and
+              Peak_Frequency_Hz columns to the events (default: False).
+    """
+    return bool(config.get("detection", {}).get("click_features", False))
+
+def get_coincidence_frames(config: dict):
+    """
+    Get the lag (in frames) within which detections on different channels coincide.
+
+    Args:
+        config (dict): Loaded configuration dictionary.
+
+    Returns:
+        int | None: Maximum lag in frames, or None (default) for no coincidence count.
+    """
+    frames = config.get("detection", {}).get("coincidence_frames")
+    return int(frames) if frames is not None else None
+
 def get_aggregation_window(config: dict) -> float:
     """
     Get the aggregation window size in seconds.
@@ -45,6 +260,34 @@ def get_aggregation_window(config: dict) -> float:
     """
     return config.get("aggregation", {}).get("window_size", 1.0)
 
+def get_streaming_aggregation(config: dict) -> bool:
+    """
+    Check whether detection counts events per aggregation window on the fly.
+
+    Args:
+        config (dict): Loaded configuration dictionary.
+
+    Returns:
+        bool: True if aggregated files are written by the detection step (default: False).
+    """
+    return bool(config.get("aggregation", {}).get("streaming", False))
+
+def get_base_resolution(config: dict) -> float:
+    """
+    Get the finest window size (in seconds) of the per-trial count index.
+
+    Args:
+        config (dict): Loaded configuration dictionary.
+
+    Returns:
+        float: aggregation.base_resolution, or the detector frame length
+               (processing.short_term_duration) if it is not set.
+    """
+    aggregation = config.get("aggregation", {})
+    if "base_resolution" in aggregation:
+        return float(aggregation["base_resolution"])
+    return float(config.get("processing", {}).get("short_term_duration", 0.005))
+
 def get_default_fs(config: dict) -> int:
     """
     Get the default sampling frequency.
@@ -58,3 +301,27 @@ def get_default_fs(config: dict) -> int:
         int: Sampling rate in Hz.
     """
     return config.get("audio", {}).get("default_fs", 44100)
+
+def get_output_format(config: dict) -> str:
+    """
+    Get the file format of event and aggregated outputs.
+
+    Args:
+        config (dict): Loaded configuration dictionary.
+
+    Returns:
+        str: 'npz' (columnar binary) or 'csv' (text export).
+    """
+    return config.get("output", {}).get("format", "npz")
+
+def get_save_events(config: dict) -> bool:
+    """
+    Check whether individual event times are written when aggregating on the fly.
+
+    Args:
+        config (dict): Loaded configuration dictionary.
+
+    Returns:
+        bool: True to also write *_events files (default: True).
+    """
+    return bool(config.get("output", {}).get("save_events", True))
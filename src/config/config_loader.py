@@ -16,17 +16,39 @@ DEFAULT_CONFIG = {
     },
     "processing": {
         "short_term_duration": 0.005,  # seconds
-        "mid_term_duration": 1.0       # seconds
+        "mid_term_duration": 1.0,      # seconds
+        "num_shards": 1,
+        "dtype": "float64",
+        "transform": "stft",
+        "fft_workers": 1,
+        "energy_gate": False,
+        "odf_cache": False,
+        "block_duration": 10.0,        # seconds
+        "prefetch_blocks": 1,
+        "audio_backend": "auto",
+        "event_memory_mb": 64,
+        "channels": None
     },
     "detection": {
         "threshold": 0.005,
         "frequency_band": {
             "low": 5000,
             "high": 22050
-        }
+        },
+        "detectors": [],
+        "compact_events": False,
+        "refine_onsets": False,
+        "click_features": False,
+        "coincidence_frames": None
     },
     "aggregation": {
-        "window_size": 1.0  # seconds
+        "window_size": 1.0,  # seconds
+        "base_resolution": 0.005,  # seconds
+        "streaming": False
+    },
+    "output": {
+        "format": "npz",  # 'npz' or 'csv'
+        "save_events": True
     }
 }
 
@@ -0,0 +1,302 @@
+# src/data/event_buffer.py
+
+import os
+import tempfile
+
+import numpy as np
+
+
+class EventBuffer:
+    """
+    Append-only store of event frame indices in fixed-size typed chunks.
+
+    Indices are copied into preallocated integer chunks (4 bytes per event for uint32)
+    instead of being kept as Python objects or per-block arrays, so memory grows by one
+    chunk at a time. Once the full chunks held in memory exceed `memory_limit` bytes,
+    they are appended to a spill file on disk and memory stays bounded whatever the
+    number of events. Indices are converted to seconds only on output (`to_seconds`).
+
+    A buffer can be pickled (e.g. returned by a worker process): its spill file is
+    passed by path, and whoever calls `close` or `extend` with it last removes it.
+    """
+
+    def __init__(self, dtype=np.uint32, chunk_size: int = 1 << 16, memory_limit: int = None,
+                 spill_dir=None):
+        self.dtype = np.dtype(dtype)
+        self.chunk_size = int(chunk_size)
+        self.memory_limit = memory_limit
+        self.spill_dir = spill_dir
+        self.chunks = []
+        self.current = np.empty(self.chunk_size, dtype=self.dtype)
+        self.num_current = 0
+        self.spill_path = None
+        self.num_spilled = 0
+
+    def __len__(self):
+        return self.num_spilled + len(self.chunks) * self.chunk_size + self.num_current
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["current"] = self.current[:self.num_current].copy()
+        return state
+
+    def __setstate__(self, state):
+        current = state.pop("current")
+        self.__dict__.update(state)
+        self.current = np.empty(self.chunk_size, dtype=self.dtype)
+        self.current[:len(current)] = current
+
+    def append(self, values):
+        """Append an array of frame indices."""
+        values = np.asarray(values)
+        while len(values):
+            n = min(len(values), self.chunk_size - self.num_current)
+            self.current[self.num_current:self.num_current + n] = values[:n]
+            self.num_current += n
+            values = values[n:]
+            if self.num_current == self.chunk_size:
+                self.chunks.append(self.current)
+                self.current = np.empty(self.chunk_size, dtype=self.dtype)
+                self.num_current = 0
+                if self.memory_limit is not None and \
+                        len(self.chunks) * self.chunk_size * self.dtype.itemsize > self.memory_limit:
+                    self._spill()
+
+    def add(self, frames, odf=None, amplitudes=None, samples=None, features=None) -> np.ndarray:
+        """Store the flagged frames of a block (same interface as `EventRuns.add`); returns them."""
+        self.append(frames)
+        return frames
+
+    def _spill(self):
+        """Move the full in-memory chunks to the end of the spill file."""
+        if self.spill_path is None:
+            fd, self.spill_path = tempfile.mkstemp(suffix="_events.bin", dir=self.spill_dir)
+            os.close(fd)
+        with open(self.spill_path, "ab") as f:
+            for chunk in self.chunks:
+                chunk.tofile(f)
+        self.num_spilled += len(self.chunks) * self.chunk_size
+        self.chunks = []
+
+    def iter_chunks(self):
+        """Yield the stored indices in order, one chunk at a time (spilled chunks memory-mapped)."""
+        if self.num_spilled:
+            spilled = np.memmap(self.spill_path, dtype=self.dtype, mode="r", shape=(self.num_spilled,))
+            for start in range(0, self.num_spilled, self.chunk_size):
+                yield spilled[start:start + self.chunk_size]
+        yield from self.chunks
+        if self.num_current:
+            yield self.current[:self.num_current]
+
+    def extend(self, other: "EventBuffer"):
+        """Append the indices of another buffer (e.g. the next shard), then close it."""
+        for chunk in other.iter_chunks():
+            self.append(chunk)
+        other.close()
+
+    def _output_array(self, dtype) -> np.ndarray:
+        """
+        Empty array for all the stored values. When the buffer has spilled, it is a
+        memory map of an anonymous temporary file, so it does not have to fit in memory.
+        """
+        if self.num_spilled:
+            with tempfile.TemporaryFile(dir=self.spill_dir) as f:
+                return np.memmap(f, dtype=dtype, mode="w+", shape=(len(self),))
+        return np.empty(len(self), dtype=dtype)
+
+    def to_array(self) -> np.ndarray:
+        """All stored values, in order."""
+        values = self._output_array(self.dtype)
+        position = 0
+        for chunk in self.iter_chunks():
+            values[position:position + len(chunk)] = chunk
+            position += len(chunk)
+        return values
+
+    def to_seconds(self, frame_length: int, fs: int) -> np.ndarray:
+        """Event times in seconds (index * frame_length / fs) as float64, computed chunk by chunk."""
+        times = self._output_array(np.float64)
+        position = 0
+        for chunk in self.iter_chunks():
+            out = times[position:position + len(chunk)]
+            np.multiply(chunk, frame_length, out=out, dtype=np.float64)
+            out /= fs
+            position += len(chunk)
+        return times
+
+    def close(self):
+        """Remove the spill file and empty the buffer."""
+        if self.spill_path is not None and os.path.exists(self.spill_path):
+            os.remove(self.spill_path)
+        self.spill_path = None
+        self.num_spilled = 0
+        self.chunks = []
+        self.num_current = 0
+
+
+def _run_argmax(values, starts, ends) -> np.ndarray:
+    """Index of the first largest value of each run values[starts[i]:ends[i] + 1]."""
+    run_max = np.maximum.reduceat(values, starts)
+    candidates = np.flatnonzero(values == np.repeat(run_max, ends - starts + 1))
+    return candidates[np.searchsorted(candidates, starts)]
+
+
+class EventRuns:
+    """
+    Click events as runs of consecutive flagged frames: (onset, offset, peak ODF) records.
+
+    A snap often exceeds the threshold on several consecutive frames; each run of them
+    becomes one record. Blocks are added in frame order and the last run is held open,
+    so a run crossing a block boundary (or a shard boundary, see `extend`) stays one
+    record. Records are kept in EventBuffers, with the same memory bound.
+
+    With `merge=False` every flagged frame is its own record (only its onset is kept).
+    With `refine`, each record also keeps the sample index and amplitude of its loudest
+    sample (over all frames of a run). Each name in `features` is a further column (e.g.
+    a spectral feature of the frame), taken from the frame of the run with the peak ODF.
+    """
+
+    def __init__(self, frame_dtype=np.uint32, odf_dtype=np.float64, memory_limit: int = None,
+                 merge: bool = True, refine: bool = False, features=()):
+        self.merge = merge
+        self.refine = refine
+        self.features = tuple(features)
+        self.columns = {"onset": EventBuffer(frame_dtype, memory_limit=memory_limit)}
+        if merge:
+            self.columns["offset"] = EventBuffer(frame_dtype, memory_limit=memory_limit)
+            self.columns["peak"] = EventBuffer(odf_dtype, memory_limit=memory_limit)
+        if refine:
+            self.columns["amplitude"] = EventBuffer(np.float64, memory_limit=memory_limit)
+            self.columns["sample"] = EventBuffer(np.int64, memory_limit=memory_limit)
+        for name in self.features:
+            self.columns[name] = EventBuffer(odf_dtype, memory_limit=memory_limit)
+        self.open = None
+
+    def __len__(self):
+        return len(self.columns["onset"]) + (self.open is not None)
+
+    def add(self, frames, odf, amplitudes=None, samples=None, features=None) -> np.ndarray:
+        """
+        Add the flagged frames of a block.
+
+        Args:
+            frames (np.ndarray): Flagged frame indices, sorted.
+            odf (np.ndarray): ODF value of each flagged frame.
+            amplitudes (np.ndarray, optional): Largest absolute sample of each flagged frame
+                                               (required with `refine`).
+            samples (np.ndarray, optional): Sample index of that sample.
+            features (dict, optional): Value of each of `features` per flagged frame.
+
+        Returns:
+            np.ndarray: Onset frames of the runs this block starts (not continued ones).
+        """
+        frames = np.asarray(frames)
+        if len(frames) == 0:
+            return frames
+        if self.merge:
+            # A run starts wherever the previous flagged frame is not the one just before
+            starts = np.concatenate(([0], np.flatnonzero(np.diff(frames) != 1) + 1))
+        else:
+            starts = np.arange(len(frames))
+        ends = np.append(starts[1:], len(frames)) - 1
+
+        record = {"onset": frames[starts]}
+        if self.merge:
+            record["offset"] = frames[ends]
+            record["peak"] = np.maximum.reduceat(odf, starts)
+        if self.refine:
+            loudest = _run_argmax(amplitudes, starts, ends)
+            record["amplitude"] = amplitudes[loudest]
+            record["sample"] = samples[loudest]
+        if self.features:
+            peak_frames = _run_argmax(odf, starts, ends) if self.merge else starts
+            for name in self.features:
+                record[name] = features[name][peak_frames]
+        return self.add_runs(record)
+
+    def add_runs(self, record: dict) -> np.ndarray:
+        """
+        Add runs that follow the stored ones ({column: values}); with `merge`, the first is
+        merged with the open run if it starts on the next frame.
+
+        Returns:
+            np.ndarray: Onset frames of the runs that were not merged.
+        """
+        record = {column: np.array(values) for column, values in record.items()}
+        onsets = record["onset"]
+        if len(onsets) == 0:
+            return onsets
+        started = onsets
+        if self.open is not None:
+            if self.merge and onsets[0] == self.open["offset"] + 1:
+                started = onsets[1:].copy()
+                onsets[0] = self.open["onset"]
+                if self.open["peak"] >= record["peak"][0]:
+                    for name in self.features:
+                        record[name][0] = self.open[name]
+                record["peak"][0] = max(record["peak"][0], self.open["peak"])
+                if self.refine and self.open["amplitude"] >= record["amplitude"][0]:
+                    record["amplitude"][0] = self.open["amplitude"]
+                    record["sample"][0] = self.open["sample"]
+            else:
+                self._store({column: [value] for column, value in self.open.items()})
+        self._store({column: values[:-1] for column, values in record.items()})
+        self.open = {column: values[-1] for column, values in record.items()}
+        return started
+
+    def _store(self, record: dict):
+        for column, values in record.items():
+            self.columns[column].append(values)
+
+    def extend(self, other: "EventRuns"):
+        """
+        Append the runs of the next part of the recording (e.g. the next shard), then close it.
+
+        Returns:
+            int | None: Onset frame of `other`'s first run if it continued the open run
+                        (it was counted as a separate click there), else None.
+        """
+        first_chunk = next(other.columns["onset"].iter_chunks(), None)
+        first_onset = first_chunk[0] if first_chunk is not None else \
+            (other.open["onset"] if other.open is not None else None)
+        continued = None
+        if self.merge and first_onset is not None and self.open is not None \
+                and first_onset == self.open["offset"] + 1:
+            continued = int(first_onset)
+
+        # Every column has the same length and chunk size, so their chunks line up
+        names = list(other.columns)
+        for chunks in zip(*(other.columns[column].iter_chunks() for column in names)):
+            self.add_runs(dict(zip(names, chunks)))
+        if other.open is not None:
+            self.add_runs({column: [value] for column, value in other.open.items()})
+        other.close()
+        return continued
+
+    def to_arrays(self, frame_length: int, fs: int) -> dict:
+        """
+        Close the open run and return the records.
+
+        Returns:
+            dict: 'onset' (and 'offset') frame times in seconds, 'peak' ODF values; with
+                  `refine`, 'sample' (time of the loudest sample, in seconds) and 'amplitude';
+                  and one entry per name in `features`.
+        """
+        if self.open is not None:
+            self._store({column: [value] for column, value in self.open.items()})
+            self.open = None
+        arrays = {}
+        for column, buffer in self.columns.items():
+            if column in ("onset", "offset"):
+                arrays[column] = buffer.to_seconds(frame_length, fs)
+            elif column == "sample":
+                arrays[column] = buffer.to_seconds(1, fs)
+            else:
+                arrays[column] = buffer.to_array()
+        return arrays
+
+    def close(self):
+        """Remove the spill files and empty the records."""
+        for buffer in self.columns.values():
+            buffer.close()
+        self.open = None
@@ -0,0 +1,210 @@
+# src/data/event_io.py
+
+import hashlib
+import json
+import zipfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Output formats for event and aggregated files ('npz' is columnar, 'csv' is for export)
+OUTPUT_FORMATS = ("npz", "csv")
+
+
+def config_hash(params: dict) -> str:
+    """Short, stable hash of the config values an output was produced with."""
+    return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def get_output_path(directory: Path, stem: str, kind: str, fmt: str) -> Path:
+    """
+    Build the path of an event or aggregated file.
+
+    Args:
+        directory (Path): Output folder.
+        stem (str): Recording name (WAV file stem).
+        kind (str): 'events' or 'aggregated'.
+        fmt (str): One of OUTPUT_FORMATS.
+
+    Returns:
+        Path: e.g. <directory>/<stem>_events.npz
+    """
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{fmt}', expected one of {OUTPUT_FORMATS}")
+    return Path(directory) / f"{stem}_{kind}.{fmt}"
+
+
+def get_detector_output_path(output_file: Path, name: str) -> Path:
+    """Path of a named detector's file next to the main one: <directory>/<name>/<file name>"""
+    output_file = Path(output_file)
+    return output_file.parent / name / output_file.name
+
+
+def find_files(base_dir: Path, kind: str) -> list:
+    """
+    Find every *_<kind>.npz / *_<kind>.csv file under base_dir.
+
+    When a recording has both, the .npz file is returned.
+
+    Returns:
+        list[Path]: Sorted file paths.
+    """
+    found = {}
+    for fmt in reversed(OUTPUT_FORMATS):
+        for path in Path(base_dir).rglob(f"*_{kind}.{fmt}"):
+            found[path.with_suffix("")] = path
+    return sorted(found.values())
+
+
+def _memmap_npz_member(path: Path, name: str):
+    """
+    Memory-map one array of an uncompressed .npz file, or return None if it is compressed.
+    """
+    with zipfile.ZipFile(path) as zf:
+        info = zf.getinfo(f"{name}.npy")
+    if info.compress_type != zipfile.ZIP_STORED:
+        return None
+
+    with open(path, "rb") as f:
+        # Skip the local file header: 30 fixed bytes + file name + extra field
+        f.seek(info.header_offset + 26)
+        name_len, extra_len = np.frombuffer(f.read(4), dtype="<u2")
+        f.seek(info.header_offset + 30 + int(name_len) + int(extra_len))
+
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+
+    if shape == (0,) or shape == ():
+        return None
+    return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape,
+                     order="F" if fortran_order else "C")
+
+
+def _npz_member_shape(data, name: str) -> tuple:
+    """Shape of one array of an open .npz file, read from its header only."""
+    with data.zip.open(f"{name}.npy") as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            return np.lib.format.read_array_header_1_0(f)[0]
+        return np.lib.format.read_array_header_2_0(f)[0]
+
+
+def save_events(event_times, output_file: Path, metadata: dict, columns: dict = None):
+    """
+    Save event timestamps and the recording metadata.
+
+    .npz files hold float64 'event_time_seconds' plus the metadata in one
+    uncompressed (memory-mappable) archive. .csv files keep the original layout:
+    an 'Event_Time_Seconds' column and a .meta text file with the duration.
+
+    Args:
+        event_times (array-like): Event times in seconds.
+        output_file (Path): Destination (*.npz or *.csv).
+        metadata (dict): 'duration_seconds', 'fs' and 'config_hash' (missing keys are skipped).
+        columns (dict, optional): Further per-event arrays, {CSV column name: values};
+                                  stored in .npz files under the lower-cased name.
+    """
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    event_times = np.asarray(event_times, dtype=np.float64)
+    columns = columns or {}
+
+    if output_file.suffix == ".npz":
+        extra = {key: np.asarray(value) for key, value in metadata.items() if value is not None}
+        extra.update({name.lower(): np.asarray(values) for name, values in columns.items()})
+        np.savez(output_file, event_time_seconds=event_times, **extra)
+        return
+
+    pd.DataFrame({"Event_Time_Seconds": event_times, **columns}).to_csv(output_file, index=False)
+    if metadata.get("duration_seconds") is not None:
+        with open(output_file.with_suffix('.meta'), 'w') as meta_f:
+            meta_f.write(f"Duration_Seconds: {metadata['duration_seconds']:.3f}\n")
+
+
+def load_events(events_file: Path, mmap: bool = True):
+    """
+    Load event timestamps and metadata written by `save_events` (or a reference CSV).
+
+    Args:
+        events_file (Path): *_events.npz or *_events.csv file.
+        mmap (bool): Memory-map the timestamps of uncompressed .npz files.
+
+    Returns:
+        tuple[np.ndarray, dict]: Event times in seconds and the metadata found
+                                 ('duration_seconds', 'fs', 'config_hash'). Further
+                                 per-event columns are not loaded.
+    """
+    events_file = Path(events_file)
+
+    if events_file.suffix == ".npz":
+        with np.load(events_file) as data:
+            # Metadata are the scalar members; per-event columns are skipped unread
+            metadata = {key: data[key].item() for key in data.files
+                        if key != "event_time_seconds" and _npz_member_shape(data, key) == ()}
+            times = _memmap_npz_member(events_file, "event_time_seconds") if mmap else None
+            if times is None:
+                times = data["event_time_seconds"]
+        return times, metadata
+
+    df = pd.read_csv(events_file)
+    if "Event_Time_Seconds" not in df.columns:
+        raise ValueError(f"Column 'Event_Time_Seconds' not found in {events_file.name}")
+
+    metadata = {}
+    meta_file = events_file.with_suffix('.meta')
+    if meta_file.exists():
+        with open(meta_file) as meta_f:
+            for line in meta_f:
+                if line.startswith("Duration_Seconds:"):
+                    metadata["duration_seconds"] = float(line.split(":", 1)[1])
+    return df["Event_Time_Seconds"].to_numpy(dtype=np.float64), metadata
+
+
+def get_odf_path(directory: Path, stem: str) -> Path:
+    """Path of the cached per-frame ODF of a recording: <directory>/<stem>_odf.npy"""
+    return Path(directory) / f"{stem}_odf.npy"
+
+
+def create_odf(output_file: Path, num_frames: int, dtype) -> np.ndarray:
+    """
+    Create a per-frame ODF curve as a plain .npy file and memory-map it for writing.
+
+    The curve is filled in place (e.g., each shard writing its own frame range via
+    `load_odf(..., writable=True)`), so it is never held in memory as a whole.
+    """
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    return np.lib.format.open_memmap(output_file, mode="w+", dtype=dtype, shape=(num_frames,))
+
+
+def load_odf(odf_file: Path, mmap: bool = True, writable: bool = False) -> np.ndarray:
+    """Load an ODF curve written via `create_odf`, memory-mapped (read-only unless `writable`) by default."""
+    if writable:
+        return np.load(odf_file, mmap_mode="r+")
+    return np.load(odf_file, mmap_mode="r" if mmap else None)
+
+
+def save_aggregated(df: pd.DataFrame, output_file: Path):
+    """Save aggregated counts ('start_time_sec', 'event_count') as .npz or .csv."""
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+
+    if output_file.suffix == ".npz":
+        np.savez(output_file, **{col: df[col].to_numpy() for col in df.columns})
+    else:
+        df.to_csv(output_file, index=False)
+
+
+def load_aggregated(aggregated_file: Path) -> pd.DataFrame:
+    """Load aggregated counts written by `save_aggregated`."""
+    aggregated_file = Path(aggregated_file)
+
+    if aggregated_file.suffix == ".npz":
+        with np.load(aggregated_file) as data:
+            return pd.DataFrame({key: data[key] for key in data.files})
+    return pd.read_csv(aggregated_file)
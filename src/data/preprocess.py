@@ -1,3 +1,9 @@
+import os
+import time
+import queue
+import struct
+import threading
+
 import soundfile as sf
 import numpy as np
 
@@ -19,7 +25,7 @@ def get_sample_rate(file_path):
         return None
 
 
-def read_audio_segment(file_path, start_sample, num_samples):
+def read_audio_segment(file_path, start_sample, num_samples, channels=None):
     """
     Reads a specified segment from an audio file based on sample indices.
 
@@ -27,9 +33,11 @@ def read_audio_segment(file_path, start_sample, num_samples):
         file_path (str): The path to the audio file.
         start_sample (int): The starting sample index to read from.
         num_samples (int): The number of samples to read.
+        channels (list, optional): Channels to return, as [num_channels, num_samples] rows
+                                   (default: the first channel, as a mono signal).
 
     Returns:
-        numpy.ndarray: The audio samples as a mono signal.
+        numpy.ndarray: The audio samples as a mono signal (or channel rows).
     """
     try:
         with sf.SoundFile(file_path) as file_info:
@@ -42,11 +50,359 @@ def read_audio_segment(file_path, start_sample, num_samples):
             # Read the desired number of samples
             data = file_info.read(num_samples, always_2d=True)
 
-        # Extract the first channel if the audio is stereo
-        data = data[:, 0]
-
-        return data
+        return _select_channels(data, channels)
 
     except Exception as e:
         print(f"Error reading segment from {file_path}: {e}")
         return None
+
+
+def iter_audio_blocks(file_path, block_size, start_sample=0, stop_sample=None, dtype='float64',
+                      channels=None):
+    """
+    Yields consecutive fixed-size blocks from an audio file using a single open handle.
+
+    The file is opened once and read sequentially, so the I/O cost of a full pass
+    is one open and one seek regardless of the number of blocks. The last block
+    may be shorter than `block_size`. All blocks are decoded into one preallocated
+    buffer, so each yielded array is only valid until the next block is read. Open and
+    decode errors propagate to the caller instead of ending the stream early.
+
+    Args:
+        file_path (str): The path to the audio file.
+        block_size (int): The number of samples per block.
+        start_sample (int): The starting sample index to read from.
+        stop_sample (int, optional): The sample index to stop before (default: end of file).
+        dtype (str): Sample type, 'float64' or 'float32'.
+        channels (list | slice, optional): Channels to yield, as [num_channels, num_samples]
+                                           blocks (default: the first channel, as a mono signal).
+
+    Yields:
+        numpy.ndarray: The audio samples of each block as a mono signal (or channel rows).
+    """
+    with sf.SoundFile(file_path) as file_info:
+        file_info.seek(start_sample)
+        frames = -1 if stop_sample is None else max(0, stop_sample - start_sample)
+        out = np.empty((block_size, file_info.channels), dtype=dtype)
+        for block in file_info.blocks(frames=frames, out=out):
+            yield _select_channels(block, channels)
+
+
+def prefetch_audio_blocks(file_path, block_size, start_sample=0, stop_sample=None, dtype='float64',
+                          depth=1, io_stats=None, channels=None):
+    """
+    Yields the blocks of `iter_audio_blocks`, decoding the next ones on a background thread.
+
+    While the caller processes block k, a reader thread decodes blocks k+1 .. k+depth
+    (libsndfile releases the GIL), so read latency overlaps the DSP work instead of
+    alternating with it. Blocks are decoded into depth + 2 preallocated buffers that
+    are recycled; each yielded array is only valid until the next block is requested.
+    A read error on the reader thread is re-raised in the caller's thread.
+
+    Args:
+        file_path (str): The path to the audio file.
+        block_size (int): The number of samples per block.
+        start_sample (int): The starting sample index to read from.
+        stop_sample (int, optional): The sample index to stop before (default: end of file).
+        dtype (str): Sample type, 'float64' or 'float32'.
+        depth (int): Number of blocks decoded ahead of the caller (0 reads in the caller's thread).
+        io_stats (dict, optional): Accumulates 'read_seconds' (time spent decoding) and
+                                   'wait_seconds' (time the caller waited for a block).
+        channels (list | slice, optional): Channels to yield (see `iter_audio_blocks`).
+
+    Yields:
+        numpy.ndarray: The audio samples of each block as a mono signal (or channel rows).
+    """
+    if depth <= 0:
+        yield from iter_audio_blocks(file_path, block_size, start_sample, stop_sample, dtype, channels)
+        return
+
+    with sf.SoundFile(file_path) as file_info:
+        file_info.seek(start_sample)
+        stop = file_info.frames if stop_sample is None else min(stop_sample, file_info.frames)
+        buffers = [np.empty((block_size, file_info.channels), dtype=dtype) for _ in range(depth + 2)]
+        free = queue.Queue()
+        for index in range(len(buffers)):
+            free.put(index)
+        filled = queue.Queue()
+        stopping = threading.Event()
+        read_seconds = 0.0
+
+        def read_ahead():
+            # Reader thread: fill free buffers in file order; None marks the end
+            nonlocal read_seconds
+            remaining = max(0, stop - start_sample)
+            try:
+                while remaining > 0:
+                    index = free.get()
+                    if stopping.is_set():
+                        break
+                    t0 = time.perf_counter()
+                    block = file_info.read(out=buffers[index][:min(block_size, remaining)])
+                    read_seconds += time.perf_counter() - t0
+                    if len(block) == 0:
+                        break
+                    remaining -= len(block)
+                    filled.put((index, len(block)))
+            except Exception as e:
+                filled.put(e)
+                return
+            filled.put(None)
+
+        reader = threading.Thread(target=read_ahead, daemon=True)
+        reader.start()
+        wait_seconds = 0.0
+        held = None
+        try:
+            while True:
+                # The previous block is no longer used by the caller: hand its buffer back
+                if held is not None:
+                    free.put(held)
+                    held = None
+                t0 = time.perf_counter()
+                item = filled.get()
+                wait_seconds += time.perf_counter() - t0
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                held, num_read = item
+                yield _select_channels(buffers[held][:num_read], channels)
+        finally:
+            # Unblock the reader if the caller stopped early (or a read failed), then wait
+            # for it before closing; a read error is re-raised above and propagates
+            stopping.set()
+            free.put(0)
+            reader.join()
+            if io_stats is not None:
+                io_stats["read_seconds"] = io_stats.get("read_seconds", 0.0) + read_seconds
+                io_stats["wait_seconds"] = io_stats.get("wait_seconds", 0.0) + wait_seconds
+
+
+def _select_channels(block, channels):
+    """
+    Channels of a decoded [num_samples, num_channels] block: the first one as a mono
+    signal (the default), or the selected ones as [num_channels, num_samples] rows.
+    """
+    if channels is None:
+        # Extract the first channel if the audio is stereo
+        return block[:, 0]
+    return block[:, channels].T
+
+
+def channel_index(channels):
+    """
+    Index selecting a list of channels: a slice when they are consecutive, so that
+    selecting them from a sample array gives a view instead of a copy.
+    """
+    channels = list(channels)
+    if channels and channels == list(range(channels[0], channels[0] + len(channels))):
+        return slice(channels[0], channels[0] + len(channels))
+    return channels
+
+
+# WAV format tags (WAVE_FORMAT_EXTENSIBLE carries the real tag in its sub-format GUID)
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# (format tag, bits per sample) -> sample type on disk and scale to [-1, 1) floats.
+# 24-bit samples have no numpy type: they are mapped as bytes and decoded to int32
+# shifted left by 8 bits, as libsndfile does, hence the 2**-31 scale.
+MAPPABLE_FORMATS = {
+    (WAVE_FORMAT_PCM, 16): ("<i2", 2.0 ** -15),
+    (WAVE_FORMAT_PCM, 24): (None, 2.0 ** -31),
+    (WAVE_FORMAT_PCM, 32): ("<i4", 2.0 ** -31),
+    (WAVE_FORMAT_IEEE_FLOAT, 32): ("<f4", 1.0),
+    (WAVE_FORMAT_IEEE_FLOAT, 64): ("<f8", 1.0),
+}
+
+
+class WavMemmap:
+    """
+    Samples of an uncompressed WAV file, memory-mapped from its data chunk.
+
+    Reading a range returns a view of the mapped pages (no decode, no copy), so a
+    page-cached file costs nothing to read and worker processes mapping the same file
+    share its pages. Samples keep their type on disk; multiplying them by `scale`
+    gives the floats soundfile returns, exactly (the scale is a power of two).
+    """
+
+    def __init__(self, samples: np.memmap, scale: float, samplerate: int, packed24: bool = False):
+        self.samples = samples
+        self.scale = scale
+        self.samplerate = samplerate
+        self.packed24 = packed24
+
+    @property
+    def num_frames(self) -> int:
+        return self.samples.shape[0]
+
+    @property
+    def channels(self) -> int:
+        return self.samples.shape[1]
+
+    def channel(self, start: int, stop: int, channel: int = 0) -> np.ndarray:
+        """Samples [start, stop) of one channel: a strided view (24-bit: decoded to int32)."""
+        if not self.packed24:
+            return self.samples[start:stop, channel]
+        packed = self.samples[start:stop, channel].astype(np.int32)
+        return (packed[:, 0] << 8) | (packed[:, 1] << 16) | (packed[:, 2] << 24)
+
+    def channel_rows(self, start: int, stop: int, channels) -> np.ndarray:
+        """
+        Samples [start, stop) of several channels as [num_channels, stop - start] rows: a
+        strided view when `channels` is a slice (see `channel_index`), else a copy.
+        """
+        if not self.packed24:
+            return self.samples[start:stop, channels].T
+        packed = self.samples[start:stop, channels].astype(np.int32)
+        return ((packed[..., 0] << 8) | (packed[..., 1] << 16) | (packed[..., 2] << 24)).T
+
+
+def open_wav_memmap(file_path):
+    """
+    Map the data chunk of a PCM (16/24/32-bit) or IEEE float (32/64-bit) WAV file.
+
+    The RIFF header is parsed once. Compressed or unusual files (8-bit, RF64, partial
+    valid bits, a data size libsndfile reads differently) are not mapped, so callers
+    fall back to soundfile.
+
+    Args:
+        file_path (str): The path to the audio file.
+
+    Returns:
+        WavMemmap | None: The mapped samples, or None if the file cannot be mapped.
+    """
+    try:
+        with open(file_path, "rb") as f:
+            riff = f.read(12)
+            if len(riff) < 12 or riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+                return None
+
+            fmt = None
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    return None
+                chunk_id, size = header[:4], struct.unpack("<I", header[4:])[0]
+                if chunk_id == b"data":
+                    data_offset = f.tell()
+                    break
+                if chunk_id == b"fmt ":
+                    fmt = f.read(size)
+                    f.seek(size % 2, os.SEEK_CUR)
+                else:
+                    # Chunks are padded to an even size
+                    f.seek(size + size % 2, os.SEEK_CUR)
+
+        if fmt is None or len(fmt) < 16:
+            return None
+        format_tag, channels, samplerate, _, block_align, bits = struct.unpack("<HHIIHH", fmt[:16])
+        if format_tag == WAVE_FORMAT_EXTENSIBLE:
+            if len(fmt) < 40 or struct.unpack("<H", fmt[18:20])[0] != bits:
+                return None
+            format_tag = struct.unpack("<H", fmt[24:26])[0]
+        if (format_tag, bits) not in MAPPABLE_FORMATS or channels < 1 or block_align != channels * bits // 8:
+            return None
+        sample_type, scale = MAPPABLE_FORMATS[(format_tag, bits)]
+
+        num_frames = min(size, os.path.getsize(file_path) - data_offset) // block_align
+        if num_frames == 0 or num_frames != sf.info(file_path).frames:
+            return None
+
+        if sample_type is None:
+            samples = np.memmap(file_path, dtype=np.uint8, mode="r", offset=data_offset,
+                                shape=(num_frames, channels, 3))
+        else:
+            samples = np.memmap(file_path, dtype=sample_type, mode="r", offset=data_offset,
+                                shape=(num_frames, channels))
+        return WavMemmap(samples, scale, samplerate, packed24=sample_type is None)
+
+    except Exception:
+        return None
+
+
+def iter_frame_blocks(file_path, frame_length, block_frames, first_frame=0, stop_frame=None,
+                      dtype='float64', backend='auto', depth=1, io_stats=None, channels=None):
+    """
+    Yields consecutive frames of an audio file, block by block, as [num_frames, frame_length] arrays.
+
+    With `channels`, the frames of every selected channel are yielded together from the
+    same read, as [num_channels, num_frames, frame_length] arrays.
+
+    Frames do not overlap and frame p is centred on sample p * frame_length (the stream
+    starts with half a frame of zeros). With backend 'auto', PCM and float WAV files are
+    memory-mapped: frames are strided views of the mapped samples in their type on disk,
+    to be multiplied by the yielded scale (e.g. fused into the window multiply). Other
+    files, or backend 'soundfile', are decoded by `prefetch_audio_blocks` into float
+    frames with a scale of 1. Each yielded array is only valid until the next block.
+
+    Args:
+        file_path (str): The path to the audio file.
+        frame_length (int): Samples per frame.
+        block_frames (int): Frames per block (the decoded path may yield one more).
+        first_frame (int): First frame to yield.
+        stop_frame (int, optional): Frame to stop before (default: last complete frame).
+        dtype (str): Sample type of decoded frames, 'float64' or 'float32'.
+        backend (str): 'auto' (memory-map when possible) or 'soundfile'.
+        depth (int): Prefetch depth of the decoded path (see `prefetch_audio_blocks`).
+        io_stats (dict, optional): Read/wait times of the decoded path.
+        channels (list[int], optional): Channels to frame (default: the first channel only).
+
+    Yields:
+        tuple[numpy.ndarray, float]: The frames of each block and their scale.
+    """
+    W = frame_length
+    pad = W // 2
+    mapped = open_wav_memmap(file_path) if backend == 'auto' else None
+    # Samples are handled as [num_channels, num_samples] rows; without `channels`, the
+    # single row of the first channel is yielded as 2D frames
+    index = channel_index(channels) if channels is not None else slice(0, 1)
+    num_channels = len(channels) if channels is not None else 1
+
+    def framed(samples, num_frames):
+        frames = samples.reshape(num_channels, num_frames, W)
+        return frames if channels is not None else frames[0]
+
+    if mapped is not None:
+        total_frames = (mapped.num_frames + pad) // W
+        stop = total_frames if stop_frame is None else min(stop_frame, total_frames)
+        frame_index = first_frame
+        while frame_index < stop:
+            num_frames = min(block_frames, stop - frame_index)
+            start_sample = frame_index * W - pad
+            if start_sample < 0:
+                # Frame 0 starts with the padding zeros: only this block is copied
+                samples = np.zeros((num_channels, num_frames * W), dtype=mapped.channel(0, 0).dtype)
+                samples[:, pad:] = mapped.channel_rows(0, num_frames * W - pad, index)
+            else:
+                samples = mapped.channel_rows(start_sample, start_sample + num_frames * W, index)
+            yield framed(samples, num_frames), mapped.scale
+            frame_index += num_frames
+        return
+
+    # Decoded path: samples waiting to be framed (leftover of the last block + new block)
+    block_size = block_frames * W
+    pending = np.zeros((num_channels, block_size + W), dtype=dtype)
+    if first_frame == 0:
+        num_pending = pad
+        start_sample = 0
+    else:
+        num_pending = 0
+        start_sample = first_frame * W - pad
+    stop_sample = None if stop_frame is None else stop_frame * W - pad
+
+    for block in prefetch_audio_blocks(file_path, block_size, start_sample, stop_sample, dtype=dtype,
+                                       depth=depth, io_stats=io_stats, channels=index):
+        num_read = block.shape[1]
+        pending[:, num_pending:num_pending + num_read] = block
+        num_pending += num_read
+        num_frames = num_pending // W
+        if num_frames:
+            yield framed(pending[:, :num_frames * W], num_frames), 1.0
+
+        # Keep the samples of the incomplete last frame for the next block
+        leftover = num_pending - num_frames * W
+        pending[:, :leftover] = pending[:, num_frames * W:num_pending]
+        num_pending = leftover
@@ -13,8 +13,18 @@ if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 from src.config.config_loader import load_config
-from src.detection.click_detection_utils import detect_clicks, save_detection_results
+from src.config.config_helpers import (
+    get_output_format, get_aggregation_window, get_streaming_aggregation, get_save_events, get_odf_cache
+)
+from src.detection.click_detection_utils import (
+    detect_clicks, detect_and_aggregate, save_detection_results, detection_params, odf_params, odf_cache_covers,
+    share_cores
+)
+from src.data.event_io import get_output_path, get_odf_path, save_aggregated
+from src.utils.manifest import Manifest, file_fingerprint
+from src.aggregation.count_index import invalidate_index
 import soundfile as sf
 
 def parse_args():
@@ -25,46 +35,189 @@ def parse_args():
         type=str,
         help="Path to the experiment folder containing subdirectories with the .wav audio files."
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of WAV files processed in parallel (default: number of CPUs)."
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Reprocess every file, even if its WAV and detection settings are unchanged."
+    )
     return parser.parse_args()
 
 
-def process_all_wav_files(experiment_path: Path, output_root: Path):
+def detect_and_save(wav_file: Path, output_path: Path, config: dict, aggregated_path: Path = None,
+                    odf_path: Path = None, reuse_odf: bool = False) -> int:
+    """
+    Run click detection on one WAV file and save its results.
+
+    Module-level so it can be dispatched to worker processes. Files that cannot be
+    opened or decoded (also mid-stream) raise instead of producing a short or empty result.
+
+    Args:
+        wav_file (Path): WAV file to process.
+        output_path (Path | None): Events file to write (None: do not keep event times;
+                                   only valid with `aggregated_path`).
+        config (dict): Loaded configuration dictionary.
+        aggregated_path (Path, optional): If given, events are counted per aggregation
+                                          window during detection and saved here.
+        odf_path (Path, optional): ODF cache file, written during detection.
+        reuse_odf (bool): Threshold the ODF saved at `odf_path` instead of reading the audio.
+
+    Returns:
+        int: Number of detected events.
+    """
+    sf.info(wav_file)
+
+    if aggregated_path is None:
+        df_events = detect_clicks(wav_file, config, odf_path, reuse_odf)
+        save_detection_results(df_events, output_path, wav_path=wav_file, config=config)
+        return len(df_events)
+
+    df_events, df_agg = detect_and_aggregate(wav_file, config, get_aggregation_window(config),
+                                             keep_events=output_path is not None,
+                                             odf_path=odf_path, reuse_odf=reuse_odf)
+    save_aggregated(df_agg, aggregated_path)
+    if output_path is not None:
+        save_detection_results(df_events, output_path, wav_path=wav_file, config=config)
+    return int(df_agg["event_count"].sum())
+
+
+def _run_detection_job(wav_file: Path, output_path: Path, config: dict, aggregated_path: Path = None,
+                       odf_path: Path = None, reuse_odf: bool = False, fingerprint: dict = None):
+    """
+    Detect, save and fingerprint one WAV file, so hashing also runs in the worker.
+
+    A known `fingerprint` (from the manifest entry of a reused ODF) is returned as is,
+    so re-thresholding does not read the audio.
+    """
+    num_events = detect_and_save(wav_file, output_path, config, aggregated_path, odf_path, reuse_odf)
+    return num_events, fingerprint or file_fingerprint(wav_file)
+
+
+def process_all_wav_files(experiment_path: Path, output_root: Path, workers: int = 1, force: bool = False):
     """
     Process all WAV files under the given experiment folder and save click detection results.
 
+    Files are processed by a pool of `workers` processes. Results are reported in
+    folder/file order, and a file that fails is reported without stopping the batch.
+    Files whose WAV and detection settings match the pipeline manifest are skipped.
+    With aggregation.streaming, *_aggregated files are written in the same pass (and
+    *_events files only if output.save_events is set). With processing.odf_cache, the
+    ODF of each file is saved (*_odf.npy) and re-thresholded by later runs whose WAV
+    and ODF settings are unchanged.
+
     Args:
         experiment_path (Path): Full path to the experiment folder.
         output_root (Path): Root directory to save detection results (e.g., data/metadata/model_detections).
+        workers (int): Number of worker processes (1 runs everything in this process).
+        force (bool): Ignore the manifest and reprocess every file.
+
+    Returns:
+        list[Path]: WAV files whose detection failed (they are not recorded in the manifest).
     """
-    config = load_config()
+    # Shards and file workers share the CPUs
+    config = share_cores(load_config(), workers)
+    manifest = Manifest()
+    params = detection_params(config)
+    fmt = get_output_format(config)
+    streaming = get_streaming_aggregation(config)
+    save_events = not streaming or get_save_events(config)
+    aggregation_params = {**params, "window_size": get_aggregation_window(config)}
+    # The cached ODF only covers plain detection (see `odf_cache_covers`)
+    odf_cache = get_odf_cache(config) and odf_cache_covers(config)
+    cache_params = odf_params(config)
 
     if not experiment_path.exists():
         print(f"Experiment folder not found: {experiment_path}")
-        return
+        return []
 
     # O nome do experimento é o nome da pasta
     experiment_name = experiment_path.name
 
-    for trial_folder in experiment_path.iterdir():
+    jobs = []
+    for trial_folder in sorted(experiment_path.iterdir()):
         if not trial_folder.is_dir():
             continue
 
-        for wav_file in trial_folder.glob("*.WAV"):
-            print(f"🔍 Processing: {wav_file.name}")
-
-            # Run detection
-            df_events = detect_clicks(wav_file, config)
-
+        for wav_file in sorted(trial_folder.glob("*.WAV")):
             # Build output path
             relative_subfolder = Path(experiment_name) / trial_folder.name
-            output_filename = wav_file.stem + "_events.csv"
-            output_path = output_root / relative_subfolder / output_filename
-
-            # Save detection CSV
-            save_detection_results(df_events, output_path, wav_path=wav_file)
-            print(f"\n✅ Detection complete for: {trial_folder / wav_file}")
-
+            output_path = get_output_path(output_root / relative_subfolder, wav_file.stem, "events", fmt)
+            aggregated_path = None
+            if streaming:
+                aggregated_path = get_output_path(output_root / relative_subfolder, wav_file.stem,
+                                                  "aggregated", fmt)
+            if not save_events:
+                output_path = None
+
+            up_to_date = (
+                (output_path is None
+                 or manifest.is_up_to_date("detection", output_path, [wav_file], params))
+                and (aggregated_path is None
+                     or manifest.is_up_to_date("streaming_aggregation", aggregated_path,
+                                               [wav_file], aggregation_params))
+            )
+            if not force and up_to_date:
+                print(f"⏭ Unchanged, skipping: {wav_file.name}")
+                continue
+
+            odf_path, reuse_odf, fingerprint = None, False, None
+            if odf_cache:
+                odf_path = get_odf_path(output_root / relative_subfolder, wav_file.stem)
+                reuse_odf = not force and manifest.is_up_to_date("odf", odf_path, [wav_file], cache_params)
+                if reuse_odf:
+                    print(f"♻ Re-thresholding cached ODF: {wav_file.name}")
+                    fingerprint = manifest.recorded_fingerprint("odf", odf_path, wav_file)
+            jobs.append((wav_file, output_path, aggregated_path, odf_path, reuse_odf, fingerprint))
+
+    def record(wav_file, output_path, aggregated_path, odf_path, reuse_odf, fingerprint):
+        if output_path is not None:
+            manifest.record("detection", output_path, [wav_file], params, [fingerprint])
+        if aggregated_path is not None:
+            manifest.record("streaming_aggregation", aggregated_path, [wav_file],
+                            aggregation_params, [fingerprint])
+            if output_path is None:
+                # The trial's count index still counts the old events
+                invalidate_index(aggregated_path.parent, manifest)
+        if odf_path is not None and not reuse_odf:
+            manifest.record("odf", odf_path, [wav_file], cache_params, [fingerprint])
+
+    failed = []
+    if workers is None or workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_run_detection_job, wav_file, output_path, config, aggregated_path,
+                                       odf_path, reuse_odf, known_fingerprint)
+                       for wav_file, output_path, aggregated_path, odf_path, reuse_odf, known_fingerprint in jobs]
+            for (wav_file, output_path, aggregated_path, odf_path, reuse_odf, _), future in zip(jobs, futures):
+                try:
+                    num_events, fingerprint = future.result()
+                    record(wav_file, output_path, aggregated_path, odf_path, reuse_odf, fingerprint)
+                    print(f"✅ Detection complete for: {wav_file} ({num_events} events)")
+                except Exception as e:
+                    print(f"❌ Detection failed for: {wav_file}: {e}")
+                    failed.append(wav_file)
+    else:
+        for wav_file, output_path, aggregated_path, odf_path, reuse_odf, known_fingerprint in jobs:
+            print(f"🔍 Processing: {wav_file.name}")
+            try:
+                num_events, fingerprint = _run_detection_job(wav_file, output_path, config, aggregated_path,
+                                                             odf_path, reuse_odf, known_fingerprint)
+                record(wav_file, output_path, aggregated_path, odf_path, reuse_odf, fingerprint)
+                print(f"✅ Detection complete for: {wav_file} ({num_events} events)")
+            except Exception as e:
+                print(f"❌ Detection failed for: {wav_file}: {e}")
+                failed.append(wav_file)
+
+    manifest.save()
+
+    if failed:
+        print(f"\n⚠ {len(failed)} of {len(jobs)} files failed.")
     print(f"\n✅ Detection complete. Results saved to: {output_root / experiment_name}")
+    return failed
 
 
 if __name__ == "__main__":
@@ -80,4 +233,4 @@ if __name__ == "__main__":
     output_root = PROJECT_ROOT / "data" / "metadata" / "model_detections"
     
     # Inicia a detecção em lote
-    process_all_wav_files(experiment_path_from_arg, output_root)
+    process_all_wav_files(experiment_path_from_arg, output_root, workers=args.workers, force=args.force)
@@ -1,93 +1,713 @@
 # src/detection/click_detection_utils.py
 
+import os
+import copy
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
 import soundfile as sf
-from scipy.signal import ShortTimeFFT, windows
+import scipy.fft
+from scipy.signal import windows
 
 
-from src.data.preprocess import read_audio_segment, get_sample_rate
+from src.config.config_helpers import (
+    get_block_duration, get_num_shards, get_dtype, get_transform, get_fft_workers, get_energy_gate, get_detectors,
+    get_prefetch_blocks, get_audio_backend, get_event_memory_limit, get_compact_events, get_refine_onsets,
+    get_click_features, get_channels, get_coincidence_frames
+)
+from src.data.preprocess import iter_frame_blocks, get_sample_rate
+from src.data.event_buffer import EventBuffer, EventRuns
+from src.data.event_io import save_events, config_hash, create_odf, load_odf, get_detector_output_path
+from src.aggregation.aggregate_detections import WindowCounter
 from src.features.extract_features import (
-    compute_spectral_flux,
-    compute_hfc,
-    # compute_wpd,
-    # compute_cd
+    StreamingODF,
+    make_streaming_odf,
+    compute_click_features,
 )
 
-def detect_clicks(file_path: Path, config: dict) -> pd.DataFrame:
+# Event columns of EventRuns records and their names in the output
+EVENT_COLUMNS = {
+    "offset": "Event_Offset_Seconds",
+    "peak": "Peak_ODF",
+    "sample": "Peak_Time_Seconds",
+    "peak_amplitude": "Peak_Amplitude",
+    "band_energy": "Band_Energy",
+    "spectral_centroid": "Spectral_Centroid_Hz",
+    "peak_frequency": "Peak_Frequency_Hz",
+}
+CLICK_FEATURES = ("peak_amplitude", "band_energy", "spectral_centroid", "peak_frequency")
+
+
+def detection_params(config: dict) -> dict:
+    """Config values that affect detection results (block/shard sizes do not)."""
+    params = {
+        "short_term_duration": config["processing"]["short_term_duration"],
+        "dtype": get_dtype(config),
+        "transform": get_transform(config),
+        "detection": {key: value for key, value in config["detection"].items() if key != "detectors"},
+    }
+    params["detection"].pop("compact_events", None)
+    params["detection"].pop("refine_onsets", None)
+    params["detection"].pop("click_features", None)
+    params["detection"].pop("coincidence_frames", None)
+    # Named detectors, compaction, refinement, features, channels and coincidence only
+    # enter the hash when configured, so existing outputs stay valid
+    if get_detectors(config):
+        params["detectors"] = get_detectors(config)
+    if get_compact_events(config):
+        params["compact_events"] = True
+    if get_refine_onsets(config):
+        params["refine_onsets"] = True
+    if get_click_features(config):
+        params["click_features"] = True
+    if get_channels(config) is not None:
+        params["channels"] = get_channels(config)
+    if get_coincidence_frames(config) is not None:
+        params["coincidence_frames"] = get_coincidence_frames(config)
+    return params
+
+
+def share_cores(config: dict, workers: int = None) -> dict:
+    """
+    Config for detecting `workers` files in parallel: each file gets at most its share
+    of the CPUs as shards, so files x shards never exceeds the CPU count.
+
+    Args:
+        config (dict): Loaded configuration dictionary.
+        workers (int, optional): Files detected at once (default: number of CPUs).
+
+    Returns:
+        dict: `config`, or a copy with processing.num_shards lowered to
+              max(1, cpu_count // workers).
+    """
+    cpus = os.cpu_count() or 1
+    workers = cpus if workers is None else max(1, workers)
+    num_shards = min(get_num_shards(config), max(1, cpus // workers))
+    if num_shards == get_num_shards(config):
+        return config
+    print(f"[Info] {workers} files in parallel: using {num_shards} shard(s) per file "
+          f"instead of {get_num_shards(config)}")
+    config = copy.deepcopy(config)
+    config["processing"]["num_shards"] = num_shards
+    return config
+
+
+def odf_params(config: dict) -> dict:
+    """Config values the per-frame ODF depends on (the threshold only applies after it)."""
+    params = {
+        "short_term_duration": config["processing"]["short_term_duration"],
+        "dtype": get_dtype(config),
+        "transform": get_transform(config),
+        "frequency_band": config["detection"]["frequency_band"],
+    }
+    # The cached curve is the first selected channel's
+    if get_channels(config) is not None:
+        params["channels"] = get_channels(config)
+    return params
+
+
+def odf_cache_covers(config: dict) -> bool:
+    """
+    True if detection can run from the cached ODF alone: it only holds the main
+    detector's curve, so named detectors, onset refinement (samples), click features
+    (spectra) and further channels need a new pass over the audio. The energy gate
+    takes precedence over the cache, which would need the ODF of every frame.
+    """
+    channels = get_channels(config)
+    several_channels = channels == "all" or (channels is not None and len(channels) > 1)
+    return not (get_detectors(config) or get_refine_onsets(config) or get_click_features(config)
+                or several_channels or get_energy_gate(config))
+
+
+def select_channels(config: dict, num_channels: int) -> list:
+    """
+    Channels of a file to detect on (processing.channels), the main detector's first.
+
+    Args:
+        config (dict): Loaded configuration dictionary.
+        num_channels (int): Number of channels of the file.
+
+    Returns:
+        list[int]: 0-based channel indices.
+    """
+    channels = get_channels(config)
+    if channels is None:
+        return [0]
+    if channels == "all":
+        return list(range(num_channels))
+    channels = [int(channel) for channel in channels]
+    missing = [channel for channel in channels if not 0 <= channel < num_channels]
+    if missing or not channels or len(set(channels)) < len(channels):
+        raise ValueError(f"processing.channels {channels} does not fit a file with {num_channels} channel(s)")
+    return channels
+
+
+def band_slice(fs: int, nfft: int, f_low: float, f_high: float) -> slice:
+    """
+    One-sided FFT bins of the frequency band [f_low, f_high], as a slice.
+
+    The band is a contiguous run of bins, so it is taken as a slice (a view of the
+    spectrum) instead of a boolean-mask copy.
+    """
+    freqs_onesided = np.linspace(0, fs / 2, nfft // 2 + 1)
+    band_bins = np.flatnonzero((freqs_onesided >= f_low) & (freqs_onesided <= f_high))
+    return slice(band_bins[0], band_bins[-1] + 1) if len(band_bins) else slice(0, 0)
+
+
+def _band_dft_basis(window: np.ndarray, band: slice, dtype) -> np.ndarray:
+    """
+    Windowed DFT basis restricted to the bins of `band`.
+
+    Column pairs hold the real and imaginary parts of each bin, so the product of a
+    [frames, W] matrix with the basis can be viewed as a complex [frames, bins] array.
+    The product costs W x 2 * num_bins per frame, i.e. fs x band bins per second of
+    audio, so it only beats the full FFT when the band is narrow.
+
+    Args:
+        window (np.ndarray): Analysis window of length W.
+        band (slice): Contiguous range of one-sided FFT bins.
+        dtype: float64 or float32.
+
+    Returns:
+        np.ndarray: Basis of shape [W, 2 * num_bins].
+    """
+    W = len(window)
+    phase = 2 * np.pi * np.outer(np.arange(W), np.arange(W // 2 + 1)[band]) / W
+    basis = np.empty((W, 2 * phase.shape[1]))
+    basis[:, 0::2] = window[:, None] * np.cos(phase)
+    basis[:, 1::2] = -window[:, None] * np.sin(phase)
+    return basis.astype(dtype)
+
+
+def energy_gate_threshold(threshold: float, num_bins: int, W: int) -> float:
+    """
+    Minimum windowed frame energy at which the ODF can reach `threshold`.
+
+    With SF <= HFC and dHFC <= HFC, odf <= log10(log10(HFC + 1)^2 + 1), and by
+    Cauchy-Schwarz and Parseval HFC = sum|X_k| <= sqrt(num_bins * W * sum((w * x)^2)).
+    Frames whose energy sum((w * x)^2) is below the returned value therefore cannot be
+    detected. A small margin covers floating-point rounding.
+
+    Args:
+        threshold (float): detection.threshold.
+        num_bins (int): Number of band bins.
+        W (int): Frame length in samples.
+
+    Returns:
+        float: Energy threshold (0 when every frame has to be evaluated).
+    """
+    if threshold <= 0 or num_bins == 0:
+        return 0.0
+    min_hfc = 10 ** np.sqrt(10 ** threshold - 1) - 1
+    return 0.999 * min_hfc ** 2 / (num_bins * W)
+
+
+def detect_clicks(file_path: Path, config: dict, odf_path: Path = None, reuse_odf: bool = False) -> pd.DataFrame:
+    result = _run_detector(file_path, config, odf_path=odf_path, reuse_odf=reuse_odf)
+    if result is None:
+        return pd.DataFrame()
+
+    event_times, _, skip_ratio, duration, detector_events, event_columns = result
+    # copy=False keeps a spilled (memory-mapped) array as the column
+    df = pd.DataFrame({"Event_Time_Seconds": event_times, **event_columns}, copy=False)
+    df.attrs["duration_seconds"] = duration
+    if skip_ratio is not None:
+        df.attrs["skip_ratio"] = skip_ratio
+    if detector_events:
+        df.attrs["detector_events"] = detector_events
+    return df
+
+
+def detect_and_aggregate(file_path: Path, config: dict, window_size: float, keep_events: bool = True,
+                         odf_path: Path = None, reuse_odf: bool = False):
+    """
+    Detect clicks and count them per window in the same pass.
+
+    Counts are accumulated block by block, so the aggregated table is available without
+    writing and re-reading the event times, and memory stays O(windows) when the event
+    times are not kept.
+
+    Args:
+        file_path (Path): Path to the .wav file.
+        config (dict): Loaded configuration dictionary.
+        window_size (float): Aggregation window size in seconds.
+        keep_events (bool): Also return the individual event times.
+        odf_path (Path, optional): ODF cache file (see `_run_detector`).
+        reuse_odf (bool): Threshold the ODF saved at `odf_path` instead of recomputing it.
+
+    Returns:
+        tuple[pd.DataFrame | None, pd.DataFrame]: Events ('Event_Time_Seconds', or None if
+            not kept) and counts ('start_time_sec', 'event_count', as `aggregate_events`
+            with the recording duration).
+    """
+    result = _run_detector(file_path, config, window_size, keep_events, odf_path, reuse_odf)
+    if result is None:
+        return (pd.DataFrame() if keep_events else None), WindowCounter(window_size).to_frame()
+
+    event_times, counter, _, duration, detector_events, event_columns = result
+    df_events = None
+    if keep_events:
+        df_events = pd.DataFrame({"Event_Time_Seconds": event_times, **event_columns}, copy=False)
+        df_events.attrs["duration_seconds"] = duration
+        if detector_events:
+            df_events.attrs["detector_events"] = detector_events
+    return df_events, counter.to_frame(duration)
+
+
+def _run_detector(file_path: Path, config: dict, window_size: float = None, keep_events: bool = True,
+                  odf_path: Path = None, reuse_odf: bool = False):
+    """
+    Run `detect_click_frames` over a whole file, split into shards if configured.
+
+    With `odf_path`, the ODF of every frame is saved there (in processing.dtype, so
+    re-thresholding it gives exactly the detections of a new run). With `reuse_odf`,
+    the saved ODF is thresholded instead and no audio is read; the caller is
+    responsible for checking that it matches the file and `odf_params`.
+
+    When event times are kept, the named detectors of detection.detectors run in the
+    same pass (the cached ODF only covers the main detector, so it is not reused then).
+    Flagged frames are collected in EventBuffers (see `_event_buffer`) and converted to
+    seconds only here. With detection.compact_events, runs of consecutive flagged frames
+    are merged into EventRuns records instead, and counted once, at their onset. With
+    detection.refine_onsets, the events also get the time of their loudest sample, and
+    with detection.click_features the spectral features of their frame (the cached ODF
+    is not reused for either, see `odf_cache_covers`).
+
+    The main detector runs on the first channel of processing.channels. When event times
+    are kept and several channels are selected, every selected channel is detected in
+    the same pass and returned as a 'channel_<index>' stream with the named detectors';
+    with detection.coincidence_frames, the events then get a 'Coincident_Channels' count.
+
+    Returns:
+        tuple | None: Event times in seconds (or None), the WindowCounter (or None), the
+                      energy gate skip ratio (or None), the recording duration in
+                      seconds, the event times of each named detector and channel
+                      ({name: times}) and further event columns ({column: values}, e.g.
+                      the run offsets and peaks); None if the file cannot be read.
+    """
     fs = get_sample_rate(file_path)
     if fs is None:
         print(f"Error: Could not read sampling rate for {file_path}")
-        return pd.DataFrame()
+        return None
+
+    W = int(config["processing"]["short_term_duration"] * fs)
+    num_shards = get_num_shards(config)
+    info = sf.info(file_path)
+    num_samples = info.frames
+    total_frames = (num_samples + W // 2) // W
+    named = keep_events and bool(get_detectors(config))
+    # Further channels only yield event streams, so they are skipped when events are not kept
+    channels = select_channels(config, info.channels)
+    if not keep_events:
+        channels = channels[:1]
+    # The cached curve must hold every frame, so runs that write it do not skip any;
+    # named detectors and further channels need every frame as well
+    energy_gate = get_energy_gate(config) and odf_path is None and not named and len(channels) == 1
+
+    if reuse_odf and (not keep_events or odf_cache_covers(config)):
+        odf = load_odf(odf_path)
+        if len(odf) != total_frames:
+            raise ValueError(f"ODF cache {Path(odf_path).name} has {len(odf)} frames, expected {total_frames}")
+        # Threshold the memory-mapped curve one block of frames at a time
+        block_frames = max(2, round(get_block_duration(config) * fs / W))
+        counter = WindowCounter(window_size) if window_size is not None else None
+        events = _event_store(config, total_frames, keep_events, counter is not None)
+        for start in range(0, total_frames, block_frames):
+            block_events = start + np.flatnonzero(odf[start:start + block_frames] >= config["detection"]["threshold"])
+            if events is not None:
+                block_events = events.add(block_events, odf[block_events])
+            if counter is not None:
+                counter.add(block_events * W / fs)
+        event_times, event_columns = _events_to_output(events, W, fs, keep_events)
+        return event_times, counter, None, num_samples / fs, {}, event_columns
+
+    if odf_path is not None:
+        # Preallocated on disk; each shard writes the ODF of its own frame range into it
+        create_odf(odf_path, total_frames, np.dtype(get_dtype(config))).flush()
+    # Every shard holds at least two frames: frame 0 takes its ODF from frame 1, so the
+    # first block of shard 0 must contain both
+    num_shards = min(num_shards, total_frames // 2)
+    if num_shards > 1:
+        # Split the frame grid into contiguous shards, one per worker
+        bounds = np.linspace(0, total_frames, num_shards + 1).astype(int)
+        shards = [(start, stop) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+
+        with ProcessPoolExecutor(max_workers=len(shards)) as executor:
+            futures = [executor.submit(_detect_shard, file_path, config, fs, start, stop, total_frames,
+                                       window_size, keep_events, odf_path, named, channels)
+                       for start, stop in shards]
+            results = [future.result() for future in futures]
+        # Shard buffers are appended in frame order to the first one
+        events, num_skipped, counter, detector_frames, io_stats = results[0]
+        for shard_events, shard_skipped, shard_counter, shard_named, shard_stats in results[1:]:
+            continued = events.extend(shard_events) if events is not None else None
+            num_skipped += shard_skipped
+            if counter is not None:
+                counter.merge(shard_counter)
+                if continued is not None:
+                    # A run crossing the shard boundary was counted by both shards
+                    counter.remove([continued * W / fs])
+            for name, frames in shard_named.items():
+                detector_frames[name].extend(frames)
+            for key, seconds in shard_stats.items():
+                io_stats[key] = io_stats.get(key, 0.0) + seconds
+    else:
+        events, num_skipped, counter, detector_frames, io_stats = _detect_shard(
+            file_path, config, fs, 0, None, total_frames, window_size, keep_events, odf_path, named, channels)
+
+    skip_ratio = None
+    if energy_gate:
+        skip_ratio = float(num_skipped / total_frames) if total_frames else 0.0
+        print(f"Energy gate: skipped {num_skipped} of {total_frames} frames "
+              f"({100 * skip_ratio:.1f}%) in {Path(file_path).name}")
+
+    read_seconds = io_stats.get("read_seconds", 0.0)
+    if get_prefetch_blocks(config) and read_seconds > 0:
+        hidden = max(0.0, read_seconds - io_stats["wait_seconds"])
+        print(f"Prefetch: hid {hidden:.2f} of {read_seconds:.2f} s of audio reads "
+              f"({100 * hidden / read_seconds:.1f}%) in {Path(file_path).name}")
+
+    event_times, event_columns = _events_to_output(events, W, fs, keep_events)
+    detector_events = {name: _buffer_to_seconds(frames, W, fs) for name, frames in detector_frames.items()}
+    coincidence_frames = get_coincidence_frames(config)
+    if coincidence_frames is not None and len(channels) > 1:
+        # Half a frame of margin, since all times lie on the same frame grid
+        event_columns["Coincident_Channels"] = _coincident_channels(
+            event_times, event_columns.get("Event_Offset_Seconds", event_times),
+            [detector_events[f"channel_{channel}"] for channel in channels], (coincidence_frames + 0.5) * W / fs)
+    return event_times, counter, skip_ratio, num_samples / fs, detector_events, event_columns
+
+
+def _frame_dtype(total_frames: int):
+    """Type of the frame indices of a file: uint32 unless the file needs more."""
+    return np.uint32 if total_frames < 2 ** 32 else np.int64
+
+
+def _event_buffer(config: dict, total_frames: int) -> EventBuffer:
+    """Empty buffer for the flagged frames of a file."""
+    return EventBuffer(_frame_dtype(total_frames), memory_limit=get_event_memory_limit(config))
+
+
+def _event_store(config: dict, total_frames: int, keep_events: bool, counting: bool):
+    """
+    Where the main detector's flagged frames go: an EventBuffer, or EventRuns with
+    detection.compact_events (also needed just for counting, to count runs once),
+    detection.refine_onsets or detection.click_features (per-frame records with their
+    loudest sample or spectral features), or None when events are neither kept nor
+    compacted.
+    """
+    compact = get_compact_events(config) and (keep_events or counting)
+    refine = get_refine_onsets(config) and keep_events
+    features = CLICK_FEATURES if get_click_features(config) and keep_events else ()
+    if compact or refine or features:
+        return EventRuns(_frame_dtype(total_frames), np.dtype(get_dtype(config)),
+                         memory_limit=get_event_memory_limit(config), merge=compact, refine=refine,
+                         features=features)
+    return _event_buffer(config, total_frames) if keep_events else None
+
+
+def _events_to_output(events, W: int, fs: int, keep_events: bool):
+    """
+    Event times in seconds (None if not kept) and further columns of the main detector's
+    events; the store is closed.
+    """
+    if not keep_events or events is None:
+        if events is not None:
+            events.close()
+        return None, {}
+    if isinstance(events, EventRuns):
+        arrays = events.to_arrays(W, fs)
+        events.close()
+        return arrays["onset"], {name: arrays[column] for column, name in EVENT_COLUMNS.items() if column in arrays}
+    return _buffer_to_seconds(events, W, fs), {}
 
+
+def _coincident_channels(onsets, offsets, channel_times: list, lag: float) -> np.ndarray:
+    """
+    Number of channels with an event within `lag` seconds of each event, i.e. in
+    [onset - lag, offset + lag], from the sorted event times of each channel.
+    """
+    counts = np.zeros(len(onsets), dtype=np.int16)
+    for times in channel_times:
+        first = np.searchsorted(times, onsets - lag, side="left")
+        counts += np.searchsorted(times, offsets + lag, side="right") > first
+    return counts
+
+
+def _buffer_to_seconds(events: EventBuffer, W: int, fs: int):
+    """Event times of a buffer in seconds (None for no buffer); the buffer is closed."""
+    if events is None:
+        return None
+    event_times = events.to_seconds(W, fs)
+    events.close()
+    return event_times
+
+
+def _detect_shard(file_path: Path, config: dict, fs: int, first_frame: int, stop_frame: int,
+                  total_frames: int, window_size: float = None, keep_events: bool = True,
+                  odf_path: Path = None, named: bool = False, channels: list = None):
+    """
+    Worker job: detect one frame range, optionally keeping the flagged frames (see
+    `_event_store`), counting events per window, writing the ODF of the range into the
+    file created at `odf_path` (see `create_odf`) and running the named
+    detectors and, with several `channels`, every channel ({name: EventBuffer}, channels
+    named 'channel_<index>'). Also returns the read/wait times of the block reader.
+    """
+    counter = WindowCounter(window_size) if window_size is not None else None
+    events = _event_store(config, total_frames, keep_events, counter is not None)
+    odf_out = load_odf(odf_path, writable=True) if odf_path is not None else None
+    named_events = {d["name"]: _event_buffer(config, total_frames) for d in get_detectors(config)} if named else None
+    channel_events = None
+    if channels is not None and len(channels) > 1:
+        channel_events = {channel: _event_buffer(config, total_frames) for channel in channels}
+    io_stats = {}
+    num_skipped = detect_click_frames(file_path, config, fs, first_frame, stop_frame,
+                                      counter=counter, events=events, odf_out=odf_out,
+                                      named_events=named_events, io_stats=io_stats,
+                                      channels=channels, channel_events=channel_events)
+    streams = dict(named_events or {})
+    for channel, frames in (channel_events or {}).items():
+        streams[f"channel_{channel}"] = frames
+    if odf_out is not None:
+        odf_out.flush()
+    return events, num_skipped, counter, streams, io_stats
+
+
+def detect_click_frames(file_path: Path, config: dict, fs: int,
+                        first_frame: int = 0, stop_frame: int = None,
+                        counter: WindowCounter = None, events: EventBuffer = None,
+                        odf_out: np.ndarray = None, named_events: dict = None, io_stats: dict = None,
+                        channels: list = None, channel_events: dict = None):
+    """
+    Run the click detector over a range of frames of a WAV file.
+
+    Frame p is centred on sample p * W. A range starting after the first frame is
+    primed with the preceding frame (two with phase-based named detectors), whose ODF
+    is discarded, so any split of the file into ranges yields the same detections as
+    one pass.
+
+    With processing.energy_gate, frames too quiet to reach the threshold (see
+    `energy_gate_threshold`) are not transformed, except where a louder frame needs
+    them as its predecessor. Detections are unchanged. The gate is off when
+    `odf_out` is given, since every frame's ODF is needed then.
+
+    With `named_events`, the named detectors of detection.detectors (each a band, an
+    ODF and a threshold) are evaluated on the same spectrum: it is computed once per
+    block over the span of all bands, and each detector takes its own bins from it.
+
+    All `channels` are framed from the same read and transformed together: frames,
+    spectra and ODFs carry a leading channel axis, so one FFT call and one ODF update
+    per block cover every channel. The main detector (and everything but
+    `channel_events`) uses the first channel; the gate is off with several channels.
+
+    Args:
+        file_path (Path): Path to the .wav file.
+        config (dict): Loaded configuration dictionary.
+        fs (int): Sample rate of the file.
+        first_frame (int): First frame to report.
+        stop_frame (int, optional): Frame to stop before (default: end of file).
+        counter (WindowCounter, optional): Receives the event times of each block as they
+                                           are detected.
+        events (EventBuffer | EventRuns, optional): Receives the indices of the frames flagged
+                                                    as clicks (EventRuns: merged into runs,
+                                                    which `counter` then counts once, and/or
+                                                    with their loudest samples and spectral
+                                                    features).
+        odf_out (np.ndarray, optional): Receives the ODF of the reported frames at their frame
+                                        indices (e.g., a memory-mapped curve of the whole file).
+        named_events (dict, optional): Receives the flagged frames of each named detector,
+                                       {name: EventBuffer}, one entry per detection.detectors.
+        io_stats (dict, optional): Receives the block reader's 'read_seconds' and
+                                   'wait_seconds' (see `prefetch_audio_blocks`; not
+                                   set when the file is memory-mapped).
+        channels (list[int], optional): Channels to detect on (default: [0]).
+        channel_events (dict, optional): Receives the flagged frames of each channel,
+                                         {channel: EventBuffer}.
+
+    Returns:
+        int: The number of reported frames skipped by the energy gate.
+    """
     # Parameters from config
     short_term_duration = config["processing"]["short_term_duration"]
-    mid_term_duration = config["processing"]["mid_term_duration"]
     threshold = config["detection"]["threshold"]
     f_low = config["detection"]["frequency_band"]["low"]
     f_high = config["detection"]["frequency_band"]["high"]
+    dtype = np.dtype(get_dtype(config))
+    transform = get_transform(config)
+    fft_workers = get_fft_workers(config)
+    detectors = get_detectors(config) if named_events is not None else []
+    channels = list(channels) if channels is not None else [0]
+    num_channels = len(channels)
+    energy_gate = get_energy_gate(config) and odf_out is None and not detectors and num_channels == 1
+    refine = isinstance(events, EventRuns) and events.refine
+    features = isinstance(events, EventRuns) and bool(events.features)
 
     W = int(short_term_duration * fs)
     nfft = W
     window = windows.hann(W, sym=False)
 
-    # One-sided Frequency Vector
-    freqs_onesided = np.linspace(0,fs/2,nfft//2 + 1)
-    band_mask = (freqs_onesided >= f_low) & (freqs_onesided <= f_high)
+    # The spectrum is computed over the span of the main band and the named detectors'
+    # bands; each detector then reads its bins as a view of it
+    band = band_slice(fs, nfft, f_low, f_high)
+    detector_bands = [band_slice(fs, nfft, d["frequency_band"]["low"], d["frequency_band"]["high"])
+                      for d in detectors]
+    used = [b for b in [band] + detector_bands if b.stop > b.start]
+    span = slice(min(b.start for b in used), max(b.stop for b in used)) if used else band
+
+    def within_span(b):
+        return slice(b.start - span.start, b.stop - span.start) if b.stop > b.start else slice(0, 0)
 
-    stft_transform = ShortTimeFFT(mfft=nfft, hop=W, win=window, fft_mode='onesided', fs=fs)
+    main_bins = within_span(band)
+    band_freqs = (np.arange(band.start, band.stop) * fs / nfft).astype(dtype)
+    detector_engines = [(d["name"], within_span(b), make_streaming_odf(d["odf"], dtype), d["threshold"])
+                        for d, b in zip(detectors, detector_bands)]
+    # Phase-based ODFs use the ShortTimeFFT convention of `compute_cd` / `compute_wpd`:
+    # phases relative to the window centre rather than the frame start
+    centring = np.exp(2j * np.pi * np.arange(span.start, span.stop) * (W // 2) / W)
+    phase_based = {d["name"] for d in detectors if d["odf"] in ("cd", "wpd")}
 
-    num_samples_mid = int(mid_term_duration * fs)
-    start_sample = 0
-    time_sec_list = []
+    # Frames are centred on multiples of W (the ShortTimeFFT convention), so the stream
+    # starts with half a frame of zeros. Blocks hold at least two frames, which keeps
+    # the first-frame ODF convention block-independent.
+    block_frames = max(2, round(get_block_duration(config) * fs / W))
+    max_frames = block_frames + 1
 
-    while True:
-        audio_segment = read_audio_segment(file_path, start_sample, num_samples_mid)
-        if audio_segment is None or len(audio_segment) < W:
-            break
+    # Start one frame early to prime the ODF state (two for phase-based ODFs, which use
+    # the phase increment of the previous frame)
+    frame_index = max(first_frame - (2 if phase_based else 1), 0)
 
-        num_samples = len(audio_segment)
-        STFT_oneside = stft_transform.stft(audio_segment, p0=0, p1=num_samples // W, k_offset=0)
-        Sxx = np.abs(STFT_oneside)
-        Sxx_band = Sxx[band_mask, :]  # Shape: [num_selected_freqs, num_frames]
+    # Buffers reused for the whole file: the windowed frames (or squared frames for the
+    # energy gate) and, for mapped files, the frames converted to float
+    windowed = np.empty((num_channels, max_frames, W), dtype=dtype)
+    scaled = np.empty((num_channels, max_frames, W), dtype=dtype)
+    if transform == "band_dft":
+        basis = _band_dft_basis(window, span, dtype)
+        spectra = np.empty((num_channels, max_frames, basis.shape[1]), dtype=dtype)
+    if energy_gate:
+        squared_window = (window ** 2).astype(dtype)
+        min_energy = energy_gate_threshold(threshold, band.stop - band.start, W)
+    window = window.astype(dtype)
+
+    odf_engine = StreamingODF(dtype)
+    num_skipped = 0
+    first_block = True
+
+    # Frames are consecutive (hop == W), so each block is framed as a [num_channels,
+    # num_frames, W] view and transformed in one call. PCM WAVs are memory-mapped and
+    # framed in their sample type, the int -> float scale being fused into the window
+    # multiply; other files are decoded ahead on a reader thread (processing.prefetch_blocks).
+    for frames, scale in iter_frame_blocks(file_path, W, block_frames, frame_index, stop_frame,
+                                           dtype=dtype.name, backend=get_audio_backend(config),
+                                           depth=get_prefetch_blocks(config), io_stats=io_stats,
+                                           channels=channels):
+        num_frames = frames.shape[1]
+        block_frames_view, block_scale = frames[0], scale
+        if (energy_gate or transform == "band_dft") and (frames.dtype != dtype or scale != 1.0):
+            # The gate and the band DFT work on float frames: convert the mapped samples once
+            frames = np.multiply(frames, scale, out=scaled[:, :num_frames], dtype=dtype)
+            scale = 1.0
+
+        if energy_gate:
+            # Windowed energy per frame; only frames that may reach the threshold are
+            # evaluated. On the first block frame 0 shares the ODF of frame 1.
+            np.square(frames[0], out=windowed[0, :num_frames])
+            energy = windowed[0, :num_frames] @ squared_window
+            active = energy >= min_energy
+            if first_block and num_frames > 1:
+                active[0] = active[1]
+            active = np.flatnonzero(active)
+            needed = np.union1d(np.union1d(active, active[active > 0] - 1), [num_frames - 1])
+            frames = frames[:, needed]
+
+        num_rows = frames.shape[1]
+        if transform == "band_dft":
+            np.matmul(frames, basis, out=spectra[:, :num_rows])
+            Sxx_span = spectra[:, :num_rows].view(np.result_type(dtype, np.complex64))
+        else:
+            np.multiply(frames, window * scale, out=windowed[:, :num_rows], dtype=dtype)
+            Sxx_span = scipy.fft.rfft(windowed[:, :num_rows], axis=-1, workers=fft_workers)[..., span]
+        # Sxx_span shape: [num_channels, num_transformed_frames, num_span_freqs]
 
         # ----- ALGORITMOS -----
-        SF = compute_spectral_flux(Sxx_band)
-        HFC = compute_hfc(Sxx_band)
-        # WPD = compute_wpd(STFT_oneside)
-        # CD = compute_cd(STFT_oneside)
+        if energy_gate:
+            odf = odf_engine.update_sparse(Sxx_span[0, :, main_bins], needed, active)
+            frame_numbers = frame_index + active
+        else:
+            channel_odf = odf_engine.update(Sxx_span[..., main_bins])
+            odf = channel_odf[0]
+            frame_numbers = frame_index + np.arange(num_frames)
 
-        odf = np.log10(SF * HFC + 1)
         click_events = (odf >= threshold)
 
-        time_offset = start_sample / fs
-        time_chunk = time_offset + np.arange(len(odf)) * short_term_duration
+        reported = frame_numbers >= first_frame
+        for channel, values in zip(channels, channel_odf if channel_events is not None else []):
+            channel_events[channel].append(frame_numbers[(values >= threshold) & reported])
+        Sxx_span = Sxx_span[0]
+        for name, bins, engine, detector_threshold in detector_engines:
+            X_detector = Sxx_span[:, bins] * centring[bins] if name in phase_based else Sxx_span[:, bins]
+            detector_odf = engine.update(X_detector)
+            named_events[name].append(frame_numbers[(detector_odf >= detector_threshold) & reported])
+        flagged = click_events & reported
+        block_events = frame_numbers[flagged]
+        if events is not None:
+            amplitudes = samples = click_features = None
+            if refine:
+                # Loudest sample of each flagged frame, from the samples of this block: the
+                # flagged rows are gathered into one [clicks, W] array for a single argmax
+                rows = np.abs(np.multiply(block_frames_view[block_events - frame_index], block_scale, dtype=dtype))
+                loudest = np.argmax(rows, axis=1)
+                amplitudes = rows[np.arange(len(rows)), loudest]
+                # Frame p starts at sample p * W - W // 2 (frame 0 in the padding zeros)
+                samples = np.maximum(block_events * W - W // 2 + loudest, 0)
+            if features:
+                # Spectral features of the flagged frames only, from their rows of the
+                # spectrum (with the gate, the rows of the transformed frames)
+                rows = np.searchsorted(needed, active[flagged]) if energy_gate else np.flatnonzero(flagged)
+                click_features = compute_click_features(Sxx_span[rows, main_bins], band_freqs)
+            # With EventRuns, only the runs this block starts are counted
+            block_events = events.add(block_events, odf[flagged], amplitudes, samples, click_features)
+        if counter is not None:
+            counter.add(block_events * W / fs)
+        if odf_out is not None:
+            odf_out[frame_numbers[reported]] = odf[reported]
+        if energy_gate:
+            num_reported = num_frames - max(0, first_frame - frame_index)
+            num_skipped += num_reported - np.count_nonzero(reported)
+        first_block = False
 
-        time_sec_list.extend(time_chunk[click_events])
-        start_sample += num_samples_mid
+        frame_index += num_frames
 
-    return pd.DataFrame({"Event_Time_Seconds": time_sec_list})
+    return num_skipped
 
 
 
-def save_detection_results(df: pd.DataFrame, output_file: Path, wav_path: Path):
+def save_detection_results(df: pd.DataFrame, output_file: Path, wav_path: Path, config: dict = None):
     """
-    Saves detected event timestamps to a CSV file, along with the duration of the original WAV file.
+    Saves detected event timestamps along with the duration and sample rate of the original WAV file.
+
+    The format follows the suffix of `output_file`: .npz stores everything in one
+    columnar file, .csv writes the timestamps plus a .meta file with the duration.
+    Event times of named detectors (df.attrs['detector_events']) are saved the same way
+    to <output folder>/<detector name>/<output file name>.
 
     Args:
         df (pd.DataFrame): DataFrame with click event time stamps.
-        output_file (Path): Destination path for CSV output.
+        output_file (Path): Destination path (*_events.npz or *_events.csv).
         wav_path (Path): Path to the original .wav file (to compute its duration).
+        config (dict, optional): Configuration used for detection, hashed into the metadata.
     """
-    output_file.parent.mkdir(parents=True, exist_ok=True)
-    df.to_csv(output_file, index=False)
-
+    metadata = {"config_hash": config_hash(detection_params(config)) if config is not None else None}
     try:
         info = sf.info(wav_path)
-        duration_sec = info.frames / info.samplerate
-        metadata_file = output_file.with_suffix('.meta')
-        with open(metadata_file, 'w') as meta_f:
-            meta_f.write(f"Duration_Seconds: {duration_sec:.3f}\n")
+        metadata["duration_seconds"] = info.frames / info.samplerate
+        metadata["fs"] = info.samplerate
     except Exception as e:
         print(f"Warning: Could not extract WAV duration for {wav_path.name}: {e}")
+
+    event_times = df["Event_Time_Seconds"].to_numpy() if "Event_Time_Seconds" in df else []
+    # Further columns (e.g. the run offsets and peaks of compacted events) are saved alongside
+    columns = {column: df[column].to_numpy() for column in df.columns if column != "Event_Time_Seconds"}
+    save_events(event_times, output_file, metadata, columns)
+    for name, detector_times in df.attrs.get("detector_events", {}).items():
+        save_events(detector_times, get_detector_output_path(output_file, name), metadata)
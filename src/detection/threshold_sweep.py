@@ -0,0 +1,288 @@
+# src/detection/threshold_sweep.py
+"""
+Sweep detection.threshold (and several frequency bands) against the reference detections.
+
+The spectrum of each WAV file is computed once; the ODF of every band comes from that
+same spectrum, and every threshold of the grid is scored in one vectorized pass over the
+ODF. Detections are matched to data/reference_detections/<experiment>/<trial>/<stem>_events
+with a time tolerance, and the script writes a precision/recall/F1 table and reports the
+best operating point.
+
+Usage:
+    python src/detection/threshold_sweep.py <experiment_path> --bands 5000-22000 2000-22000
+"""
+
+import sys
+import os
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import scipy.fft
+from scipy.signal import windows
+
+# === Step 1: Detect project root and add to sys.path ===
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+# === Step 2: Project imports ===
+from src.config.config_loader import load_config
+from src.config.config_helpers import (
+    get_block_duration, get_dtype, get_fft_workers, get_prefetch_blocks, get_audio_backend
+)
+from src.data.preprocess import iter_frame_blocks, get_sample_rate
+from src.data.event_io import OUTPUT_FORMATS, get_output_path, load_events
+from src.detection.click_detection_utils import band_slice
+from src.features.extract_features import StreamingODF
+
+REFERENCE_DIR = PROJECT_ROOT / "data" / "reference_detections"
+REPORT_DIR = PROJECT_ROOT / "data" / "report"
+
+
+def compute_band_odfs(file_path: Path, config: dict, bands, fs: int) -> list:
+    """
+    ODF of every frame of a WAV file for several frequency bands, from one spectrum per block.
+
+    Frames follow the detector layout (frame p centred on sample p * W), so thresholding
+    the ODF of the configured band gives the detections of `detect_clicks`.
+
+    Args:
+        file_path (Path): Path to the .wav file.
+        config (dict): Loaded configuration dictionary.
+        bands (list[tuple[float, float]]): (low, high) frequency bands in Hz.
+        fs (int): Sample rate of the file.
+
+    Returns:
+        list[np.ndarray]: One ODF array per band.
+    """
+    dtype = np.dtype(get_dtype(config))
+    W = int(config["processing"]["short_term_duration"] * fs)
+    window = windows.hann(W, sym=False).astype(dtype)
+    slices = [band_slice(fs, W, low, high) for low, high in bands]
+
+    block_frames = max(2, round(get_block_duration(config) * fs / W))
+
+    engines = [StreamingODF(dtype) for _ in bands]
+    odfs = [[] for _ in bands]
+    for frames, scale in iter_frame_blocks(file_path, W, block_frames, dtype=dtype.name,
+                                           backend=get_audio_backend(config),
+                                           depth=get_prefetch_blocks(config)):
+        windowed = np.multiply(frames, window * scale, dtype=dtype)
+        spectrum = scipy.fft.rfft(windowed, axis=-1, workers=get_fft_workers(config))
+        for engine, band, odf in zip(engines, slices, odfs):
+            odf.append(engine.update(spectrum[:, band]).copy())
+
+    return [np.concatenate(odf) if odf else np.zeros(0, dtype=dtype) for odf in odfs]
+
+
+def _count_at_least(values: np.ndarray, thresholds: np.ndarray) -> np.ndarray:
+    """Number of `values` >= each threshold."""
+    values = np.sort(values)
+    return len(values) - np.searchsorted(values, thresholds, side="left")
+
+
+def score_thresholds(odf: np.ndarray, frame_times: np.ndarray, reference: np.ndarray,
+                     thresholds: np.ndarray, tolerance: float) -> dict:
+    """
+    Count detections and matches of every threshold at once.
+
+    A frame is a true positive if a reference event lies within `tolerance` seconds; a
+    reference event is recalled if a detected frame lies within `tolerance` of it, i.e.
+    if the highest ODF among its nearby frames reaches the threshold.
+
+    Args:
+        odf (np.ndarray): ODF per frame.
+        frame_times (np.ndarray): Time of each frame in seconds (sorted).
+        reference (np.ndarray): Reference event times in seconds.
+        thresholds (np.ndarray): Thresholds to score.
+        tolerance (float): Maximum matching distance in seconds.
+
+    Returns:
+        dict: 'detections', 'true_positives' and 'recalled' (one count per threshold)
+              and 'references'.
+    """
+    reference = np.sort(np.asarray(reference, dtype=float))
+
+    # Frames with a reference event within tolerance: nearest neighbour by searchsorted
+    matched = np.zeros(len(frame_times), dtype=bool)
+    if len(reference):
+        idx = np.searchsorted(reference, frame_times)
+        before = np.abs(frame_times - reference[np.maximum(idx - 1, 0)])
+        after = np.abs(reference[np.minimum(idx, len(reference) - 1)] - frame_times)
+        matched = np.minimum(before, after) <= tolerance
+
+    # Highest ODF among the frames within tolerance of each reference event
+    lo = np.searchsorted(frame_times, reference - tolerance, side="left")
+    hi = np.searchsorted(frame_times, reference + tolerance, side="right")
+    peaks = np.full(len(reference), -np.inf)
+    nonempty = hi > lo
+    if nonempty.any():
+        padded = np.append(odf, -np.inf)
+        bounds = np.column_stack([lo[nonempty], hi[nonempty]]).ravel()
+        peaks[nonempty] = np.maximum.reduceat(padded, bounds)[::2]
+
+    return {
+        "detections": _count_at_least(odf, thresholds),
+        "true_positives": _count_at_least(odf[matched], thresholds),
+        "recalled": _count_at_least(peaks, thresholds),
+        "references": len(reference),
+    }
+
+
+def sweep_file(wav_file: Path, reference_file: Path, config: dict, bands, thresholds,
+               tolerance: float) -> list:
+    """
+    Worker job: score every band and threshold on one WAV file.
+
+    Returns:
+        list[dict]: `score_thresholds` counts, one entry per band.
+    """
+    fs = get_sample_rate(wav_file)
+    if fs is None:
+        raise ValueError(f"Could not read sampling rate for {wav_file}")
+
+    W = int(config["processing"]["short_term_duration"] * fs)
+    reference, _ = load_events(reference_file, mmap=False)
+    odfs = compute_band_odfs(wav_file, config, bands, fs)
+    frame_times = np.arange(len(odfs[0])) * W / fs
+    return [score_thresholds(odf, frame_times, reference, thresholds, tolerance) for odf in odfs]
+
+
+def find_reference_file(experiment_name: str, trial_name: str, stem: str):
+    """Reference events file of a recording (None if there is none)."""
+    for fmt in OUTPUT_FORMATS:
+        path = get_output_path(REFERENCE_DIR / experiment_name / trial_name, stem, "events", fmt)
+        if path.exists():
+            return path
+    return None
+
+
+def sweep(experiment_path: Path, config: dict, bands=None, thresholds=None, tolerance: float = None,
+          workers: int = None) -> pd.DataFrame:
+    """
+    Score a grid of thresholds and bands on every WAV file of an experiment that has
+    reference detections, one file per worker process.
+
+    Args:
+        experiment_path (Path): Experiment folder with one subfolder of WAV files per trial.
+        config (dict): Loaded configuration dictionary (frame length, dtype, block size).
+        bands (list[tuple[float, float]], optional): Bands in Hz (default: detection.frequency_band).
+        thresholds (array-like, optional): Thresholds (default: 0.001 to 0.1 in steps of 0.001).
+        tolerance (float, optional): Matching tolerance in seconds (default: one frame).
+        workers (int, optional): Worker processes (default: number of CPUs).
+
+    Returns:
+        pd.DataFrame: One row per band and threshold with counts, precision, recall and F1
+                      summed over all files.
+    """
+    if bands is None:
+        band = config["detection"]["frequency_band"]
+        bands = [(band["low"], band["high"])]
+    if thresholds is None:
+        thresholds = np.round(np.arange(1, 101) * 0.001, 3)
+    thresholds = np.asarray(thresholds, dtype=float)
+    if tolerance is None:
+        tolerance = config["processing"]["short_term_duration"]
+
+    jobs = []
+    for trial_folder in sorted(p for p in experiment_path.iterdir() if p.is_dir()):
+        for wav_file in sorted(trial_folder.glob("*.WAV")):
+            reference_file = find_reference_file(experiment_path.name, trial_folder.name, wav_file.stem)
+            if reference_file is None:
+                print(f"[Warning] No reference detections for: {wav_file.name}")
+                continue
+            jobs.append((wav_file, reference_file))
+
+    totals = [{"detections": 0, "true_positives": 0, "recalled": 0, "references": 0} for _ in bands]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(sweep_file, wav_file, reference_file, config, bands, thresholds, tolerance)
+                   for wav_file, reference_file in jobs]
+        for (wav_file, _), future in zip(jobs, futures):
+            try:
+                scores = future.result()
+            except Exception as e:
+                print(f"❌ Sweep failed for: {wav_file}: {e}")
+                continue
+            for total, score in zip(totals, scores):
+                for key in total:
+                    total[key] = total[key] + score[key]
+            print(f"✅ Scored: {wav_file}")
+
+    tables = []
+    for (low, high), total in zip(bands, totals):
+        detections = np.broadcast_to(total["detections"], thresholds.shape)
+        true_positives = np.broadcast_to(total["true_positives"], thresholds.shape)
+        recalled = np.broadcast_to(total["recalled"], thresholds.shape)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            precision = np.where(detections > 0, true_positives / detections, np.nan)
+            recall = np.where(total["references"] > 0, recalled / max(total["references"], 1), np.nan)
+            f1 = 2 * precision * recall / (precision + recall)
+        tables.append(pd.DataFrame({
+            "band_low": low,
+            "band_high": high,
+            "threshold": thresholds,
+            "detections": detections,
+            "true_positives": true_positives,
+            "references": total["references"],
+            "recalled": recalled,
+            "precision": precision,
+            "recall": recall,
+            "f1": f1,
+        }))
+    return pd.concat(tables, ignore_index=True)
+
+
+def parse_band(text: str):
+    """Parse a 'low-high' band in Hz."""
+    try:
+        low, high = (float(value) for value in text.split("-"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected a band as low-high (e.g. 5000-22000), got '{text}'")
+    return low, high
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Sweep detection thresholds and bands against reference detections.")
+    parser.add_argument(
+        "experiment_path",
+        type=str,
+        help="Path to the experiment folder containing subdirectories with the .wav audio files."
+    )
+    parser.add_argument("--bands", type=parse_band, nargs="+", default=None,
+                        help="Frequency bands as low-high in Hz (default: detection.frequency_band).")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=None,
+                        help="Thresholds to score (default: 0.001 to 0.1 in steps of 0.001).")
+    parser.add_argument("--tolerance", type=float, default=None,
+                        help="Matching tolerance in seconds (default: processing.short_term_duration).")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="Number of WAV files processed in parallel (default: number of CPUs).")
+    parser.add_argument("--output", type=str, default=None,
+                        help="CSV output file (default: data/report/<experiment>_threshold_sweep.csv).")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    experiment_path = Path(args.experiment_path)
+    if not experiment_path.exists():
+        print(f"Experiment folder not found: {experiment_path}")
+        sys.exit(1)
+
+    table = sweep(experiment_path, load_config(), bands=args.bands, thresholds=args.thresholds,
+                  tolerance=args.tolerance, workers=args.workers)
+
+    output = Path(args.output) if args.output else REPORT_DIR / f"{experiment_path.name}_threshold_sweep.csv"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    table.to_csv(output, index=False)
+    print(f"\nSaved sweep table to: {output}")
+
+    if table["f1"].notna().any():
+        best = table.loc[table["f1"].idxmax()]
+        print(f"Best operating point: band {best['band_low']:g}-{best['band_high']:g} Hz, "
+              f"threshold {best['threshold']:g} -> precision {best['precision']:.3f}, "
+              f"recall {best['recall']:.3f}, F1 {best['f1']:.3f}")
+    else:
+        print("No operating point could be scored (no detections or no reference events).")
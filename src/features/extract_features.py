@@ -54,39 +54,317 @@ def compute_wpd(X, method="phase_init"):
     return np.log2(WPD + 1)
 
 
-def compute_spectral_flux(X):#, freqs, f_low, f_high):
+def compute_spectral_flux(X, previous=None):#, freqs, f_low, f_high):
     """
     Compute Spectral Flux (SF) for a selected frequency band.
+
+    If `previous` (the band magnitudes of the frame preceding X) is given, the first
+    frame is differenced against it; otherwise its delta duplicates the second frame's.
     """
     # freq_indices = np.where((freqs >= f_low) & (freqs <= f_high))[0]
     # X = _sigm(X)
+    if previous is not None:
+        X = np.concatenate([np.asarray(previous)[:, None], X], axis=1)
 
     delta_X = np.zeros_like(X)
     delta_X[:, 1:] = np.abs(X[:, 1:]) - np.abs(X[:, :-1])
-    delta_X[:, 0] = delta_X[:, 1]
+    if previous is not None:
+        delta_X = delta_X[:, 1:]
+    elif X.shape[1] > 1:
+        delta_X[:, 0] = delta_X[:, 1]
 
     H = (delta_X + np.abs(delta_X)) / 2
     SF = np.sum(H, axis=0)
 
     return np.log10(SF + 1)
 
-def compute_hfc(X):#, freqs, f_low, f_hig):
+def compute_hfc(X, previous=None):#, freqs, f_low, f_hig):
     """
     Compute High-Frequency Content (HFC) and its difference (ΔHFC) for a selected frequency band.
+
+    `previous` has the same meaning as in `compute_spectral_flux`.
     """
     # freq_indices = np.where((freqs >= f_low) & (freqs <= f_hig))[0]
     # X = _sigm(X)
+    if previous is not None:
+        X = np.concatenate([np.asarray(previous)[:, None], X], axis=1)
     magnitude = np.abs(X)
 
     HFC = np.sum(magnitude, axis=0)
 
     delta_HFC = np.zeros_like(HFC)
     delta_HFC[1:] = HFC[1:] - HFC[:-1]
-    delta_HFC[0] = delta_HFC[1]
+    if previous is not None:
+        delta_HFC = delta_HFC[1:]
+    elif len(HFC) > 1:
+        delta_HFC[0] = delta_HFC[1]
 
     delta_HFC = (delta_HFC + np.abs(delta_HFC)) / 2
 
     return np.log10(delta_HFC + 1)
 
+
+def compute_click_features(X, freqs):
+    """
+    Spectral features of click frames from their band spectra.
+
+    Args:
+        X (np.ndarray): Band STFT of the click frames, shape [num_clicks, num_bins].
+        freqs (np.ndarray): Frequency of each bin in Hz.
+
+    Returns:
+        dict: 'peak_amplitude' (largest magnitude), 'band_energy' (sum of squared
+              magnitudes), 'spectral_centroid' and 'peak_frequency' (in Hz), one value
+              per click.
+    """
+    magnitude = np.abs(X)
+    peak_bin = np.argmax(magnitude, axis=1)
+    total = magnitude.sum(axis=1)
+    # Row-wise sums rather than a matrix product, so a click's features do not depend
+    # on how many clicks are computed together
+    weighted = (magnitude * freqs).sum(axis=1)
+    return {
+        "peak_amplitude": magnitude[np.arange(len(magnitude)), peak_bin],
+        "band_energy": np.square(magnitude).sum(axis=1),
+        "spectral_centroid": np.divide(weighted, total, out=np.zeros_like(weighted), where=total > 0),
+        "peak_frequency": freqs[peak_bin],
+    }
+
+
+# Onset detection functions available to the detectors: the product of spectral flux and
+# high-frequency content, each of them alone, complex domain and weighted phase deviation
+ODF_KINDS = ("sf_hfc", "sf", "hfc", "cd", "wpd")
+
+
+class StreamingODF:
+    """
+    Incremental onset detection function (log10(SF * HFC + 1)) over consecutive STFT blocks.
+
+    With kind='sf' or 'hfc', the spectral flux or HFC term alone is returned instead
+    (the values of `compute_spectral_flux` and `compute_hfc`).
+
+    The band magnitudes of the last frame of each block are kept, so the first frame of
+    the next block is differenced against them. Splitting a signal into blocks therefore
+    gives the same ODF as processing it in one piece.
+
+    Blocks are frame-major ([num_frames, num_bins], the layout of a batched rfft along
+    the last axis), so every per-frame sum runs over contiguous memory. Magnitudes,
+    deltas and ODF values live in buffers allocated once (and grown only if a larger
+    block arrives), and every step runs in place with `out=`. The magnitude buffer keeps
+    the previous frame in row 0, so no per-block concatenation is needed.
+
+    Blocks may have leading axes (e.g. [num_channels, num_frames, num_bins]): each
+    channel is an independent stream and gets the ODF it would get on its own.
+    """
+
+    def __init__(self, dtype=np.float64, kind: str = "sf_hfc"):
+        if kind not in ("sf_hfc", "sf", "hfc"):
+            raise ValueError(f"StreamingODF computes 'sf_hfc', 'sf' or 'hfc', not '{kind}'")
+        self.dtype = np.dtype(dtype)
+        self.kind = kind
+        self._has_previous = False
+        self._magnitude = None  # [..., 1 + num_frames, num_bins]; row 0 is the previous frame
+
+    def _ensure_buffers(self, num_frames, num_bins, lead=()):
+        if (self._magnitude is not None and self._magnitude.shape[:-2] == lead
+                and self._magnitude.shape[-1] == num_bins and self._magnitude.shape[-2] > num_frames):
+            return
+
+        magnitude = np.empty(lead + (num_frames + 1, num_bins), dtype=self.dtype)
+        if self._has_previous:
+            magnitude[..., 0, :] = self._magnitude[..., 0, :]
+        self._magnitude = magnitude
+        self._delta = np.empty(lead + (num_frames, num_bins), dtype=self.dtype)
+        self._hfc = np.empty(lead + (num_frames + 1,), dtype=self.dtype)
+        self._delta_hfc = np.empty(lead + (num_frames,), dtype=self.dtype)
+        self._odf = np.empty(lead + (num_frames,), dtype=self.dtype)
+
+    def update(self, X):
+        """
+        Compute the ODF for the next block.
+
+        Args:
+            X (np.ndarray): Band STFT values or magnitudes, shape [num_frames, num_selected_freqs]
+                            (or [..., num_frames, num_selected_freqs]).
+
+        Returns:
+            np.ndarray: ODF value per frame ([..., num_frames]). The array is a view of an
+                        internal buffer that is overwritten by the next call.
+        """
+        *lead, T, num_bins = X.shape
+        self._ensure_buffers(T, num_bins, tuple(lead))
+
+        magnitude = self._magnitude[..., :T + 1, :]
+        np.abs(X, out=magnitude[..., 1:, :])
+        first = not self._has_previous
+        if first:
+            magnitude[..., 0, :] = magnitude[..., 1, :]
+
+        # Spectral flux: half-wave rectified magnitude increase, summed over the band
+        delta = self._delta[..., :T, :]
+        np.subtract(magnitude[..., 1:, :], magnitude[..., :-1, :], out=delta)
+        if first and T > 1:
+            delta[..., 0, :] = delta[..., 1, :]
+        np.maximum(delta, 0, out=delta)
+        SF = self._odf[..., :T]
+        np.sum(delta, axis=-1, out=SF)
+        np.add(SF, 1, out=SF)
+        np.log10(SF, out=SF)
+
+        # High-frequency content: half-wave rectified increase of the band magnitude sum
+        HFC = self._hfc[..., :T + 1]
+        np.sum(magnitude, axis=-1, out=HFC)
+        delta_HFC = self._delta_hfc[..., :T]
+        np.subtract(HFC[..., 1:], HFC[..., :-1], out=delta_HFC)
+        if first and T > 1:
+            delta_HFC[..., 0] = delta_HFC[..., 1]
+        np.maximum(delta_HFC, 0, out=delta_HFC)
+        np.add(delta_HFC, 1, out=delta_HFC)
+        np.log10(delta_HFC, out=delta_HFC)
+
+        magnitude[..., 0, :] = magnitude[..., T, :]
+        self._has_previous = True
+        if self.kind == "sf":
+            return SF
+        if self.kind == "hfc":
+            return delta_HFC
+
+        # odf = log10(SF * HFC + 1)
+        np.multiply(SF, delta_HFC, out=SF)
+        np.add(SF, 1, out=SF)
+        np.log10(SF, out=SF)
+        return SF
+
+    def update_sparse(self, X, frames, active):
+        """
+        Compute the ODF of selected frames of the next block from a subset of its spectra.
+
+        Gives the same values as `update` on the full block for the `active` frames.
+        `frames` must contain every active frame, the predecessor of every active frame
+        and the last frame of the block (carried to the next block). On the first block,
+        frame 0 takes the ODF of frame 1 (see `compute_spectral_flux`), so frame 1 must be
+        present whenever frame 0 is active.
+
+        Args:
+            X (np.ndarray): Band STFT values or magnitudes of `frames`, shape [len(frames), num_bins].
+            frames (np.ndarray): Sorted block-relative indices of the rows of X.
+            active (np.ndarray): Sorted block-relative indices of the frames to evaluate.
+
+        Returns:
+            np.ndarray: ODF value per active frame.
+        """
+        if self.kind != "sf_hfc":
+            raise ValueError("update_sparse is only available for the 'sf_hfc' ODF")
+        num_rows, num_bins = X.shape
+        self._ensure_buffers(num_rows, num_bins)
+
+        magnitude = self._magnitude[:num_rows + 1]
+        np.abs(X, out=magnitude[1:])
+        first = not self._has_previous
+        if first:
+            magnitude[0] = magnitude[1]
+
+        # Row of each active frame and of its predecessor (row 0 is the carried frame)
+        current = np.asarray(active)
+        if first and len(frames) > 1:
+            current = np.maximum(current, 1)
+        current_rows = 1 + np.searchsorted(frames, current)
+        previous_rows = np.searchsorted(frames, current - 1) + (current > 0)
+
+        current_mag = magnitude[current_rows]
+        previous_mag = magnitude[previous_rows]
+
+        delta = current_mag - previous_mag
+        np.maximum(delta, 0, out=delta)
+        SF = np.sum(delta, axis=1)
+        np.add(SF, 1, out=SF)
+        np.log10(SF, out=SF)
+
+        delta_HFC = np.sum(current_mag, axis=1) - np.sum(previous_mag, axis=1)
+        np.maximum(delta_HFC, 0, out=delta_HFC)
+        np.add(delta_HFC, 1, out=delta_HFC)
+        np.log10(delta_HFC, out=delta_HFC)
+
+        np.multiply(SF, delta_HFC, out=SF)
+        np.add(SF, 1, out=SF)
+        np.log10(SF, out=SF)
+
+        magnitude[0] = magnitude[num_rows]
+        self._has_previous = True
+        return SF
+
+
+class StreamingPhaseODF:
+    """
+    Incremental complex domain ('cd') or weighted phase deviation ('wpd') ODF over
+    consecutive STFT blocks, frame-major ([num_frames, num_bins]).
+
+    The phase and phase increment of the last frame of each block are carried, so a
+    split signal gives the values of `compute_cd` / `compute_wpd` on the whole STFT
+    (with their 'phase_init' convention on the first frame).
+    """
+
+    def __init__(self, kind: str, dtype=np.float64):
+        if kind not in ("cd", "wpd"):
+            raise ValueError(f"StreamingPhaseODF computes 'cd' or 'wpd', not '{kind}'")
+        self.kind = kind
+        self.dtype = np.dtype(dtype)
+        self._previous_phase = None  # phase of the last frame seen
+        self._previous_increment = None  # wrapped phase increment of that frame
+
+    def update(self, X):
+        """
+        Compute the ODF for the next block.
+
+        Args:
+            X (np.ndarray): Complex band STFT, shape [num_frames, num_selected_freqs].
+
+        Returns:
+            np.ndarray: ODF value per frame.
+        """
+        phase = np.angle(X)
+        first = self._previous_phase is None
+
+        # Wrapped phase increment; on the first frame it duplicates the second one's
+        increment = np.empty_like(phase)
+        increment[1:] = phase[1:] - phase[:-1]
+        increment[0] = 0 if first else phase[0] - self._previous_phase
+        increment = np.mod(increment + np.pi, 2 * np.pi) - np.pi
+        if first:
+            increment[0] = increment[1] if len(increment) > 1 else 0
+
+        previous_increment = np.empty_like(increment)
+        previous_increment[1:] = increment[:-1]
+        previous_increment[0] = increment[0] if first else self._previous_increment
+
+        if self.kind == "cd":
+            # Target spectrum: current magnitude with the phase of the two last increments
+            phase_sum = increment + previous_increment
+            if first:
+                phase_sum[0] = increment[0]
+            target = np.abs(X) * np.exp(1j * phase_sum)
+            odf = np.log10(np.sum(np.tanh(np.abs(X - target)), axis=1) + 1)
+        else:
+            second_increment = increment - previous_increment
+            if first:
+                second_increment[0] = second_increment[1] if len(increment) > 1 else 0
+            wpd = (2 / X.shape[1]) * np.sum(_sigm(np.abs(X * second_increment)), axis=1)
+            odf = np.log2(wpd + 1)
+
+        self._previous_phase = phase[-1]
+        self._previous_increment = increment[-1]
+        return odf.astype(self.dtype, copy=False)
+
+
+def make_streaming_odf(kind: str = "sf_hfc", dtype=np.float64):
+    """Streaming ODF engine for one of ODF_KINDS."""
+    if kind in ("cd", "wpd"):
+        return StreamingPhaseODF(kind, dtype)
+    if kind in ODF_KINDS:
+        return StreamingODF(dtype, kind)
+    raise ValueError(f"Unknown ODF '{kind}', expected one of {ODF_KINDS}")
+
+
 # Define the public API
-__all__ = ["compute_cd", "compute_wpd", "compute_spectral_flux", "compute_hfc"]
+__all__ = ["compute_cd", "compute_wpd", "compute_spectral_flux", "compute_hfc", "compute_click_features",
+           "StreamingODF", "StreamingPhaseODF", "make_streaming_odf", "ODF_KINDS"]
@@ -0,0 +1,372 @@
+# src/pipeline/pipeline.py
+
+import sys
+import os
+import time
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+# === Step 1: Detect project root and add to sys.path ===
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+# === Step 2: Project imports ===
+from src.config.config_loader import load_config
+from src.config.config_helpers import (
+    get_output_format, get_streaming_aggregation, get_save_events, get_base_resolution, get_odf_cache
+)
+from src.detection.click_detection_utils import (
+    detect_clicks, detect_and_aggregate, save_detection_results, detection_params, odf_params, odf_cache_covers,
+    share_cores
+)
+from src.data.event_io import get_output_path, get_odf_path, load_events, save_aggregated, load_aggregated
+from src.aggregation.aggregate_detections import aggregate_files
+from src.aggregation.count_index import CountIndex, get_index_path, invalidate_index
+from src.aggregation.aggregate_detections_batch import aggregate_folder
+from src.aggregation.join_aggregated_files import join_aggregated_frames, join_aggregated_files, join_inputs
+from src.visualization.plot_detection_comparison import plot_comparison_frames, REFERENCE_DIR, FIGURE_DIR
+from src.utils.manifest import Manifest, file_fingerprint
+
+MODEL_DIR = PROJECT_ROOT / "data" / "metadata" / "model_detections"
+REFERENCE_METADATA_DIR = PROJECT_ROOT / "data" / "metadata" / "reference_detections"
+
+STAGES = ["detect", "aggregate", "join", "plot"]
+
+
+def _detect_file(wav_file: Path, config: dict, fingerprint: bool, window_size: float = None,
+                 keep_events: bool = True, odf_path: Path = None, reuse_odf: bool = False):
+    """
+    Worker job: detect clicks in one WAV file (and fingerprint it for the manifest).
+
+    With `window_size`, events are also counted per window in the same pass. With
+    `odf_path`, the ODF is cached there, or re-thresholded from there with `reuse_odf`.
+    """
+    if window_size is None:
+        df_events, df_agg = detect_clicks(wav_file, config, odf_path, reuse_odf), None
+    else:
+        df_events, df_agg = detect_and_aggregate(wav_file, config, window_size, keep_events,
+                                                 odf_path, reuse_odf)
+    return df_events, df_agg, file_fingerprint(wav_file) if fingerprint else None
+
+
+def detect_stage(experiment_path: Path, config: dict, workers: int = None,
+                 persist: bool = False, force: bool = False, streaming: bool = False):
+    """
+    Detect clicks in every WAV file of an experiment.
+
+    With `persist`, event files (in the configured output format) are written under
+    data/metadata/model_detections and
+    files whose WAV and detection settings match the manifest are loaded from disk
+    instead of being recomputed.
+
+    With `streaming`, events are counted per aggregation window during detection
+    (aggregated files are persisted instead of being recomputed later), and event
+    times are only kept if output.save_events is set.
+
+    With `persist` and processing.odf_cache, the ODF of each file is saved next to its
+    events, and files whose WAV and ODF settings are unchanged (e.g., only the
+    threshold changed) are re-thresholded from it without reading the audio.
+
+    Returns:
+        tuple[dict, dict | None]: {trial name: [(segment name, events DataFrame or None), ...]}
+                                  and, with `streaming`, the same layout of aggregated
+                                  DataFrames; in recording order.
+    """
+    # Shards and file workers share the CPUs
+    config = share_cores(config, workers)
+    manifest = Manifest()
+    params = detection_params(config)
+    experiment_name = experiment_path.name
+    fmt = get_output_format(config)
+    window_size = config["aggregation"]["window_size"] if streaming else None
+    keep_events = not streaming or get_save_events(config)
+    aggregation_params = {**params, "window_size": window_size}
+    # The cached ODF only covers plain detection (see `odf_cache_covers`)
+    odf_cache = persist and get_odf_cache(config) and odf_cache_covers(config)
+    cache_params = odf_params(config)
+
+    events = {}
+    aggregated = {} if streaming else None
+    jobs = []
+    for trial_folder in sorted(p for p in experiment_path.iterdir() if p.is_dir()):
+        events[trial_folder.name] = []
+        if streaming:
+            aggregated[trial_folder.name] = []
+        trial_dir = MODEL_DIR / experiment_name / trial_folder.name
+        for wav_file in sorted(trial_folder.glob("*.WAV")):
+            output_path = get_output_path(trial_dir, wav_file.stem, "events", fmt) if keep_events else None
+            aggregated_path = get_output_path(trial_dir, wav_file.stem, "aggregated", fmt) if streaming else None
+            odf_path = get_odf_path(trial_dir, wav_file.stem) if odf_cache else None
+            jobs.append((trial_folder.name, wav_file, output_path, aggregated_path, odf_path))
+
+    def up_to_date(wav_file, output_path, aggregated_path):
+        return (
+            (output_path is None
+             or manifest.is_up_to_date("detection", output_path, [wav_file], params))
+            and (aggregated_path is None
+                 or manifest.is_up_to_date("streaming_aggregation", aggregated_path,
+                                           [wav_file], aggregation_params))
+        )
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures, cached = [], []
+        for trial_name, wav_file, output_path, aggregated_path, odf_path in jobs:
+            if persist and not force and up_to_date(wav_file, output_path, aggregated_path):
+                futures.append(None)
+                cached.append(None)
+                continue
+            # Only the threshold changed: the saved ODF (and the WAV fingerprint) are reused
+            reuse_odf = (odf_path is not None and not force
+                         and manifest.is_up_to_date("odf", odf_path, [wav_file], cache_params))
+            if reuse_odf:
+                print(f"♻ Re-thresholding cached ODF: {wav_file.name}")
+            cached.append(manifest.recorded_fingerprint("odf", odf_path, wav_file) if reuse_odf else None)
+            futures.append(executor.submit(_detect_file, wav_file, config, persist and not reuse_odf,
+                                           window_size, keep_events, odf_path, reuse_odf))
+
+        for (trial_name, wav_file, output_path, aggregated_path, odf_path), future, known_fingerprint in zip(
+                jobs, futures, cached):
+            if future is None:
+                print(f"⏭ Unchanged, loading saved results: {wav_file.name}")
+                df_events = df_agg = None
+                if output_path is not None:
+                    event_times, metadata = load_events(output_path)
+                    df_events = pd.DataFrame({"Event_Time_Seconds": event_times})
+                    df_events.attrs["duration_seconds"] = metadata.get("duration_seconds")
+                if aggregated_path is not None:
+                    df_agg = load_aggregated(aggregated_path)
+            else:
+                try:
+                    df_events, df_agg, fingerprint = future.result()
+                except Exception as e:
+                    print(f"❌ Detection failed for: {wav_file}: {e}")
+                    continue
+                if known_fingerprint is not None:
+                    fingerprint = known_fingerprint
+                elif odf_path is not None:
+                    manifest.record("odf", odf_path, [wav_file], cache_params, [fingerprint])
+                if persist:
+                    if output_path is not None:
+                        save_detection_results(df_events, output_path, wav_path=wav_file, config=config)
+                        manifest.record("detection", output_path, [wav_file], params, [fingerprint])
+                    if aggregated_path is not None:
+                        save_aggregated(df_agg, aggregated_path)
+                        manifest.record("streaming_aggregation", aggregated_path, [wav_file],
+                                        aggregation_params, [fingerprint])
+                        if output_path is None:
+                            # The trial's count index still counts the old events
+                            invalidate_index(aggregated_path.parent, manifest)
+                num_events = len(df_events) if df_events is not None else int(df_agg["event_count"].sum())
+                print(f"✅ Detection complete for: {wav_file} ({num_events} events)")
+
+            events[trial_name].append((wav_file.stem, df_events))
+            if streaming:
+                aggregated[trial_name].append((wav_file.stem, df_agg))
+
+    if persist:
+        manifest.save()
+    return events, aggregated
+
+
+def aggregate_stage(events: dict, window_size: float) -> dict:
+    """
+    Count events per window for every segment, keeping the {trial: [(segment, df)]} layout.
+
+    All segments of all trials are counted in one np.bincount pass, over the full
+    recording duration where it is known.
+    """
+    keys = [(trial_name, segment) for trial_name, segments in events.items() for segment, _ in segments]
+    frames = [df_events for segments in events.values() for _, df_events in segments]
+    times = [df["Event_Time_Seconds"].to_numpy() if "Event_Time_Seconds" in df else [] for df in frames]
+    counts = aggregate_files(times, [window_size],
+                             [df.attrs.get("duration_seconds") for df in frames])[window_size]
+
+    aggregated = {trial_name: [] for trial_name in events}
+    for (trial_name, segment), df_agg in zip(keys, counts):
+        aggregated[trial_name].append((segment, df_agg))
+    return aggregated
+
+
+def join_stage(aggregated: dict, window_size: float) -> dict:
+    """Join the segments of each trial on one time axis: {trial name: joint DataFrame}."""
+    return {
+        trial_name: join_aggregated_frames(segments, window_size)
+        for trial_name, segments in aggregated.items()
+        if segments
+    }
+
+
+def plot_stage(joint: dict) -> list:
+    """
+    Plot each model trial against its reference *_joint.csv file.
+
+    Returns:
+        list[Path]: Figures written.
+    """
+    FIGURE_DIR.mkdir(parents=True, exist_ok=True)
+    reference_map = {f.stem: f for f in REFERENCE_DIR.rglob("*_joint.csv")}
+
+    figures = []
+    for trial_name, df_model in joint.items():
+        stem = f"{trial_name}_joint"
+        if stem not in reference_map:
+            print(f"[Warning] No matching reference file found for: {stem}")
+            continue
+
+        fig_path = FIGURE_DIR / f"{stem}_comparison.png"
+        plot_comparison_frames(pd.read_csv(reference_map[stem]), df_model, stem, fig_path)
+        figures.append(fig_path)
+    return figures
+
+
+def _save_intermediates(experiment_name: str, events: dict, aggregated: dict, joint: dict, fmt: str,
+                        window_size: float, save_aggregated_files: bool = True, base_resolution: float = 0.005):
+    """
+    Write count index, aggregated and joint files where the stage scripts would put them,
+    and record them in the manifest as those scripts do, so their skip checks see them.
+    """
+    manifest = Manifest()
+    params = {"window_size": window_size}
+    for trial_name, segments in aggregated.items():
+        trial_dir = MODEL_DIR / experiment_name / trial_name
+        trial_dir.mkdir(parents=True, exist_ok=True)
+        trial_events = events.get(trial_name, [])
+        if trial_events and all(df is not None for _, df in trial_events):
+            index_path = get_index_path(trial_dir)
+            CountIndex.build([segment for segment, _ in trial_events],
+                             [df["Event_Time_Seconds"].to_numpy() for _, df in trial_events],
+                             [df.attrs.get("duration_seconds") for _, df in trial_events],
+                             base_resolution=base_resolution).save(index_path)
+            # Recorded against the saved event files, as the aggregation step does
+            manifest.record("count_index", index_path,
+                            [get_output_path(trial_dir, segment, "events", fmt) for segment, _ in trial_events],
+                            {"base_resolution": base_resolution})
+        if save_aggregated_files:
+            trial_event_frames = dict(trial_events)
+            for segment, df_agg in segments:
+                aggregated_path = get_output_path(trial_dir, segment, "aggregated", fmt)
+                save_aggregated(df_agg, aggregated_path)
+                if trial_event_frames.get(segment) is not None:
+                    manifest.record("aggregation", aggregated_path,
+                                    [get_output_path(trial_dir, segment, "events", fmt)], params)
+        if trial_name in joint:
+            joint_path = trial_dir / f"{trial_name}_joint.csv"
+            joint[trial_name].to_csv(joint_path, index=False)
+            # Recorded only if the files the join script would read hold exactly these segments
+            index, inputs = join_inputs(trial_dir, window_size, manifest)
+            joined = index.segments if index is not None else [f.stem.replace("_aggregated", "") for f in inputs]
+            if inputs and sorted(joined) == sorted(segment for segment, _ in segments):
+                manifest.record("join", joint_path, inputs, params)
+    manifest.save()
+
+
+def run(experiment_path, config: dict, workers: int = None, persist: bool = False,
+        force: bool = False, progress=None) -> dict:
+    """
+    Run detect -> aggregate -> join -> plot in one process.
+
+    Model detections are passed between stages as DataFrames. Reference detections
+    are aggregated and joined from disk, as in the stage scripts. With
+    aggregation.streaming, model events are counted per window during detection.
+
+    Args:
+        experiment_path (str | Path): Experiment folder with one subfolder of WAV files per trial.
+        config (dict): Loaded configuration dictionary.
+        workers (int, optional): Detection worker processes (default: number of CPUs).
+        persist (bool): Also write events, aggregated and joint files to data/metadata.
+        force (bool): Recompute detections even if the manifest says they are unchanged.
+        progress (callable, optional): Called as progress(message, fraction) before each stage.
+
+    Returns:
+        dict: 'events', 'aggregated', 'joint' (model data per trial), 'figures' and
+              'timings' (seconds per stage).
+    """
+    experiment_path = Path(experiment_path)
+    if not experiment_path.exists():
+        raise FileNotFoundError(f"Experiment folder not found: {experiment_path}")
+
+    window_size = config["aggregation"]["window_size"]
+    streaming = get_streaming_aggregation(config)
+    timings = {}
+
+    def start(stage, message):
+        if progress is not None:
+            progress(message, STAGES.index(stage) / len(STAGES))
+        print(message)
+        return time.perf_counter()
+
+    t0 = start("detect", "[1/4] Detecting clicks in raw WAV files...")
+    events, aggregated = detect_stage(experiment_path, config, workers=workers, persist=persist,
+                                      force=force, streaming=streaming)
+    timings["detect"] = time.perf_counter() - t0
+
+    t0 = start("aggregate", "[2/4] Aggregating detections...")
+    if not streaming:
+        aggregated = aggregate_stage(events, window_size)
+    if REFERENCE_METADATA_DIR.exists():
+        aggregate_folder("reference_detections", window_size, fmt=get_output_format(config),
+                         base_resolution=get_base_resolution(config))
+    timings["aggregate"] = time.perf_counter() - t0
+
+    t0 = start("join", "[3/4] Concatenating aggregated results...")
+    joint = join_stage(aggregated, window_size)
+    if REFERENCE_METADATA_DIR.exists():
+        join_aggregated_files("reference_detections", window_size)
+    if persist:
+        _save_intermediates(experiment_path.name, events, aggregated, joint, get_output_format(config),
+                            window_size, save_aggregated_files=not streaming,
+                            base_resolution=get_base_resolution(config))
+    timings["join"] = time.perf_counter() - t0
+
+    t0 = start("plot", "[4/4] Generating comparison plots...")
+    figures = plot_stage(joint)
+    timings["plot"] = time.perf_counter() - t0
+
+    if progress is not None:
+        progress("Pipeline completed.", 1.0)
+    for stage, seconds in timings.items():
+        print(f"[Timing] {stage}: {seconds:.2f} s")
+
+    return {
+        "events": events,
+        "aggregated": aggregated,
+        "joint": joint,
+        "figures": figures,
+        "timings": timings,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the click detection pipeline in a single process.")
+    parser.add_argument(
+        "experiment_path",
+        type=str,
+        help="Path to the experiment folder containing subdirectories with the .wav audio files."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of WAV files processed in parallel (default: number of CPUs)."
+    )
+    parser.add_argument(
+        "--save-intermediates",
+        action="store_true",
+        help="Write events, aggregated and joint files to data/metadata."
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Recompute detections even if saved results are unchanged."
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    run(args.experiment_path, load_config(), workers=args.workers,
+        persist=args.save_intermediates, force=args.force)
@@ -0,0 +1,130 @@
+# src/utils/manifest.py
+
+import hashlib
+import json
+from pathlib import Path
+
+from src.utils.paths import get_metadata_path
+
+MANIFEST_PATH = get_metadata_path("pipeline_manifest.json")
+
+
+def file_hash(path: Path, chunk_size: int = 1 << 20) -> str:
+    """
+    Compute the SHA-256 hash of a file's contents, reading it in chunks.
+
+    Args:
+        path (Path): File to hash.
+        chunk_size (int): Number of bytes read per chunk.
+
+    Returns:
+        str: Hex digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_fingerprint(path: Path) -> dict:
+    """
+    Describe a file by its size, modification time and content hash.
+
+    Args:
+        path (Path): File to describe.
+
+    Returns:
+        dict: Keys 'size', 'mtime' and 'sha256'.
+    """
+    stat = Path(path).stat()
+    return {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": file_hash(path)}
+
+
+class Manifest:
+    """
+    Record of the inputs and parameters each pipeline output was produced from.
+
+    Entries are grouped by stage and keyed by output path. Each entry stores the
+    size, mtime and hash of every input file plus the relevant config values, so a
+    stage can skip outputs whose inputs and parameters have not changed. The hash is
+    only recomputed when an input's size or mtime differs from the recorded one.
+    """
+
+    def __init__(self, path: Path = MANIFEST_PATH):
+        self.path = Path(path)
+        try:
+            with open(self.path, "r") as f:
+                self.entries = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.entries = {}
+
+    def _fingerprint_matches(self, path: Path, recorded: dict) -> bool:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return False
+        if stat.st_size != recorded.get("size"):
+            return False
+        if stat.st_mtime == recorded.get("mtime"):
+            return True
+        # Touched but possibly unchanged: fall back to the content hash
+        if file_hash(path) != recorded.get("sha256"):
+            return False
+        recorded["mtime"] = stat.st_mtime
+        return True
+
+    def is_up_to_date(self, stage: str, output: Path, inputs, params: dict) -> bool:
+        """
+        Check whether an output exists and was produced from the same inputs and parameters.
+
+        Args:
+            stage (str): Pipeline stage name (e.g., 'detection').
+            output (Path): Output file produced by the stage.
+            inputs (list[Path]): Input files the output depends on.
+            params (dict): Config values the output depends on (must be JSON-serialisable).
+
+        Returns:
+            bool: True if the stage can skip this output.
+        """
+        entry = self.entries.get(stage, {}).get(str(output))
+        if entry is None or not Path(output).exists():
+            return False
+        if entry["params"] != json.loads(json.dumps(params)):
+            return False
+
+        recorded_inputs = entry["inputs"]
+        if sorted(recorded_inputs) != sorted(str(p) for p in inputs):
+            return False
+        return all(self._fingerprint_matches(Path(p), recorded_inputs[str(p)]) for p in inputs)
+
+    def recorded_fingerprint(self, stage: str, output: Path, input_path: Path) -> dict:
+        """
+        Fingerprint stored for one input of an output, e.g. to record a derived output
+        without hashing the input again right after `is_up_to_date` checked it.
+        """
+        return dict(self.entries[stage][str(output)]["inputs"][str(input_path)])
+
+    def record(self, stage: str, output: Path, inputs, params: dict, fingerprints=None):
+        """
+        Store the fingerprints of `inputs` and `params` for a freshly written output.
+
+        `fingerprints` may hold precomputed `file_fingerprint` results (one per input),
+        e.g. from a worker process that already read the file.
+        """
+        if fingerprints is None:
+            fingerprints = [file_fingerprint(p) for p in inputs]
+        self.entries.setdefault(stage, {})[str(output)] = {
+            "inputs": {str(p): fp for p, fp in zip(inputs, fingerprints)},
+            "params": json.loads(json.dumps(params)),
+        }
+
+    def forget(self, stage: str, output: Path):
+        """Drop the entry of an output that was deleted or is no longer current."""
+        self.entries.get(stage, {}).pop(str(output), None)
+
+    def save(self):
+        """Write the manifest to disk."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "w") as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
@@ -12,6 +12,20 @@ import matplotlib.pyplot as plt
 import numpy as np
 from scipy.signal import filtfilt
 
+# === Step 1: Detect and register project root ===
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.config.config_loader import load_config
+from src.utils.manifest import Manifest
+from src.aggregation.count_index import get_index_path, load_current_index
+from src.aggregation.join_aggregated_files import join_aggregated_frames
+
+REFERENCE_DIR = PROJECT_ROOT / "data" / "reference_detections"
+MODEL_DIR = PROJECT_ROOT / "data" / "metadata" / "model_detections"
+FIGURE_DIR = PROJECT_ROOT / "data" / "figures" / "comparison"
+
 def impute_missing_values(df, cols_to_impute, order=2):
     """
     Fill missing values in selected columns using polynomial interpolation.
@@ -71,23 +85,93 @@ def apply_filtfilt_smoothing(df, cols_to_smooth, window_size=5):
 
     return df_smoothed
 
-if __name__ == '__main__':
-    # === Step 1: Detect and register project root ===
-    PROJECT_ROOT = Path(__file__).resolve().parents[2]
-    if str(PROJECT_ROOT) not in sys.path:
-        sys.path.insert(0, str(PROJECT_ROOT))
+def plot_comparison(ref_path: Path, model_path: Path, fig_path: Path):
+    """
+    Plot reference vs. model click activity for one trial and save the figure.
+
+    Args:
+        ref_path (Path): Reference *_joint.csv file.
+        model_path (Path): Model *_joint.csv file.
+        fig_path (Path): Output PNG path.
+    """
+    # Load CSV files
+    df_ref = pd.read_csv(ref_path)
+    df_model = pd.read_csv(model_path)
+
+    plot_comparison_frames(df_ref, df_model, ref_path.stem, fig_path)
+
+
+def plot_comparison_frames(df_ref: pd.DataFrame, df_model: pd.DataFrame, stem: str, fig_path: Path):
+    """
+    Plot reference vs. model joint counts already loaded in memory and save the figure.
+
+    Args:
+        df_ref (pd.DataFrame): Reference joint counts ('start_time_sec', 'event_count').
+        df_model (pd.DataFrame): Model joint counts ('start_time_sec', 'event_count').
+        stem (str): Trial name used in the title (e.g., '8x_Rep01_joint').
+        fig_path (Path): Output PNG path.
+    """
+    t_ref = df_ref["start_time_sec"]/3600
+    t_model = df_model["start_time_sec"]/3600
+
+    # Define the columns to smooth (excluding 'created_date' and 'id')
+    cols_to_smooth = ['event_count']
+
+    # Select columns to impute (numerical only)
+    cols_to_impute = ['event_count']
+
+    # Apply polynomial interpolation (order=2)
+    df_ref = impute_missing_values(df_ref, cols_to_impute, order=2)
+    df_model = impute_missing_values(df_model, cols_to_impute, order=2)
+
+    # Apply smoothing with filtfilt
+    df_ref = apply_filtfilt_smoothing(df_ref, cols_to_smooth, window_size=5)
+    df_model = apply_filtfilt_smoothing(df_model, cols_to_smooth, window_size=5)
+
+    y_ref = df_ref["event_count"].values
+    y_model = df_model["event_count"].values
+
+    # Create 1x2 subplot
+    fig, axs = plt.subplots(1, 2, figsize=(10, 4))#, sharey=True, sharex=True)
+
+    axs[0].plot(t_ref, y_ref, label="Reference", color="black")
+    axs[0].set_title("Reference Detections")
+    axs[0].set_xlabel("Time (h)")
+    axs[0].set_ylabel("Event Count")
+
+    axs[1].plot(t_model, y_model, label="Model", color="tab:blue")
+    axs[1].set_title("Model Detections")
+    axs[1].set_xlabel("Time (h)")
+
+    for ax in axs:
+        ax.grid(True)
+
+    fig.suptitle(f"Click Activity Comparison: {stem}")
+    fig.tight_layout()
 
+    # Save figure
+    fig.savefig(fig_path, dpi=300)
+    plt.close(fig)
+
+
+def plot_all_comparisons(force: bool = False, window_size: float = None):
+    """
+    Plot every trial that has both a reference and a model *_joint.csv file.
+
+    With `window_size`, model counts are taken from the trial's count index when it has
+    one, so the figure follows the current window size without re-joining. Figures whose
+    inputs match the pipeline manifest are not redrawn.
+
+    Args:
+        force (bool): Ignore the manifest and redraw every figure.
+        window_size (float, optional): Aggregation window size in seconds.
+    """
     print(f"[Debug] Project root: {PROJECT_ROOT}")
-    # === Step 2: Define paths ===
-    # REFERENCE_DIR = PROJECT_ROOT / "data" / "metadata" / "reference_detections"
-    REFERENCE_DIR = PROJECT_ROOT / "data" / "reference_detections"
-    MODEL_DIR = PROJECT_ROOT / "data" / "metadata" / "model_detections"
-    FIGURE_DIR = PROJECT_ROOT / "data" / "figures" / "comparison"
     FIGURE_DIR.mkdir(parents=True, exist_ok=True)
 
     print(f"[Debug] Figures will be saved to: {FIGURE_DIR}")
 
-    # === Step 3: Find joint CSV files in both reference and model folders ===
+    # === Step 2: Find joint CSV files in both reference and model folders ===
     reference_files = list(REFERENCE_DIR.rglob("*_joint.csv"))
     model_files = list(MODEL_DIR.rglob("*_joint.csv"))
 
@@ -97,60 +181,42 @@ if __name__ == '__main__':
 
     print(f"[Debug] Found {len(reference_files)} reference files and {len(model_files)} model files.")
 
-    # === Step 4: Match and plot ===
+    manifest = Manifest()
+
+    # === Step 3: Match and plot ===
     for stem, ref_path in reference_map.items():
         if stem in model_map:
             model_path = model_map[stem]
-            print(f"[Info] Plotting comparison for: {stem}")
-
-            # Load CSV files
-            df_ref = pd.read_csv(ref_path)
-            df_model = pd.read_csv(model_path)
-
-            t_ref = df_ref["start_time_sec"]/3600
-            t_model = df_model["start_time_sec"]/3600
-
-            y_ref = df_ref["event_count"].values
-            y_model = df_model["event_count"].values
-
-            # Define the columns to smooth (excluding 'created_date' and 'id')
-            cols_to_smooth = ['event_count']
-
-            # Select columns to impute (numerical only)
-            cols_to_impute = ['event_count']
-
-            # Apply polynomial interpolation (order=2)
-            df_ref = impute_missing_values(df_ref, cols_to_impute, order=2)
-            df_model = impute_missing_values(df_model, cols_to_impute, order=2)
+            fig_path = FIGURE_DIR / f"{stem}_comparison.png"
+            index_path = get_index_path(model_path.parent)
+            index = load_current_index(model_path.parent, manifest) if window_size is not None else None
+            use_index = index is not None and index.supports(window_size)
+            inputs = [ref_path, index_path if use_index else model_path]
+            params = {"window_size": window_size} if use_index else {}
 
-            # Apply smoothing with filtfilt
-            df_ref = apply_filtfilt_smoothing(df_ref, cols_to_smooth, window_size=5)
-            df_model = apply_filtfilt_smoothing(df_model, cols_to_smooth, window_size=5)
+            if not force and manifest.is_up_to_date("plot", fig_path, inputs, params):
+                print(f"[Info] Unchanged, skipping: {stem}")
+                continue
 
-            y_ref = df_ref["event_count"].values
-            y_model = df_model["event_count"].values
+            print(f"[Info] Plotting comparison for: {stem}")
+            if use_index:
+                plot_comparison_frames(pd.read_csv(ref_path), join_aggregated_frames(index.query(window_size), window_size),
+                                       ref_path.stem, fig_path)
+            else:
+                plot_comparison(ref_path, model_path, fig_path)
+            manifest.record("plot", fig_path, inputs, params)
+        else:
+            print(f"[Warning] No matching model file found for: {stem}")
 
-            # Create 1x2 subplot
-            fig, axs = plt.subplots(1, 2, figsize=(10, 4))#, sharey=True, sharex=True)
-            
-            axs[0].plot(t_ref, y_ref, label="Reference", color="black")
-            axs[0].set_title("Reference Detections")
-            axs[0].set_xlabel("Time (h)")
-            axs[0].set_ylabel("Event Count")
+    manifest.save()
 
-            axs[1].plot(t_model, y_model, label="Model", color="tab:blue")
-            axs[1].set_title("Model Detections")
-            axs[1].set_xlabel("Time (h)")
 
-            for ax in axs:
-                ax.grid(True)
+if __name__ == '__main__':
+    import argparse
 
-            fig.suptitle(f"Click Activity Comparison: {stem}")
-            fig.tight_layout()
+    parser = argparse.ArgumentParser(description="Plot reference vs. model detection comparisons.")
+    parser.add_argument("--force", action="store_true",
+                        help="Redraw every figure, even if its joint files are unchanged.")
+    args = parser.parse_args()
 
-            # Save figure
-            fig_path = FIGURE_DIR / f"{stem}_comparison.png"
-            fig.savefig(fig_path, dpi=300)
-            plt.close(fig)
-        else:
-            print(f"[Warning] No matching model file found for: {stem}")
+    plot_all_comparisons(force=args.force, window_size=load_config()["aggregation"]["window_size"])
@@ -0,0 +1,80 @@
+# tests/conftest.py
+
+import sys
+import copy
+from pathlib import Path
+
+import numpy as np
+import pytest
+import soundfile as sf
+from scipy.signal import ShortTimeFFT, windows
+
+# === Detect project root and add to sys.path ===
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from benchmarks.synthetic_audio import write_click_wav
+from src.config.config_loader import load_config
+from src.config.config_helpers import get_dtype
+from src.detection.click_detection_utils import band_slice, detect_click_frames
+from src.features.extract_features import compute_hfc, compute_spectral_flux
+
+# Sample rates of the synthetic recordings (W = 220 / 480 / 960 samples at 5 ms frames)
+SAMPLE_RATES = (44100, 96000, 192000)
+
+
+@pytest.fixture(scope="session")
+def click_wavs(tmp_path_factory):
+    """Synthetic click recordings (16-bit PCM, 3 s), {fs: path}."""
+    folder = tmp_path_factory.mktemp("audio")
+    wavs = {}
+    for fs in SAMPLE_RATES:
+        wavs[fs] = folder / f"clicks_{fs}.wav"
+        write_click_wav(wavs[fs], fs, 3.0, seed=fs)
+    return wavs
+
+
+@pytest.fixture
+def config():
+    """Default configuration with a fresh copy per test and no named detectors."""
+    config = copy.deepcopy(load_config())
+    config["detection"]["detectors"] = []
+    return config
+
+
+def short_time_fft_band(wav, config):
+    """Band STFT of the whole signal with ShortTimeFFT (the detector's frame grid), [bins, frames]."""
+    x, fs = sf.read(wav)
+    W = int(config["processing"]["short_term_duration"] * fs)
+    band = band_slice(fs, W, config["detection"]["frequency_band"]["low"],
+                      config["detection"]["frequency_band"]["high"])
+    stft = ShortTimeFFT(windows.hann(W, sym=False), hop=W, fs=fs, mfft=W)
+    return stft.stft(x, p0=0, p1=(len(x) + W // 2) // W)[band]
+
+
+def short_time_fft_odf(wav, config):
+    """Reference ODF: ShortTimeFFT of the whole signal and the whole-STFT ODF functions."""
+    X = short_time_fft_band(wav, config)
+    return np.log10(compute_spectral_flux(X) * compute_hfc(X) + 1)
+
+
+def detector_odf(wav, config, fs):
+    """ODF of every frame from `detect_click_frames` (one shard), in processing.dtype."""
+    W = int(config["processing"]["short_term_duration"] * fs)
+    odf = np.zeros((sf.info(wav).frames + W // 2) // W, dtype=get_dtype(config))
+    detect_click_frames(wav, config, fs, odf_out=odf)
+    return odf
+
+
+def write_corrupt_flac(path, fs, duration, seed=0):
+    """FLAC click recording whose stream is damaged mid-file: the header reads, decoding fails."""
+    wav = Path(path).with_suffix(".tmp.wav")
+    write_click_wav(wav, fs, duration, seed=seed)
+    x, _ = sf.read(wav)
+    wav.unlink()
+    sf.write(path, x, fs, format="FLAC")
+    data = bytearray(Path(path).read_bytes())
+    middle = len(data) // 2
+    data[middle:middle + 4000] = bytes((b * 7 + 13) & 0xFF for b in data[middle:middle + 4000])
+    Path(path).write_bytes(bytes(data))
@@ -0,0 +1,49 @@
+# tests/test_band_dft.py
+"""The band-limited DFT gives the band spectrum and detections of the full STFT path."""
+
+import copy
+
+import numpy as np
+import pytest
+import soundfile as sf
+from scipy.signal import windows
+
+from src.detection.click_detection_utils import _band_dft_basis, band_slice, detect_clicks
+from tests.conftest import SAMPLE_RATES, detector_odf, short_time_fft_band, short_time_fft_odf
+
+BANDS = [(5000, 8000), (5000, 22000)]
+
+
+@pytest.mark.parametrize("fs", SAMPLE_RATES)
+@pytest.mark.parametrize("low, high", BANDS)
+@pytest.mark.parametrize("dtype, rtol", [("float64", 1e-10), ("float32", 1e-5)])
+def test_band_dft_magnitudes_match_short_time_fft(click_wavs, config, fs, low, high, dtype, rtol):
+    config["detection"]["frequency_band"] = {"low": low, "high": high}
+    x, _ = sf.read(click_wavs[fs])
+    W = int(config["processing"]["short_term_duration"] * fs)
+    reference = np.abs(short_time_fft_band(click_wavs[fs], config)).T
+
+    # Frames on the detector grid: frame p centred on sample p * W
+    padded = np.concatenate([np.zeros(W // 2), x, np.zeros(W)])
+    frames = padded[:len(reference) * W].reshape(-1, W).astype(dtype)
+    basis = _band_dft_basis(windows.hann(W, sym=False), band_slice(fs, W, low, high), dtype)
+    magnitude = np.abs((frames @ basis).view(np.result_type(dtype, np.complex64)))
+
+    # Relative to the largest magnitude: quiet bins only carry absolute rounding
+    np.testing.assert_allclose(magnitude, reference, rtol=0, atol=rtol * reference.max())
+
+
+@pytest.mark.parametrize("fs", SAMPLE_RATES)
+@pytest.mark.parametrize("low, high", BANDS)
+def test_band_dft_detections_match_short_time_fft(click_wavs, config, fs, low, high):
+    config["detection"]["frequency_band"] = {"low": low, "high": high}
+    config["processing"]["transform"] = "band_dft"
+    odf = detector_odf(click_wavs[fs], config, fs)
+    reference = short_time_fft_odf(click_wavs[fs], config)
+    np.testing.assert_allclose(odf, reference, rtol=0, atol=1e-10)
+
+    stft_config = copy.deepcopy(config)
+    stft_config["processing"]["transform"] = "stft"
+    events = detect_clicks(click_wavs[fs], config)["Event_Time_Seconds"].to_numpy()
+    stft_events = detect_clicks(click_wavs[fs], stft_config)["Event_Time_Seconds"].to_numpy()
+    assert np.array_equal(events, stft_events)
@@ -0,0 +1,51 @@
+# tests/test_batch_errors.py
+"""A file that fails to decode mid-stream is reported as failed without stopping the batch."""
+
+import pytest
+
+from benchmarks.synthetic_audio import write_click_wav
+from src.data.event_io import find_files
+from src.detection import click_detection_batch
+from src.utils.manifest import Manifest
+from tests.conftest import write_corrupt_flac
+
+
+@pytest.fixture
+def experiment(tmp_path, monkeypatch):
+    """Experiment with one trial of three recordings, the middle one corrupt mid-stream."""
+    trial = tmp_path / "experiment" / "8x_Rep01"
+    trial.mkdir(parents=True)
+    write_click_wav(trial / "a.WAV", 44100, 2.0, seed=1)
+    # libsndfile detects the format from the contents, so the FLAC stream is read despite the name
+    write_corrupt_flac(trial / "b.WAV", 44100, 4.0, seed=2)
+    write_click_wav(trial / "c.WAV", 44100, 2.0, seed=3)
+    # Keep the manifest of the test run out of data/metadata
+    monkeypatch.setattr(click_detection_batch, "Manifest", lambda: Manifest(tmp_path / "manifest.json"))
+    return trial.parent
+
+
+def test_corrupt_file_fails_and_others_succeed(experiment, tmp_path):
+    output_root = tmp_path / "detections"
+    failed = click_detection_batch.process_all_wav_files(experiment, output_root, workers=2)
+
+    assert [wav.name for wav in failed] == ["b.WAV"]
+    written = sorted(path.name.split("_events")[0] for path in find_files(output_root, "events"))
+    assert written == ["a", "c"]
+
+
+def test_failed_file_is_retried(experiment, tmp_path, capsys):
+    output_root = tmp_path / "detections"
+    click_detection_batch.process_all_wav_files(experiment, output_root, workers=2)
+    capsys.readouterr()
+
+    # The failed file has no manifest entry, so it is detected again; the others are skipped
+    failed = click_detection_batch.process_all_wav_files(experiment, output_root, workers=2)
+    out = capsys.readouterr().out
+    assert [wav.name for wav in failed] == ["b.WAV"]
+    assert "Unchanged, skipping: a.WAV" in out and "Unchanged, skipping: c.WAV" in out
+    assert "Unchanged, skipping: b.WAV" not in out
+
+    write_click_wav(experiment / "8x_Rep01" / "b.WAV", 44100, 4.0, seed=2)
+    assert click_detection_batch.process_all_wav_files(experiment, output_root, workers=2) == []
+    written = sorted(path.name.split("_events")[0] for path in find_files(output_root, "events"))
+    assert written == ["a", "b", "c"]
@@ -0,0 +1,69 @@
+# tests/test_channels.py
+"""Detecting several channels in one pass gives each channel's solo detections."""
+
+import copy
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from benchmarks.synthetic_audio import make_click_audio
+from src.detection.click_detection_utils import _coincident_channels, detect_clicks
+
+FS = 44100
+
+
+@pytest.fixture(scope="module")
+def multichannel_wav(tmp_path_factory):
+    """Three channels of independent click recordings."""
+    path = tmp_path_factory.mktemp("audio") / "three_channels.wav"
+    x = np.stack([make_click_audio(FS, 3.0, seed=seed)[0] for seed in (1, 2, 3)], axis=1)
+    sf.write(path, x, FS)
+    return path
+
+
+@pytest.mark.parametrize("num_shards", [1, 3])
+@pytest.mark.parametrize("channels", ["all", [2, 0]])
+def test_channel_streams_match_solo_runs(multichannel_wav, config, num_shards, channels):
+    config["processing"]["num_shards"] = num_shards
+    config["processing"]["channels"] = channels
+    df = detect_clicks(multichannel_wav, config)
+    selected = [0, 1, 2] if channels == "all" else channels
+    streams = df.attrs["detector_events"]
+    assert sorted(streams) == sorted(f"channel_{channel}" for channel in selected)
+
+    for channel in selected:
+        solo_config = copy.deepcopy(config)
+        solo_config["processing"]["channels"] = [channel]
+        solo_config["processing"]["num_shards"] = 1
+        solo = detect_clicks(multichannel_wav, solo_config)["Event_Time_Seconds"].to_numpy()
+        assert len(solo) > 0
+        assert np.array_equal(streams[f"channel_{channel}"], solo), channel
+        # The main detector runs on the first selected channel
+        if channel == selected[0]:
+            assert np.array_equal(df["Event_Time_Seconds"].to_numpy(), solo)
+
+
+def test_coincident_channels_counts():
+    onsets = np.array([1.0, 2.0, 3.0, 5.0])
+    offsets = np.array([1.0, 2.5, 3.0, 5.0])
+    channel_times = [
+        np.array([1.0, 2.0, 3.0, 5.0]),   # the channel of the events themselves
+        np.array([1.05, 2.6, 4.0]),       # 1.05 and 2.6 are within the lag
+        np.array([0.8, 2.3, 3.2]),        # 2.3 lies inside the run; 0.8 and 3.2 are too far
+    ]
+    counts = _coincident_channels(onsets, offsets, channel_times, lag=0.1)
+    assert counts.tolist() == [2, 3, 1, 1]
+
+
+def test_coincidence_of_identical_channels(tmp_path, config):
+    # Channels 0 and 1 carry the same clicks, channel 2 is silent: every event is seen twice
+    wav = tmp_path / "identical.wav"
+    x, _ = make_click_audio(FS, 2.0, seed=4)
+    sf.write(wav, np.stack([x, x, np.zeros_like(x)], axis=1), FS)
+    config["processing"]["channels"] = "all"
+    config["detection"]["coincidence_frames"] = 0
+    df = detect_clicks(wav, config)
+    assert len(df) > 0
+    assert len(df.attrs["detector_events"]["channel_2"]) == 0
+    assert np.all(df["Coincident_Channels"].to_numpy() == 2)
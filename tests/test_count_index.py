@@ -0,0 +1,46 @@
+# tests/test_count_index.py
+"""Join and plot only trust a count index built from the trial's current event files."""
+
+import numpy as np
+
+from src.aggregation.count_index import CountIndex, get_index_path, invalidate_index, load_current_index
+from src.data.event_io import save_events
+from src.utils.manifest import Manifest
+
+PARAMS = {"base_resolution": 0.005}
+
+
+def build_trial(tmp_path, event_times):
+    trial_folder = tmp_path / "8x_Rep01"
+    events_path = trial_folder / "seg_events.npz"
+    save_events(event_times, events_path, {"duration_seconds": 10.0})
+    manifest = Manifest(tmp_path / "manifest.json")
+    index_path = get_index_path(trial_folder)
+    CountIndex.build(["seg"], [event_times], [10.0]).save(index_path)
+    manifest.record("count_index", index_path, [events_path], PARAMS)
+    return trial_folder, events_path, manifest
+
+
+def test_current_index_is_loaded(tmp_path):
+    trial_folder, _, manifest = build_trial(tmp_path, [0.5, 1.5, 2.5])
+    index = load_current_index(trial_folder, manifest)
+    assert index is not None
+    assert index.query(1.0)[0][1]["event_count"].sum() == 3
+
+
+def test_index_from_old_events_is_ignored(tmp_path):
+    trial_folder, events_path, manifest = build_trial(tmp_path, [0.5, 1.5, 2.5])
+    save_events([0.5, 1.5, 2.5, 3.5], events_path, {"duration_seconds": 10.0})
+    assert load_current_index(trial_folder, manifest) is None
+
+
+def test_unrecorded_index_is_ignored(tmp_path):
+    trial_folder, _, _ = build_trial(tmp_path, [0.5])
+    assert load_current_index(trial_folder, Manifest(tmp_path / "other.json")) is None
+
+
+def test_invalidate_index(tmp_path):
+    trial_folder, _, manifest = build_trial(tmp_path, np.arange(5.0))
+    invalidate_index(trial_folder, manifest)
+    assert not get_index_path(trial_folder).exists()
+    assert load_current_index(trial_folder, manifest) is None
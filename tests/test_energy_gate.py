@@ -0,0 +1,70 @@
+# tests/test_energy_gate.py
+"""The energy gate only skips frames that cannot reach the threshold: detections are unchanged."""
+
+import copy
+
+import numpy as np
+import pytest
+import soundfile as sf
+from scipy.signal import windows
+
+from benchmarks.synthetic_audio import write_click_wav
+from src.detection.click_detection_utils import band_slice, detect_clicks, energy_gate_threshold
+from tests.conftest import detector_odf
+
+FS = 96000
+
+
+@pytest.fixture(scope="module")
+def quiet_wav(tmp_path_factory):
+    """Clicks over faint background noise, so most frames are quiet enough to be skipped."""
+    path = tmp_path_factory.mktemp("audio") / "quiet_clicks.wav"
+    write_click_wav(path, FS, 3.0, seed=5, click_snr_db=80.0)
+    return path
+
+
+def frame_energies(wav, W):
+    """Windowed energy sum((w * x)^2) of every frame on the detector's grid."""
+    x, _ = sf.read(wav)
+    num_frames = (len(x) + W // 2) // W
+    padded = np.concatenate([np.zeros(W // 2), x, np.zeros(W)])
+    frames = padded[:num_frames * W].reshape(num_frames, W)
+    return np.sum((frames * windows.hann(W, sym=False)) ** 2, axis=1)
+
+
+@pytest.mark.parametrize("dtype", ["float64", "float32"])
+def test_energy_bound_holds_for_every_frame(quiet_wav, config, dtype):
+    # A frame is detected at any threshold up to its own ODF, so its energy must reach
+    # the bound at that threshold; the 0.999 margin absorbs the rounding of the ODF
+    config["processing"]["dtype"] = dtype
+    W = int(config["processing"]["short_term_duration"] * FS)
+    band = band_slice(FS, W, config["detection"]["frequency_band"]["low"],
+                      config["detection"]["frequency_band"]["high"])
+    odf = detector_odf(quiet_wav, config, FS)
+    energies = frame_energies(quiet_wav, W)
+    bounds = np.array([energy_gate_threshold(float(value), band.stop - band.start, W) for value in odf])
+    assert np.all(energies >= bounds)
+
+
+@pytest.mark.parametrize("dtype", ["float64", "float32"])
+@pytest.mark.parametrize("num_shards", [1, 3])
+def test_gate_keeps_every_detection(quiet_wav, config, dtype, num_shards):
+    config["processing"]["dtype"] = dtype
+    config["processing"]["num_shards"] = num_shards
+    config["processing"]["block_duration"] = 0.25
+    odf = detector_odf(quiet_wav, config, FS)
+    # Round thresholds plus ODF values of actual frames, where a frame sits exactly on the threshold
+    peaks = np.sort(odf[odf > 0.01])
+    thresholds = [0.01, 0.1, float(peaks[0]), float(peaks[len(peaks) // 2]), float(peaks[-1])]
+
+    for threshold in thresholds:
+        config["detection"]["threshold"] = threshold
+        ungated = detect_clicks(quiet_wav, config)
+        gated_config = copy.deepcopy(config)
+        gated_config["processing"]["energy_gate"] = True
+        gated = detect_clicks(quiet_wav, gated_config)
+
+        assert len(ungated) > 0
+        # Most frames are skipped, so the sparse ODF update does the work
+        assert gated.attrs["skip_ratio"] > 0.5
+        assert np.array_equal(gated["Event_Time_Seconds"].to_numpy(), ungated["Event_Time_Seconds"].to_numpy())
@@ -0,0 +1,117 @@
+# tests/test_event_runs.py
+"""Runs of flagged frames are the same whatever the block and shard boundaries."""
+
+import copy
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from benchmarks.synthetic_audio import write_click_wav
+from src.aggregation.aggregate_detections import aggregate_events
+from src.data.event_buffer import EventRuns
+from src.detection.click_detection_utils import detect_and_aggregate, detect_clicks
+
+# Flagged frames forming the runs 2-4, 7-8 and 10
+FRAMES = np.array([2, 3, 4, 7, 8, 10])
+ODF = np.array([1.0, 5.0, 2.0, 3.0, 3.0, 9.0])
+AMPLITUDES = np.array([0.1, 0.2, 0.7, 0.4, 0.3, 0.5])
+SAMPLES = FRAMES * 10 + np.arange(6)
+
+W, FS = 10, 1000
+
+
+def runs_of(parts):
+    """Add each (start, stop) slice of the flagged frames as one block of one EventRuns."""
+    runs = EventRuns(refine=True)
+    for start, stop in parts:
+        runs.add(FRAMES[start:stop], ODF[start:stop], AMPLITUDES[start:stop], SAMPLES[start:stop])
+    return runs
+
+
+def test_runs_of_one_block():
+    arrays = runs_of([(0, len(FRAMES))]).to_arrays(W, FS)
+    assert np.array_equal(arrays["onset"], np.array([2, 7, 10]) * W / FS)
+    assert np.array_equal(arrays["offset"], np.array([4, 8, 10]) * W / FS)
+    assert np.array_equal(arrays["peak"], [5.0, 3.0, 9.0])
+    assert np.array_equal(arrays["amplitude"], [0.7, 0.4, 0.5])
+    assert np.array_equal(arrays["sample"], np.array([42, 73, 105]) / FS)
+
+
+@pytest.mark.parametrize("block_size", [1, 2, 4])
+def test_runs_crossing_block_boundaries(block_size):
+    reference = runs_of([(0, len(FRAMES))]).to_arrays(W, FS)
+    parts = [(start, start + block_size) for start in range(0, len(FRAMES), block_size)]
+    arrays = runs_of(parts).to_arrays(W, FS)
+    assert reference.keys() == arrays.keys()
+    for column in reference:
+        assert np.array_equal(arrays[column], reference[column]), column
+
+
+@pytest.mark.parametrize("split", range(1, len(FRAMES)))
+def test_runs_crossing_a_shard_boundary(split):
+    reference = runs_of([(0, len(FRAMES))]).to_arrays(W, FS)
+    first, second = runs_of([(0, split)]), runs_of([(split, len(FRAMES))])
+    continued = first.extend(second)
+    # The second shard counted the continued run as a click of its own
+    assert continued == (FRAMES[split] if FRAMES[split] == FRAMES[split - 1] + 1 else None)
+    arrays = first.to_arrays(W, FS)
+    for column in reference:
+        assert np.array_equal(arrays[column], reference[column]), column
+
+
+@pytest.fixture(scope="module")
+def run_wav(tmp_path_factory):
+    path = tmp_path_factory.mktemp("audio") / "runs.wav"
+    write_click_wav(path, 44100, 3.0, seed=11)
+    return path
+
+
+@pytest.fixture
+def runs_config(config):
+    config["detection"]["compact_events"] = True
+    config["detection"]["refine_onsets"] = True
+    return config
+
+
+def crossings(df, wav, num_shards):
+    """Number of runs that cross a shard boundary (frames of 220 samples at 44.1 kHz)."""
+    W_seconds = 220 / 44100
+    total_frames = (sf.info(wav).frames + 110) // 220
+    onsets = np.round(df["Event_Time_Seconds"].to_numpy() / W_seconds)
+    offsets = np.round(df["Event_Offset_Seconds"].to_numpy() / W_seconds)
+    bounds = np.linspace(0, total_frames, num_shards + 1).astype(int)[1:-1]
+    return sum(int(np.sum((onsets < bound) & (offsets >= bound))) for bound in bounds)
+
+
+@pytest.mark.parametrize("num_shards", [7, 13, 17])
+def test_detected_runs_match_across_blocks_and_shards(run_wav, runs_config, num_shards):
+    whole = copy.deepcopy(runs_config)
+    whole["processing"]["block_duration"] = 10.0
+    reference = detect_clicks(run_wav, whole)
+    assert np.any(reference["Event_Offset_Seconds"] > reference["Event_Time_Seconds"])
+    assert crossings(reference, run_wav, num_shards) > 0
+
+    # Two-frame blocks (the smallest): every run longer than one frame may cross a block edge
+    for block_duration, shards in [(0.01, 1), (10.0, num_shards), (0.01, num_shards)]:
+        config = copy.deepcopy(runs_config)
+        config["processing"]["block_duration"] = block_duration
+        config["processing"]["num_shards"] = shards
+        df = detect_clicks(run_wav, config)
+        assert list(df.columns) == list(reference.columns)
+        for column in reference.columns:
+            assert np.array_equal(df[column].to_numpy(), reference[column].to_numpy()), column
+
+
+@pytest.mark.parametrize("keep_events", [True, False])
+@pytest.mark.parametrize("num_shards", [1, 7, 13])
+def test_window_counts_count_each_run_once(run_wav, runs_config, keep_events, num_shards):
+    # Runs crossing a shard boundary are counted by both shards; `_run_detector` removes one
+    reference = detect_clicks(run_wav, runs_config)
+    expected = aggregate_events(reference, 0.05, reference.attrs["duration_seconds"])
+
+    runs_config["processing"]["num_shards"] = num_shards
+    runs_config["processing"]["block_duration"] = 0.01
+    _, counts = detect_and_aggregate(run_wav, runs_config, 0.05, keep_events=keep_events)
+    assert np.array_equal(counts["start_time_sec"].to_numpy(), expected["start_time_sec"].to_numpy())
+    assert np.array_equal(counts["event_count"].to_numpy(), expected["event_count"].to_numpy())
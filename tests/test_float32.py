@@ -0,0 +1,47 @@
+# tests/test_float32.py
+"""The float32 detection path agrees with float64 up to single-precision rounding."""
+
+import copy
+
+import numpy as np
+import pytest
+
+from src.detection.click_detection_utils import detect_clicks
+from tests.conftest import SAMPLE_RATES, detector_odf
+
+# Largest ODF difference allowed between the two paths (observed: ~1e-5)
+ODF_ATOL = 1e-4
+
+
+def frame_odf(wav, config, fs, dtype):
+    config = copy.deepcopy(config)
+    config["processing"]["dtype"] = dtype
+    return detector_odf(wav, config, fs)
+
+
+@pytest.mark.parametrize("fs", SAMPLE_RATES)
+def test_float32_odf_matches_float64(click_wavs, config, fs):
+    odf64 = frame_odf(click_wavs[fs], config, fs, "float64")
+    odf32 = frame_odf(click_wavs[fs], config, fs, "float32")
+    assert odf32.dtype == np.float32
+    np.testing.assert_allclose(odf32, odf64, rtol=0, atol=ODF_ATOL)
+
+
+@pytest.mark.parametrize("fs", SAMPLE_RATES)
+@pytest.mark.parametrize("num_shards", [1, 3])
+def test_float32_events_match_float64(click_wavs, config, fs, num_shards):
+    wav = click_wavs[fs]
+    config["processing"]["num_shards"] = num_shards
+    events = {}
+    for dtype in ("float64", "float32"):
+        dtype_config = copy.deepcopy(config)
+        dtype_config["processing"]["dtype"] = dtype
+        events[dtype] = detect_clicks(wav, dtype_config)["Event_Time_Seconds"].to_numpy()
+
+    # Only frames whose ODF lies within rounding of the threshold may be flagged differently
+    odf64 = frame_odf(wav, config, fs, "float64")
+    W = int(config["processing"]["short_term_duration"] * fs)
+    borderline = np.flatnonzero(np.abs(odf64 - config["detection"]["threshold"]) <= ODF_ATOL) * W / fs
+    differing = np.setxor1d(events["float64"], events["float32"])
+    assert np.isin(differing, borderline).all()
+    assert len(events["float64"]) > 0
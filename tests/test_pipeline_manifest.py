@@ -0,0 +1,43 @@
+# tests/test_pipeline_manifest.py
+"""Files the pipeline persists are recorded in the manifest like those of the stage scripts."""
+
+import pytest
+
+from benchmarks.synthetic_audio import write_click_wav
+from src.aggregation.join_aggregated_files import join_inputs
+from src.data.event_io import get_output_path
+from src.pipeline import pipeline
+from src.utils.manifest import Manifest
+
+
+@pytest.fixture
+def experiment(tmp_path, monkeypatch):
+    """Experiment with one trial of two recordings; pipeline outputs and manifest under tmp_path."""
+    trial = tmp_path / "experiment" / "8x_Rep01"
+    trial.mkdir(parents=True)
+    write_click_wav(trial / "a.WAV", 44100, 2.0, seed=1)
+    write_click_wav(trial / "b.WAV", 44100, 2.0, seed=2)
+    monkeypatch.setattr(pipeline, "MODEL_DIR", tmp_path / "model_detections")
+    monkeypatch.setattr(pipeline, "REFERENCE_METADATA_DIR", tmp_path / "reference_detections")
+    monkeypatch.setattr(pipeline, "REFERENCE_DIR", tmp_path / "reference")
+    monkeypatch.setattr(pipeline, "FIGURE_DIR", tmp_path / "figures")
+    monkeypatch.setattr(pipeline, "Manifest", lambda: Manifest(tmp_path / "manifest.json"))
+    return trial.parent
+
+
+def test_persisted_outputs_are_recorded(experiment, config, tmp_path):
+    config["aggregation"]["streaming"] = False
+    pipeline.run(experiment, config, workers=2, persist=True)
+
+    manifest = Manifest(tmp_path / "manifest.json")
+    trial_dir = tmp_path / "model_detections" / "experiment" / "8x_Rep01"
+    fmt = config["output"]["format"]
+    params = {"window_size": config["aggregation"]["window_size"]}
+    for segment in ["a", "b"]:
+        events_path = get_output_path(trial_dir, segment, "events", fmt)
+        aggregated_path = get_output_path(trial_dir, segment, "aggregated", fmt)
+        assert manifest.is_up_to_date("aggregation", aggregated_path, [events_path], params)
+
+    # The join script would read the same inputs and skip the trial
+    _, inputs = join_inputs(trial_dir, params["window_size"], manifest)
+    assert manifest.is_up_to_date("join", trial_dir / "8x_Rep01_joint.csv", inputs, params)
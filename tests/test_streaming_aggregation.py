@@ -0,0 +1,29 @@
+# tests/test_streaming_aggregation.py
+"""Window counts accumulated during detection equal `aggregate_events` on the event times."""
+
+import numpy as np
+import pytest
+
+from src.aggregation.aggregate_detections import aggregate_events
+from src.detection.click_detection_utils import detect_and_aggregate, detect_clicks
+
+# Frame length, non-multiples of it (windows straddling frames) and windows longer than a block
+WINDOW_SIZES = [0.005, 0.0123, 0.05, 0.7]
+
+
+@pytest.mark.parametrize("fs", [44100, 192000])
+@pytest.mark.parametrize("keep_events", [True, False])
+@pytest.mark.parametrize("num_shards", [1, 3, 7])
+@pytest.mark.parametrize("block_duration", [0.01, 0.37])
+def test_streaming_counts_match_aggregate_events(click_wavs, config, fs, keep_events, num_shards,
+                                                 block_duration):
+    reference = detect_clicks(click_wavs[fs], config)
+    config["processing"]["num_shards"] = num_shards
+    config["processing"]["block_duration"] = block_duration
+
+    for window_size in WINDOW_SIZES:
+        expected = aggregate_events(reference, window_size, reference.attrs["duration_seconds"])
+        df_events, counts = detect_and_aggregate(click_wavs[fs], config, window_size, keep_events=keep_events)
+        assert (df_events is not None) == keep_events
+        assert np.array_equal(counts["start_time_sec"].to_numpy(), expected["start_time_sec"].to_numpy())
+        assert np.array_equal(counts["event_count"].to_numpy(), expected["event_count"].to_numpy()), window_size
@@ -0,0 +1,89 @@
+# tests/test_streaming_odf.py
+"""Chunked detection must give exactly the results of processing the whole file at once."""
+
+import copy
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from src.config.config_helpers import get_num_shards
+from src.detection.click_detection_utils import detect_clicks, share_cores
+from src.features.extract_features import compute_hfc, compute_spectral_flux
+from tests.conftest import SAMPLE_RATES, detector_odf, short_time_fft_band, short_time_fft_odf
+
+
+def whole_file_odf(wav, config, fs):
+    """ODF of every frame with the whole file in one block and one shard."""
+    config = copy.deepcopy(config)
+    config["processing"]["block_duration"] = sf.info(wav).duration + 1.0
+    return detector_odf(wav, config, fs)
+
+
+@pytest.mark.parametrize("fs", SAMPLE_RATES)
+def test_whole_file_matches_short_time_fft(click_wavs, config, fs):
+    odf = whole_file_odf(click_wavs[fs], config, fs)
+    reference = short_time_fft_odf(click_wavs[fs], config)
+    # Same values up to the summation order of the band sums
+    np.testing.assert_allclose(odf, reference, rtol=0, atol=1e-12)
+    threshold = config["detection"]["threshold"]
+    assert np.array_equal(np.flatnonzero(odf >= threshold), np.flatnonzero(reference >= threshold))
+
+
+@pytest.mark.parametrize("fs", SAMPLE_RATES)
+@pytest.mark.parametrize("block_duration", [0.01, 0.037, 1.0])
+@pytest.mark.parametrize("num_shards", [1, 3, 7])
+def test_chunked_detection_matches_whole_file(click_wavs, config, tmp_path, fs, block_duration, num_shards):
+    wav = click_wavs[fs]
+    reference = whole_file_odf(wav, config, fs)
+    W = int(config["processing"]["short_term_duration"] * fs)
+
+    config["processing"].update(block_duration=block_duration, num_shards=num_shards, energy_gate=False)
+    odf_path = tmp_path / "odf.npy"
+    events = detect_clicks(wav, config, odf_path=odf_path)
+
+    assert np.array_equal(np.load(odf_path), reference)
+    expected = np.flatnonzero(reference >= config["detection"]["threshold"]) * W / fs
+    assert np.array_equal(events["Event_Time_Seconds"].to_numpy(), expected)
+
+
+@pytest.mark.parametrize("num_shards", [2, 3, 4, 6])
+def test_short_file_shards_match_single_pass(config, tmp_path, num_shards):
+    # 6 frames at 44.1 kHz with a click in frame 1, whose ODF frame 0 shares
+    rng = np.random.default_rng(0)
+    x = 0.01 * rng.standard_normal(1210)
+    x[200:240] += 0.8 * rng.standard_normal(40)
+    wav = tmp_path / "short.wav"
+    sf.write(wav, x, 44100, subtype="PCM_16")
+
+    single = detect_clicks(wav, config)["Event_Time_Seconds"].to_numpy()
+    config["processing"]["num_shards"] = num_shards
+    sharded = detect_clicks(wav, config)["Event_Time_Seconds"].to_numpy()
+    assert single[0] == 0.0
+    assert np.array_equal(sharded, single)
+
+
+@pytest.mark.parametrize("num_chunks", [2, 5, 17])
+def test_odf_functions_carry_previous_frame(click_wavs, config, num_chunks):
+    X = short_time_fft_band(click_wavs[44100], config)
+
+    # Each chunk is differenced against the last frame of the one before
+    chunks = np.array_split(np.arange(X.shape[1]), num_chunks)
+    flux, hfc = [], []
+    for i, frames in enumerate(chunks):
+        previous = X[:, chunks[i - 1][-1]] if i > 0 else None
+        flux.append(compute_spectral_flux(X[:, frames], previous=previous))
+        hfc.append(compute_hfc(X[:, frames], previous=previous))
+
+    # The whole-STFT functions sum across frames of a [bins, frames] array, whose rounding
+    # depends on the array width; a seam would be off by far more than that
+    np.testing.assert_allclose(np.concatenate(flux), compute_spectral_flux(X), rtol=0, atol=1e-12)
+    np.testing.assert_allclose(np.concatenate(hfc), compute_hfc(X), rtol=0, atol=1e-12)
+
+
+@pytest.mark.parametrize("workers, expected", [(None, 1), (1, 8), (2, 4), (3, 2), (16, 1)])
+def test_share_cores_limits_shards_per_file(config, monkeypatch, workers, expected):
+    monkeypatch.setattr("os.cpu_count", lambda: 8)
+    config["processing"]["num_shards"] = 8
+    assert get_num_shards(share_cores(config, workers)) == expected
+    assert config["processing"]["num_shards"] == 8
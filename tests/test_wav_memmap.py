@@ -0,0 +1,79 @@
+# tests/test_wav_memmap.py
+"""The memory-mapped WAV reader gives exactly the samples and frames soundfile decodes."""
+
+import struct
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from src.data.preprocess import iter_frame_blocks, open_wav_memmap
+
+SUBTYPES = ["PCM_16", "PCM_24", "PCM_32", "FLOAT", "DOUBLE"]
+FS = 48000
+
+
+def write_test_wav(path, subtype, num_channels, num_samples=4801, seed=0):
+    """Random full-scale samples (including -1.0) in the given WAV subtype."""
+    rng = np.random.default_rng(seed)
+    x = rng.uniform(-1.0, 1.0, (num_samples, num_channels))
+    x[0] = -1.0
+    sf.write(path, x, FS, subtype=subtype)
+    return path
+
+
+def insert_odd_chunk(path):
+    """Insert a chunk of odd size (plus its pad byte) between the fmt and data chunks."""
+    data = bytearray(open(path, "rb").read())
+    position = 12
+    while data[position:position + 4] != b"data":
+        size = struct.unpack("<I", data[position + 4:position + 8])[0]
+        position += 8 + size + size % 2
+    chunk = b"odd " + struct.pack("<I", 5) + b"abcde" + b"\x00"
+    data[position:position] = chunk
+    data[4:8] = struct.pack("<I", len(data) - 8)
+    open(path, "wb").write(bytes(data))
+
+
+def frames(wav, backend, channels, first_frame=0, W=480, block_frames=3):
+    blocks = [block * scale for block, scale in
+              iter_frame_blocks(wav, W, block_frames, first_frame, dtype="float64", backend=backend,
+                                depth=0, channels=channels)]
+    return np.concatenate(blocks, axis=-2)
+
+
+@pytest.mark.parametrize("subtype", SUBTYPES)
+@pytest.mark.parametrize("num_channels", [1, 3])
+def test_mapped_samples_match_soundfile(tmp_path, subtype, num_channels):
+    wav = write_test_wav(tmp_path / "test.wav", subtype, num_channels)
+    x, _ = sf.read(wav, always_2d=True)
+    mapped = open_wav_memmap(wav)
+    assert mapped is not None and mapped.samplerate == FS
+
+    for channel in range(num_channels):
+        assert np.array_equal(mapped.channel(0, len(x), channel) * mapped.scale, x[:, channel])
+    rows = [0, num_channels - 1]
+    assert np.array_equal(mapped.channel_rows(0, len(x), rows) * mapped.scale, x[:, rows].T)
+    assert np.array_equal(mapped.channel_rows(10, 20, slice(0, num_channels)) * mapped.scale, x[10:20].T)
+
+
+@pytest.mark.parametrize("subtype", SUBTYPES)
+@pytest.mark.parametrize("channels", [None, [0], [2, 0]])
+@pytest.mark.parametrize("first_frame", [0, 4])
+def test_mapped_frames_match_soundfile_backend(tmp_path, subtype, channels, first_frame):
+    wav = write_test_wav(tmp_path / "test.wav", subtype, 3)
+    assert np.array_equal(frames(wav, "auto", channels, first_frame),
+                          frames(wav, "soundfile", channels, first_frame))
+
+
+@pytest.mark.parametrize("subtype", ["PCM_16", "PCM_24"])
+def test_odd_sized_chunk_before_data(tmp_path, subtype):
+    wav = write_test_wav(tmp_path / "test.wav", subtype, 2)
+    x, _ = sf.read(wav, always_2d=True)
+    insert_odd_chunk(wav)
+    assert np.array_equal(sf.read(wav, always_2d=True)[0], x)
+
+    mapped = open_wav_memmap(wav)
+    assert mapped is not None
+    assert np.array_equal(mapped.channel_rows(0, len(x), slice(0, 2)) * mapped.scale, x.T)
+    assert np.array_equal(frames(wav, "auto", [0, 1]), frames(wav, "soundfile", [0, 1]))